@@ -1,12 +1,17 @@
 """
 Class and helpers for dealing with Application schemas
 """
-from copy import deepcopy
-
-import yaml
 from dbt.logger import GLOBAL_LOGGER as logger
 
 from .relation import DEFAULT_DESCRIPTION
+from .yaml_io import dump_yaml
+
+EXISTING_DOWNSTREAM_SOURCES_ORIGIN = "the existing downstream sources file"
+DUPLICATE_TABLE_MESSAGE = "Duplicate table name {} from {}, already added from {}"
+
+
+class DuplicateDownstreamSourceException(Exception):
+    pass
 
 
 class App:
@@ -18,7 +23,7 @@ class App:
 
     def __init__(
         self, raw_schemas, app, app_path, design_file_path, current_raw_sources,
-        current_downstream_sources, database, no_pii=False, pii_only=False
+        current_downstream_sources, database, no_pii=False, pii_only=False, strict_duplicates=False
     ):
 
         self.raw_schemas = raw_schemas
@@ -29,6 +34,8 @@ class App:
         self.current_downstream_sources = current_downstream_sources or {}
         self.safe_downstream_source_name = app
         self.pii_downstream_source_name = "{}_PII".format(app)
+        # Raise as soon as a duplicate downstream source table is added, instead of only reporting it
+        self.strict_duplicates = strict_duplicates
         if no_pii and pii_only:
             raise ValueError('Cannot specify both no_pii and pii_only flags as true')
         if no_pii:
@@ -51,6 +58,10 @@ class App:
             ],
             "models": [],
         }
+        # Index of the entry of each raw schema in the "sources" list of the new schema
+        self.new_schema_source_indexes = {}
+        for index, source in enumerate(self.new_schema["sources"]):
+            self.new_schema_source_indexes.setdefault(source["name"], index)
 
         # Create a new, empty object to store a new version of our downstream
         # sources so we don't get any tables / models that may have been
@@ -63,10 +74,18 @@ class App:
         sources so we don't get any tables / models that may have been
         deleted since the last run. If no_pii flag is set we will exclude
         the downstream source name for that.
+
+        The sources of other apps are shared with the current downstream sources rather than copied,
+        since they are never changed. Only the sources of this app, which get tables added, are copied,
+        so the current downstream sources are left as they are.
         """
+        app_source_names = (self.safe_downstream_source_name, self.pii_downstream_source_name)
         ret_val = {
             "version": 2,
-            "sources": deepcopy(self.current_downstream_sources.get('sources', [])),
+            "sources": [
+                dict(source, tables=list(source['tables'])) if source['name'] in app_source_names else source
+                for source in self.current_downstream_sources.get('sources', [])
+            ],
             "models": [],
         }
         current_sources = {s['name']: i for i, s in enumerate(ret_val['sources'])}
@@ -92,46 +111,87 @@ class App:
                         "tables": [],
                     }
                 )
+
+        # Indexes of the entries of each source name in the "sources" list of the downstream sources
+        self.downstream_source_indexes = {}
+        for index, source in enumerate(ret_val['sources']):
+            self.downstream_source_indexes.setdefault(source['name'], []).append(index)
+
+        # Where each table of each downstream source came from, by source index and table position, to say where
+        # duplicates came from
+        self.downstream_table_origins = [
+            [EXISTING_DOWNSTREAM_SOURCES_ORIGIN] * len(source['tables']) for source in ret_val['sources']
+        ]
+        # Where each table name of each downstream source came from, to stop at the first duplicate in strict mode
+        self.downstream_table_names = {}
+        for source in ret_val['sources']:
+            for table in source['tables']:
+                if table:
+                    self._record_downstream_table(
+                        source['name'], table['name'], EXISTING_DOWNSTREAM_SOURCES_ORIGIN
+                    )
         return ret_val
 
+    def _record_downstream_table(self, source_name, table_name, origin):
+        """
+        Record a table added to a downstream source.
+
+        Raises:
+          DuplicateDownstreamSourceException: When strict_duplicates is set and the source already has a table
+            of that name.
+        """
+        names = self.downstream_table_names.setdefault(source_name, {})
+        if table_name not in names:
+            names[table_name] = origin
+        elif self.strict_duplicates:
+            raise DuplicateDownstreamSourceException(
+                DUPLICATE_TABLE_MESSAGE.format(source_name + '.' + table_name, origin, names[table_name])
+            )
+
     def __repr__(self):
         """
         Makes debugging less of a pain
         """
         return self.app
 
-    def check_downstream_sources_for_dupes(self):
+    def find_duplicate_downstream_tables(self):
         """
-        Checks downstream sources for duplicate tables within the same schema.
+        Return the (qualified table name, origin, origin of the first table of that name) of every duplicate table
+        within the same downstream source.
+
+        Tables are compared by the names they have now, so entries renamed after they were added, when a prefix
+        is applied to them, are caught too.
+
+        Raises:
+          DuplicateDownstreamSourceException: When strict_duplicates is set and there is a duplicate.
         """
-        table_dict = {}
-        for source in self.new_downstream_sources["sources"]:
-            table_dict[source["name"]] = []
-            for table in source["tables"]:
-                table_dict[source["name"]].append(table["name"])
-
-        seen = set()
-        dupes = []
-        for schema, table_list in table_dict.items():
-            for table_ in table_list:
-                qualified_table_name = schema + '.' + table_
-                if qualified_table_name in seen:
-                    dupes.append(qualified_table_name)
+        duplicates = []
+        for source, origins in zip(self.new_downstream_sources["sources"], self.downstream_table_origins):
+            first_origins = {}
+            for table, origin in zip(source["tables"], origins):
+                if not table:
+                    continue
+                if table["name"] in first_origins:
+                    duplicates.append((source["name"] + '.' + table["name"], origin, first_origins[table["name"]]))
                 else:
-                    seen.add(qualified_table_name)
+                    first_origins[table["name"]] = origin
 
-        return dupes
+        if duplicates and self.strict_duplicates:
+            raise DuplicateDownstreamSourceException(DUPLICATE_TABLE_MESSAGE.format(*duplicates[0]))
+        return duplicates
+
+    def check_downstream_sources_for_dupes(self):
+        """
+        Checks downstream sources for duplicate tables within the same schema.
+        """
+        return [table_name for table_name, _, _ in self.find_duplicate_downstream_tables()]
 
     def add_source_to_new_schema(self, current_raw_source, relation, raw_schema):
         """
         Add our table to the appropriate raw schema entry in our "sources" list
         in the new schema.
         """
-        for index, item in enumerate(self.new_schema["sources"]):
-            if item['name'] == raw_schema.schema_name:
-                source_index = index
-                break
-
+        source_index = self.new_schema_source_indexes[raw_schema.schema_name]
         self.new_schema["sources"][source_index]["database"] = raw_schema.database
 
         if current_raw_source:
@@ -148,12 +208,16 @@ class App:
             relation,
             current_safe_source,
             current_pii_source,
+            raw_schema=None,
             ):
         """
         Whenever there is no view generated for a relation, we should not add it to sources in the
         downstream project.  If we did, the source would be non-functional since it would not be
         backed by any real data!  No view is generated under the following condition: when the
         relation is unmanaged AND no manual models exist.
+
+        Tables are checked for duplicates as they are added. raw_schema, the schema the relation comes
+        from, is only used to say where a duplicate came from.
         """
         if relation.is_unmanaged and not relation.manual_safe_model_exists:
             logger.info(
@@ -171,27 +235,36 @@ class App:
                 ).format(relation.app, relation.relation)
             )
             return
-        for source in self.new_downstream_sources["sources"]:
-            if self.add_safe and source["name"] == self.safe_downstream_source_name:
-                if current_safe_source:
-                    source["tables"].append(current_safe_source)
-                else:
-                    source["tables"].append(
-                        {
-                            "name": relation.relation,
-                            "description": DEFAULT_DESCRIPTION,
-                        }
-                    )
-            elif self.add_pii and source["name"] == self.pii_downstream_source_name:
-                if current_pii_source:
-                    source["tables"].append(current_pii_source)
-                else:
-                    source["tables"].append(
-                        {
-                            "name": relation.relation,
-                            "description": DEFAULT_DESCRIPTION,
-                        }
-                    )
+        origin = relation.source_relation_name
+        if raw_schema:
+            origin = "{}.{}".format(raw_schema.schema_name, origin)
+        if relation.prefix:
+            origin = "{} (prefix {})".format(origin, relation.prefix)
+
+        if self.add_safe:
+            self._add_downstream_table(self.safe_downstream_source_name, relation, current_safe_source, origin)
+        if self.add_pii:
+            self._add_downstream_table(self.pii_downstream_source_name, relation, current_pii_source, origin)
+
+    def _add_downstream_table(self, source_name, relation, current_source, origin):
+        """
+        Add the current entry of a relation, or a new one, to the downstream sources of the given name.
+        """
+        indexes = self.downstream_source_indexes.get(source_name, [])
+        if indexes:
+            table_name = current_source["name"] if current_source else relation.relation
+            self._record_downstream_table(source_name, table_name, origin)
+        for index in indexes:
+            self.downstream_table_origins[index].append(origin)
+            if current_source:
+                self.new_downstream_sources["sources"][index]["tables"].append(current_source)
+            else:
+                self.new_downstream_sources["sources"][index]["tables"].append(
+                    {
+                        "name": relation.relation,
+                        "description": DEFAULT_DESCRIPTION,
+                    }
+                )
 
     def update_trifecta_models(self, relation, no_pii=False, pii_only=False):
         """
@@ -221,9 +294,9 @@ class App:
 
     def write_app_schema(self, design_file_path):
         """
-        Writes out the given schema file with the given string.
+        Writes out the given schema file, streaming the YAML for the new schema straight to it.
         """
         logger.info("Creating schema file: {}".format(design_file_path))
 
         with open(design_file_path, "w") as f:
-            f.write(yaml.safe_dump(self.new_schema, sort_keys=False))
+            dump_yaml(self.new_schema, f)
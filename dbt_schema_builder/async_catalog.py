@@ -0,0 +1,123 @@
+"""
+Class for fetching raw schema catalogs with asynchronous Snowflake queries
+"""
+import asyncio
+
+from .catalog import iter_cursor_rows
+from .strategy import FULL_STRATEGY
+
+# Seconds to wait between checks on a running query
+ASYNC_POLL_INTERVAL = 0.5
+DEFAULT_MAX_QUERIES_PER_DATABASE = 4
+
+
+class AsyncCatalogFetcher:
+    """
+    Class to represent catalog queries submitted to Snowflake asynchronously on a single connection.
+
+    Instead of tying up a thread and a connection per query, each query is submitted with execute_async and
+    polled until it finishes. At most max_queries_per_warehouse queries are in flight on the warehouse of the
+    connection, and at most max_queries_per_database against any one source database.
+    """
+
+    def __init__(
+        self, get_catalog_task, connection, max_queries_per_warehouse,
+        max_queries_per_database=DEFAULT_MAX_QUERIES_PER_DATABASE, poll_interval=ASYNC_POLL_INTERVAL,
+    ):
+        self.get_catalog_task = get_catalog_task
+        self.connection = connection
+        self.max_queries_per_warehouse = max(1, max_queries_per_warehouse or 1)
+        self.max_queries_per_database = max(1, max_queries_per_database or 1)
+        self.poll_interval = poll_interval
+        # Semaphores are created on first use, so that they belong to the running event loop
+        self.warehouse_limits = {}
+        self.database_limits = {}
+
+    @staticmethod
+    def _limit(limits, key, size):
+        """
+        Return the semaphore bounding the queries in flight for the given key.
+        """
+        if key not in limits:
+            limits[key] = asyncio.Semaphore(size)
+        return limits[key]
+
+    async def execute(self, source_database, sql):
+        """
+        Submit one catalog query, wait for it without blocking the event loop, and return its rows as dicts.
+
+        The database slot is taken before the warehouse one, so a query waiting on a busy database does not hold
+        a warehouse slot that a query against another database could use. Submitting, polling and reading the
+        results are all blocking calls to Snowflake, so they run on the default executor.
+        """
+        warehouse_limit = self._limit(self.warehouse_limits, self.connection.warehouse, self.max_queries_per_warehouse)
+        database_limit = self._limit(self.database_limits, source_database, self.max_queries_per_database)
+        loop = asyncio.get_running_loop()
+        async with database_limit, warehouse_limit:
+            cursor = self.connection.cursor()
+            query_id = await loop.run_in_executor(None, self._submit, cursor, sql)
+            while self.connection.is_still_running(
+                await loop.run_in_executor(None, self.connection.get_query_status_throw_if_error, query_id)
+            ):
+                await asyncio.sleep(self.poll_interval)
+
+        return await loop.run_in_executor(None, self._read_results, cursor, query_id)
+
+    @staticmethod
+    def _submit(cursor, sql):
+        """
+        Submit a query without waiting for it to run, and return its query id.
+        """
+        cursor.execute_async(sql)
+        return cursor.sfqid
+
+    @staticmethod
+    def _read_results(cursor, query_id):
+        """
+        Read the rows of a finished query.
+        """
+        cursor.get_results_from_sfqid(query_id)
+        return list(iter_cursor_rows(cursor))
+
+    async def fetch(self, source_database, schema, banned_column_names, table_filter=None):
+        """
+        Fetch the catalog rows of one raw schema, in TABLE_NAME, COLUMN_INDEX order.
+
+        Returns None if the schema has to be fetched with GetCatalogTask.run instead, because it needs
+        partitioning or another catalog engine was chosen.
+        """
+        sqls = self.get_catalog_task.get_catalog_sqls(
+            source_database, schema, banned_column_names, table_filter=table_filter
+        )
+        if sqls is None:
+            return None
+
+        try:
+            results = await asyncio.gather(*[self.execute(source_database, sql) for sql in sqls])
+        except Exception as e:  # pylint: disable=broad-except
+            if not self.get_catalog_task._is_too_much_data_error(e):  # pylint: disable=protected-access
+                raise
+            return None
+
+        rows = [row for result in results for row in result]
+        if len(results) > 1:
+            rows.sort(key=lambda row: (row["TABLE_NAME"], row["COLUMN_INDEX"]))
+        elif self.get_catalog_task.strategy_memo and (table_filter is None or table_filter.included_tables is None):
+            self.get_catalog_task.strategy_memo.record(source_database, schema, FULL_STRATEGY, len(rows))
+        return rows
+
+    async def fetch_all(self, raw_schema_names, banned_column_names, table_filters=None):
+        """
+        Fetch the catalogs of the given (database, schema) pairs concurrently, yielding ((database, schema), rows)
+        for each one as soon as it completes. rows is None for schemas that fetch could not handle.
+        """
+        table_filters = table_filters or {}
+
+        async def fetch_one(database, schema):
+            rows = await self.fetch(
+                database, schema, banned_column_names, table_filter=table_filters.get((database, schema))
+            )
+            return (database, schema), rows
+
+        for future in asyncio.as_completed([fetch_one(database, schema) for database, schema in raw_schema_names]):
+            yield await future
@@ -1,14 +1,20 @@
 """
 The schema builder tool
 """
+import asyncio
 import glob
 import os
 import re
-import string
+import threading
+from bisect import bisect_left
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import chain
+from operator import itemgetter
 from pathlib import Path
 
 import dbt.utils
-import yaml
 from dbt.adapters.factory import register_adapter
 from dbt.config import RuntimeConfig
 from dbt.events import AdapterLogger
@@ -17,10 +23,37 @@ from dbt.logger import log_manager
 from dbt.task.compile import CompileTask
 from dbt.task.generate import get_adapter
 
-from .app import App
-from .queries import COLUMN_NAME_FILTER, GET_RELATIONS_BY_SCHEMA_AND_START_LETTER_SQL, GET_RELATIONS_BY_SCHEMA_SQL
-from .relation import Relation
+from .app import DUPLICATE_TABLE_MESSAGE, App
+from .async_catalog import DEFAULT_MAX_QUERIES_PER_DATABASE, AsyncCatalogFetcher
+from .cache import CatalogCache
+from .catalog import ColumnCatalog, StringPool, iter_cursor_rows, iter_cursor_tuples, iter_table_columns
+from .connections import CatalogConnectionPool
+from .queries import (
+    COLUMN_NAME_FILTER,
+    GET_RELATIONS_BY_SCHEMA_AND_TABLE_NAME_SQL,
+    GET_RELATIONS_BY_SCHEMA_SQL,
+    GET_RELATIONS_BY_SCHEMAS_SQL,
+    GET_TABLE_NAMES_SQL,
+    GET_TABLES_LAST_ALTERED_SQL,
+    SHOW_COLUMNS_IN_SCHEMA_SQL,
+    SHOW_COLUMNS_RESULT_SCAN_SQL,
+    TABLE_NAME_BEFORE_FILTER,
+    TABLE_NAME_FROM_FILTER,
+    TABLE_NAME_IN_FILTER,
+    TABLE_NAME_NOT_IN_FILTER,
+)
+from .relation import (
+    CurrentSources,
+    DownstreamSourcesAllowList,
+    ManualModels,
+    RedactionPlan,
+    Relation,
+    UnmanagedTableMatcher,
+)
 from .schema import InvalidConfigurationException, Schema
+from .snapshot import CatalogSnapshot, write_catalog_snapshot
+from .strategy import CATALOG_STRATEGY_FILE_NAME, FULL_STRATEGY, PARTITIONED_STRATEGY, CatalogStrategyMemo
+from .yaml_io import dump_yaml, load_yaml
 
 # Set up the dbt logger
 log_manager.set_path(None)
@@ -29,8 +62,23 @@ log_manager.set_path(None)
 logger = AdapterLogger("Snowflake")
 
 DEFAULT_DESCRIPTION = "TODO: Replace me"
-SQL_ESCAPE_CHAR = "^"
 LOCAL_PATH = os.path.abspath(os.path.dirname(__file__))
+CATALOG_CONNECTION_NAME = "generate_catalog"
+# The TABLE_NAME range covering every table of a schema, used to partition catalog queries
+WHOLE_TABLE_NAME_RANGE = (None, None)
+# Number of table names to put in each TABLE_NAME IN (...) list
+TABLE_NAME_CHUNK_SIZE = 1000
+
+# Ways GetCatalogTask can read the columns of a schema
+INFORMATION_SCHEMA_ENGINE = "information_schema"
+SHOW_COLUMNS_ENGINE = "show"
+CATALOG_ENGINES = (INFORMATION_SCHEMA_ENGINE, SHOW_COLUMNS_ENGINE)
+# SHOW commands return at most this many rows
+SHOW_COLUMNS_ROW_LIMIT = 10000
+
+# Ways GetCatalogTask.get_fetch_plan says a schema can be fetched without going through run()
+SINGLE_QUERY_PLAN = "single_query"
+INCLUDED_TABLES_PLAN = "included_tables"
 
 
 class InvalidDatabaseException(Exception):
@@ -55,6 +103,24 @@ class GetCatalogTask(CompileTask):
         }
     }
     """
+    def __init__(
+        self, args, config, manifest, strategy_memo=None, catalog_engine=INFORMATION_SCHEMA_ENGINE,
+        connection_pool=None,
+    ):
+        super().__init__(args, config, manifest)
+        self.strategy_memo = strategy_memo
+        self.catalog_engine = catalog_engine
+        self.connection_pool = connection_pool
+
+    def _connection_named(self, adapter, connection_name):
+        """
+        Return a context manager that runs queries on the named connection, kept open by the connection pool
+        if there is one.
+        """
+        if self.connection_pool is not None:
+            return self.connection_pool.connection_named(connection_name)
+        return adapter.connection_named(connection_name)
+
     def _get_column_name_filter(self, source_database, banned_column_names):
         """
         Create the SQL string to omit banned_column_names from the Snowflake metadata queries.
@@ -69,110 +135,704 @@ class GetCatalogTask(CompileTask):
             ),
         )
 
-    def fetch_full_catalog(self, adapter, source_database, schema, banned_column_names):
+    @staticmethod
+    def _validate_schema_name(schema):
         """
-        Query Snowflake for all columns in the given schema in one query.
+        Check for any non-word characters that might indicate a SQL injection attack.
         """
-        with adapter.connection_named("generate_catalog"):
-            sql = GET_RELATIONS_BY_SCHEMA_SQL.format(
-                database=source_database,
-                schema=schema,
-                column_name_filter=self._get_column_name_filter(source_database, banned_column_names),
+        if re.search("[^a-zA-Z0-9_]", schema):
+            raise Exception(  # pylint: disable=broad-exception-raised
+                "Non-word character in schema name '{}'! Possible SQL injection?".format(
+                    schema
+                )
             )
-            try:
+
+    @staticmethod
+    def _is_too_much_data_error(e):
+        """
+        Return True if the exception, or the database error it was raised from, is Snowflake refusing to return
+        an oversized INFORMATION_SCHEMA result.
+        """
+        while e is not None:
+            if "Information schema query returned too much data" in str(e):
+                return True
+            e = e.__cause__
+        return False
+
+    def _iter_catalog_query(self, adapter, source_database, sql, columns=None):
+        """
+        Run one catalog query on the current connection and yield its rows as dicts.
+
+        The rows are read straight off the Snowflake cursor, skipping the agate Table that adapter.execute
+        builds, unless the adapter does not expose its connection manager. The query only runs once the first
+        row is asked for, so errors are raised from there.
+
+        If a tuple of at least two column names is given, rows are instead yielded as tuples of only those
+        columns, in that order, which saves building a dict for every row when the caller only reads them by
+        position.
+        """
+        add_query = getattr(getattr(adapter, "connections", None), "add_query", None)
+        cursor = catalog_table = None
+        try:
+            if add_query is not None:
+                _, cursor = add_query(sql)
+            else:
                 _, catalog_table = adapter.execute(sql, fetch=True)
-            except DatabaseException as e:
-                raise InvalidDatabaseException(
-                    "The database {} was not found in Snowflake. Make sure schema_config.yml file is "
-                    "valid and that the Snowflake user has access to the database in question".format(
-                        source_database
-                    )
-                ) from e
+        except DatabaseException as e:
+            raise InvalidDatabaseException(
+                "The database {} was not found in Snowflake. Make sure schema_config.yml file is "
+                "valid and that the Snowflake user has access to the database in question".format(
+                    source_database
+                )
+            ) from e
+
+        if cursor is not None:
+            if columns is None:
+                yield from iter_cursor_rows(cursor)
+                return
+            column_names = [column[0] for column in cursor.description]
+            yield from map(
+                itemgetter(*[column_names.index(column) for column in columns]), iter_cursor_tuples(cursor)
+            )
+            return
 
-        catalog_data = [
-            dict(
+        for row in catalog_table:
+            row = dict(
                 zip(catalog_table.column_names, map(dbt.utils._coerce_decimal, row))  # pylint: disable=protected-access
             )
-            for row in catalog_table
-        ]
+            yield row if columns is None else tuple(row[column] for column in columns)
+
+    def _execute_catalog_query(self, adapter, source_database, sql):
+        """
+        Run one catalog query on the current connection and return its rows as dicts.
+        """
+        return list(self._iter_catalog_query(adapter, source_database, sql))
+
+    def _get_full_catalog_sql(self, source_database, schema, banned_column_names, excluded_tables=()):
+        """
+        Create the SQL string querying all columns in the given schema, apart from excluded_tables.
+        """
+        return GET_RELATIONS_BY_SCHEMA_SQL.format(
+            database=source_database,
+            schema=schema,
+            table_name_filter=self._get_table_name_not_in_filter(source_database, excluded_tables),
+            column_name_filter=self._get_column_name_filter(source_database, banned_column_names),
+        )
+
+    def fetch_full_catalog(
+        self, adapter, source_database, schema, banned_column_names, connection_name=CATALOG_CONNECTION_NAME,
+        excluded_tables=()
+    ):
+        """
+        Query Snowflake for all columns in the given schema, apart from excluded_tables, in one query.
+        """
+        with self._connection_named(adapter, connection_name):
+            sql = self._get_full_catalog_sql(source_database, schema, banned_column_names, excluded_tables)
+            catalog_data = self._execute_catalog_query(adapter, source_database, sql)
 
         return catalog_data
 
-    def fetch_catalog_by_letter(self, adapter, source_database, schema, banned_column_names):
+    def fetch_catalog_with_show(
+        self, adapter, source_database, schema, banned_column_names, connection_name=CATALOG_CONNECTION_NAME
+    ):
+        """
+        Query Snowflake for all columns in the given schema with SHOW COLUMNS instead of INFORMATION_SCHEMA.
+
+        SHOW COLUMNS is answered from metadata and never fails for returning too much data, but it is capped at
+        SHOW_COLUMNS_ROW_LIMIT rows, so None is returned when the output may have been cut short. When there are
+        banned columns, the SHOW output is read back through RESULT_SCAN to filter them out in Snowflake.
+
+        SHOW COLUMNS has no ordinal position and the RESULT_SCAN has no ORDER BY to give it one, so COLUMN_INDEX
+        is only the position at which each column arrived. That is usually, but not guaranteed to be, the order
+        of the columns in the table, and it may differ from the ORDINAL_POSITION order that the
+        INFORMATION_SCHEMA engine uses.
+        """
+        with self._connection_named(adapter, connection_name):
+            sql = SHOW_COLUMNS_IN_SCHEMA_SQL.format(database=source_database, schema=schema)
+            if banned_column_names:
+                try:
+                    response, _ = adapter.execute(sql, fetch=False)
+                except DatabaseException as e:
+                    raise InvalidDatabaseException(
+                        "The schema {}.{} was not found in Snowflake. Make sure schema_config.yml file is "
+                        "valid and that the Snowflake user has access to the schema in question".format(
+                            source_database, schema
+                        )
+                    ) from e
+                show_rows = response.rows_affected
+                sql = SHOW_COLUMNS_RESULT_SCAN_SQL.format(
+                    query_id=response.query_id,
+                    banned_column_names=",".join(["'{}'".format(x) for x in banned_column_names]),
+                )
+                rows = self._execute_catalog_query(adapter, source_database, sql)
+            else:
+                rows = self._execute_catalog_query(adapter, source_database, sql)
+                show_rows = len(rows)
+
+        if show_rows >= SHOW_COLUMNS_ROW_LIMIT:
+            return None
+
+        return self._normalise_show_columns(rows)
+
+    @staticmethod
+    def _normalise_show_columns(rows):
+        """
+        Turn SHOW COLUMNS output into TABLE_NAME, COLUMN_NAME, COLUMN_INDEX rows in TABLE_NAME, COLUMN_INDEX order.
+
+        COLUMN_INDEX is made up from the order the rows arrive in, see fetch_catalog_with_show.
+        """
+        column_indexes = {}
+        catalog_data = []
+        for row in rows:
+            table_name = row["TABLE_NAME"] if "TABLE_NAME" in row else row["table_name"]
+            column_name = row["COLUMN_NAME"] if "COLUMN_NAME" in row else row["column_name"]
+            column_indexes[table_name] = column_indexes.get(table_name, 0) + 1
+            catalog_data.append(
+                {"TABLE_NAME": table_name, "COLUMN_NAME": column_name, "COLUMN_INDEX": column_indexes[table_name]}
+            )
+
+        # Stable, so columns keep their order within each table
+        catalog_data.sort(key=lambda row: row["TABLE_NAME"])
+        return catalog_data
+
+    @staticmethod
+    def split_partition(partition, table_names):
+        """
+        Split a table name partition in two at the median of the given sorted table names that fall inside it.
+
+        Partitions are (low, high) TABLE_NAME ranges holding the names from low up to but excluding high, where
+        None leaves that end open, so the two halves always cover everything the parent did. Returns None if the
+        partition holds fewer than two of the table names and cannot be split any further.
+        """
+        low, high = partition
+        start = bisect_left(table_names, low) if low is not None else 0
+        end = bisect_left(table_names, high) if high is not None else len(table_names)
+        if end - start < 2:
+            return None
+
+        middle = table_names[(start + end) // 2]
+        return [(low, middle), (middle, high)]
+
+    @staticmethod
+    def _get_table_name_range_filter(source_database, partition):
+        """
+        Create the SQL string restricting a catalog query to one table name partition.
+        """
+        low, high = partition
+        table_name_filter = ""
+        if low is not None:
+            table_name_filter += TABLE_NAME_FROM_FILTER.format(
+                database=source_database,
+                table_name=low.replace("'", "''"),
+            )
+        if high is not None:
+            table_name_filter += TABLE_NAME_BEFORE_FILTER.format(
+                database=source_database,
+                table_name=high.replace("'", "''"),
+            )
+        return table_name_filter
+
+    def _fetch_table_names(self, adapter, source_database, schema, excluded_tables=()):
+        """
+        Query Snowflake for the sorted names of the tables in the given schema, apart from excluded_tables, on the
+        current connection.
+
+        This only reads INFORMATION_SCHEMA.TABLES, which is far cheaper than reading the columns.
+        """
+        sql = GET_TABLE_NAMES_SQL.format(
+            database=source_database,
+            schema=schema,
+        )
+        excluded_tables = set(excluded_tables)
+        return sorted(
+            row["TABLE_NAME"] for row in self._iter_catalog_query(adapter, source_database, sql)
+            if row["TABLE_NAME"] not in excluded_tables
+        )
+
+    def fetch_catalog_by_range(
+        self, adapter, source_database, schema, banned_column_names, partitions=None,
+        connection_name=CATALOG_CONNECTION_NAME, used_partitions=None, excluded_tables=()
+    ):
         """
         Query Snowflake for all columns in the given schema over several queries.
 
         Snowflake has an issue when too much data is returned from these kinds of queries that requires us to break
         up the queries into smaller chunks sometimes. We fall back on this method when fetch_full_catalog fails.
+
+        Table names are partitioned into ranges, starting from the given partitions (by default, the two halves of
+        the whole schema). Any range that is still too large is halved again at its median table name, so only
+        the heavy ranges cost extra queries. The table names to split at are read from INFORMATION_SCHEMA.TABLES
+        the first time they are needed. The merged rows are returned in TABLE_NAME, COLUMN_INDEX order.
+
+        If used_partitions is given, the (low, high, row count) of every partition that was fetched successfully
+        is appended to it. Tables in excluded_tables are left out of every partition.
         """
-        with adapter.connection_named("generate_catalog"):
-            all_letters = []
+        column_name_filter = self._get_column_name_filter(source_database, banned_column_names)
+        excluded_tables_filter = self._get_table_name_not_in_filter(source_database, excluded_tables)
+        catalog_data = []
 
-            for start_letter in "_{}".format(string.ascii_uppercase):
-                # Need to escape underscores in LIKE. The ^ is less syntax confusing than backslash.
-                if start_letter == "_":
-                    start_letter = SQL_ESCAPE_CHAR + start_letter
+        with self._connection_named(adapter, connection_name):
+            table_names = None
+            if partitions is None:
+                table_names = self._fetch_table_names(adapter, source_database, schema, excluded_tables)
+                partitions = self.split_partition(WHOLE_TABLE_NAME_RANGE, table_names) or [WHOLE_TABLE_NAME_RANGE]
+            pending = deque(partitions)
 
-                # Get the list of table names for this schema
-                sql = GET_RELATIONS_BY_SCHEMA_AND_START_LETTER_SQL.format(
+            while pending:
+                partition = pending.popleft()
+                sql = GET_RELATIONS_BY_SCHEMA_AND_TABLE_NAME_SQL.format(
                     database=source_database,
                     schema=schema,
-                    start_letter=start_letter,
-                    column_name_filter=self._get_column_name_filter(
-                        source_database, banned_column_names
+                    table_name_filter=(
+                        self._get_table_name_range_filter(source_database, partition) + excluded_tables_filter
                     ),
-                    escape_char=SQL_ESCAPE_CHAR,
+                    column_name_filter=column_name_filter,
                 )
                 try:
-                    _, catalog_tables = adapter.execute(sql, fetch=True)
-                except DatabaseException as e:
-                    raise InvalidDatabaseException(
-                        "The database {} was not found in Snowflake. Make sure schema_config.yml file is "
-                        "valid and that the Snowflake user has access to the database in question".format(
-                            source_database
+                    partition_data = self._execute_catalog_query(adapter, source_database, sql)
+                except Exception as e:  # pylint: disable=broad-except
+                    if not self._is_too_much_data_error(e):
+                        raise
+                    if table_names is None:
+                        table_names = self._fetch_table_names(adapter, source_database, schema, excluded_tables)
+                    halves = self.split_partition(partition, table_names)
+                    if halves is None:
+                        raise
+                    logger.info(
+                        "Tables from {} up to {} too large to fetch at once, splitting in two.".format(
+                            partition[0] or "the first", partition[1] or "the last"
                         )
-                    ) from e
-                all_letters.append(catalog_tables)
+                    )
+                    pending.extendleft(reversed(halves))
+                    continue
+                catalog_data.extend(partition_data)
+                if used_partitions is not None:
+                    used_partitions.append((partition[0], partition[1], len(partition_data)))
+
+        catalog_data.sort(key=lambda row: (row["TABLE_NAME"], row["COLUMN_INDEX"]))
+
+        return catalog_data
+
+    def fetch_catalog_for_schemas(
+        self, adapter, source_database, schemas, banned_column_names, connection_name=CATALOG_CONNECTION_NAME
+    ):
+        """
+        Query Snowflake for all columns of several schemas in the same database in one query.
 
+        Returns a dict mapping each schema name to its rows, in the same form fetch_full_catalog returns them.
+        """
+        with self._connection_named(adapter, connection_name):
+            sql = GET_RELATIONS_BY_SCHEMAS_SQL.format(
+                database=source_database,
+                schemas=",".join(["'{}'".format(schema) for schema in schemas]),
+                column_name_filter=self._get_column_name_filter(source_database, banned_column_names),
+            )
+            rows = self._execute_catalog_query(adapter, source_database, sql)
+
+        catalog_data = {schema: [] for schema in schemas}
+        for row in rows:
+            catalog_data[row.pop("TABLE_SCHEMA")].append(row)
+
+        return catalog_data
+
+    def fetch_last_altered(self, adapter, source_database, schema, connection_name=CATALOG_CONNECTION_NAME):
+        """
+        Query Snowflake for the LAST_ALTERED time of every table in the given schema.
+
+        This only reads INFORMATION_SCHEMA.TABLES, which is far cheaper than reading the columns.
+        """
+        with self._connection_named(adapter, connection_name):
+            sql = GET_TABLES_LAST_ALTERED_SQL.format(
+                database=source_database,
+                schema=schema,
+            )
+            rows = self._execute_catalog_query(adapter, source_database, sql)
+
+        return {row["TABLE_NAME"]: str(row["LAST_ALTERED"]) for row in rows}
+
+    @staticmethod
+    def _get_table_name_in_filter(source_database, table_names):
+        """
+        Create the SQL string restricting a catalog query to the given table names.
+        """
+        return TABLE_NAME_IN_FILTER.format(
+            database=source_database,
+            table_names=",".join(["'{}'".format(name.replace("'", "''")) for name in table_names]),
+        )
+
+    @staticmethod
+    def _get_table_name_not_in_filter(source_database, table_names):
+        """
+        Create the SQL string leaving the given table names out of a catalog query. Long lists are split over
+        several NOT IN predicates of TABLE_NAME_CHUNK_SIZE names each.
+        """
+        table_names = sorted(table_names)
+        return "".join(
+            TABLE_NAME_NOT_IN_FILTER.format(
+                database=source_database,
+                table_names=",".join(
+                    ["'{}'".format(name.replace("'", "''")) for name in table_names[i:i + TABLE_NAME_CHUNK_SIZE]]
+                ),
+            )
+            for i in range(0, len(table_names), TABLE_NAME_CHUNK_SIZE)
+        )
+
+    def fetch_catalog_for_tables(
+        self, adapter, source_database, schema, table_names, banned_column_names,
+        connection_name=CATALOG_CONNECTION_NAME
+    ):
+        """
+        Query Snowflake for the columns of only the given tables of a schema, TABLE_NAME_CHUNK_SIZE tables at a time.
+        """
         catalog_data = []
 
-        for letter in all_letters:
-            catalog_data.extend(
-                [
-                    dict(zip(letter.column_names, map(_coerce_decimal, row)))  # pylint: disable=undefined-variable
-                    for row in letter
-                ]
+        with self._connection_named(adapter, connection_name):
+            for sql in self._get_tables_catalog_sqls(source_database, schema, table_names, banned_column_names):
+                catalog_data.extend(self._execute_catalog_query(adapter, source_database, sql))
+
+        return catalog_data
+
+    def _get_tables_catalog_sqls(self, source_database, schema, table_names, banned_column_names):
+        """
+        Create the SQL strings querying the columns of the given tables, TABLE_NAME_CHUNK_SIZE tables per query.
+        """
+        column_name_filter = self._get_column_name_filter(source_database, banned_column_names)
+        return [
+            GET_RELATIONS_BY_SCHEMA_AND_TABLE_NAME_SQL.format(
+                database=source_database,
+                schema=schema,
+                table_name_filter=self._get_table_name_in_filter(
+                    source_database, table_names[i:i + TABLE_NAME_CHUNK_SIZE]
+                ),
+                column_name_filter=column_name_filter,
+            )
+            for i in range(0, len(table_names), TABLE_NAME_CHUNK_SIZE)
+        ]
+
+    def get_fetch_plan(self, source_database, schema, table_filter=None):
+        """
+        Return how the catalog of the given schema can be fetched without going through run().
+
+        That is SINGLE_QUERY_PLAN when one INFORMATION_SCHEMA query over the whole schema, less any excluded
+        tables, is expected to work, and INCLUDED_TABLES_PLAN when only the tables of an INCLUDE list are read.
+        None means it has to be fetched with run(): when the catalog engine is not INFORMATION_SCHEMA, or when
+        the strategy memo says the schema needs partitioning.
+        """
+        if self.catalog_engine != INFORMATION_SCHEMA_ENGINE:
+            return None
+        if table_filter is not None and table_filter.included_tables is not None:
+            return INCLUDED_TABLES_PLAN
+        if self.strategy_memo and self.strategy_memo.get_partitions(source_database, schema):
+            return None
+        return SINGLE_QUERY_PLAN
+
+    def get_catalog_sqls(self, source_database, schema, banned_column_names, table_filter=None):
+        """
+        Return the SQL strings that together fetch the catalog of the given schema without partitioning, or None
+        if it has to be fetched with run(), as decided by get_fetch_plan.
+        """
+        self._validate_schema_name(schema)
+
+        plan = self.get_fetch_plan(source_database, schema, table_filter)
+        if plan is None:
+            return None
+        if plan == INCLUDED_TABLES_PLAN:
+            return self._get_tables_catalog_sqls(
+                source_database, schema, sorted(table_filter.included_tables), banned_column_names
+            )
+        return [
+            self._get_full_catalog_sql(
+                source_database, schema, banned_column_names,
+                table_filter.excluded_tables if table_filter is not None else (),
+            )
+        ]
+
+    @contextmanager
+    def native_connection(self, connection_name=CATALOG_CONNECTION_NAME):
+        """
+        Yield the Snowflake connector connection behind the named adapter connection, for submitting queries
+        asynchronously.
+        """
+        adapter = get_adapter(self.config)
+        with self._connection_named(adapter, connection_name):
+            yield adapter.connections.get_thread_connection().handle
+
+    def run_incremental(
+        self, source_database, schema, banned_column_names, snapshot=None, connection_name=CATALOG_CONNECTION_NAME,
+        table_filter=None
+    ):
+        """
+        Refresh a previously fetched catalog, only fetching the columns of tables that changed since.
+
+        snapshot is the (rows, last_altered) of the previous fetch, where last_altered maps each table name to
+        its LAST_ALTERED time then. Tables that are new or have a different LAST_ALTERED time are fetched again,
+        tables that no longer exist are dropped, and the rest are kept from the snapshot. Without a snapshot the
+        whole schema is fetched. Only tables passing table_filter, if given, are considered.
+
+        Returns the rows in TABLE_NAME, COLUMN_INDEX order along with the new last_altered dict.
+        """
+        self._validate_schema_name(schema)
+
+        adapter = get_adapter(self.config)
+
+        # Read the LAST_ALTERED times first, so that anything altered while the columns are being read gets
+        # picked up on the next refresh.
+        last_altered = self.fetch_last_altered(adapter, source_database, schema, connection_name=connection_name)
+        if table_filter is not None:
+            last_altered = {
+                table_name: altered for table_name, altered in last_altered.items() if table_name in table_filter
+            }
+
+        if snapshot is None:
+            catalog = self.run(
+                source_database, schema, banned_column_names, connection_name=connection_name,
+                table_filter=table_filter,
             )
+            return catalog, last_altered
+
+        cached_rows, cached_last_altered = snapshot
+        changed_tables = [
+            table_name for table_name, altered in last_altered.items()
+            if cached_last_altered.get(table_name) != altered
+        ]
+        logger.info(
+            "{} of {} tables in {}.{} changed since the cached catalog".format(
+                len(changed_tables), len(last_altered), source_database, schema
+            )
+        )
+
+        changed_table_set = set(changed_tables)
+        catalog = [
+            row for row in cached_rows
+            if row["TABLE_NAME"] in last_altered and row["TABLE_NAME"] not in changed_table_set
+        ]
+        if changed_tables:
+            try:
+                changed_rows = self.fetch_catalog_for_tables(
+                    adapter, source_database, schema, changed_tables, banned_column_names,
+                    connection_name=connection_name,
+                )
+            except Exception as e:  # pylint: disable=broad-except
+                if not self._is_too_much_data_error(e):
+                    raise
+                logger.info(
+                    "Changed tables too large to fetch at once, fetching by table name range instead."
+                )
+                changed_rows = self._fetch_changed_tables_by_range(
+                    adapter, source_database, schema, changed_table_set, banned_column_names,
+                    connection_name=connection_name, table_filter=table_filter,
+                )
+            catalog.extend(changed_rows)
+            catalog.sort(key=lambda row: (row["TABLE_NAME"], row["COLUMN_INDEX"]))
+
+        return catalog, last_altered
+
+    def _fetch_changed_tables_by_range(
+        self, adapter, source_database, schema, changed_table_set, banned_column_names,
+        connection_name=CATALOG_CONNECTION_NAME, table_filter=None
+    ):
+        """
+        Query Snowflake for the columns of the changed tables of a schema by table name range, for when they are
+        too large to fetch by name.
+
+        If the strategy memo has partitions for the schema, only the ones holding a changed table are fetched.
+        The rows of tables that did not change are dropped.
+        """
+        partitions = self.strategy_memo.get_partitions(source_database, schema) if self.strategy_memo else None
+        if partitions:
+            partitions = [
+                (low, high) for low, high in partitions
+                if any(
+                    (low is None or table_name >= low) and (high is None or table_name < high)
+                    for table_name in changed_table_set
+                )
+            ]
+        excluded_tables = ()
+        if table_filter is not None and table_filter.included_tables is None:
+            excluded_tables = table_filter.excluded_tables
+
+        catalog = self.fetch_catalog_by_range(
+            adapter, source_database, schema, banned_column_names, partitions=partitions or None,
+            connection_name=connection_name, excluded_tables=excluded_tables,
+        )
+        return [row for row in catalog if row["TABLE_NAME"] in changed_table_set]
+
+    def run_batch(
+        self, source_database, schemas, banned_column_names, connection_name=CATALOG_CONNECTION_NAME, table_filters=None
+    ):
+        """
+        Fetch the catalogs of several schemas in the same database with a single INFORMATION_SCHEMA query.
+
+        If Snowflake refuses to return that much data at once, each schema is fetched on its own with run().
+        Schemas that the strategy memo says need partitioning, and schemas with a filter in table_filters (a dict
+        of schema name to TableFilter), are left out of the batched query altogether. With the SHOW COLUMNS
+        engine, which works one schema at a time, every schema is fetched with run().
+        """
+        for schema in schemas:
+            self._validate_schema_name(schema)
+        table_filters = table_filters or {}
+
+        adapter = get_adapter(self.config)
+
+        catalog_data = {}
+        batched_schemas = [
+            schema for schema in schemas
+            if self.get_fetch_plan(source_database, schema, table_filters.get(schema)) == SINGLE_QUERY_PLAN
+            and (schema not in table_filters or table_filters[schema].is_unfiltered)
+        ]
+        if batched_schemas:
+            try:
+                catalog_data = self.fetch_catalog_for_schemas(
+                    adapter, source_database, batched_schemas, banned_column_names, connection_name=connection_name
+                )
+            except Exception as e:  # pylint: disable=broad-except
+                if not self._is_too_much_data_error(e):
+                    raise
+                logger.info(
+                    "Schemas in {} too large to fetch at once, fetching one schema at a time instead.".format(
+                        source_database
+                    )
+                )
+
+        for schema in schemas:
+            if schema not in catalog_data:
+                catalog_data[schema] = self.run(
+                    source_database, schema, banned_column_names, connection_name=connection_name,
+                    table_filter=table_filters.get(schema),
+                )
 
         return catalog_data
 
-    def run(self, source_database, schema, banned_column_names):  # pylint: disable=arguments-differ
+    def run(  # pylint: disable=arguments-differ
+        self, source_database, schema, banned_column_names, connection_name=CATALOG_CONNECTION_NAME,
+        table_filter=None
+    ):
         """
         Run the task.
+
+        Each thread fetching catalogs concurrently should pass its own connection_name so that dbt keeps a
+        separate named connection for it. If a table_filter is given, tables it leaves out are left out of the
+        catalog queries too.
         """
-        # Check for any non-word characters that might indicate a SQL injection attack
-        if re.search("[^a-zA-Z0-9_]", schema):
-            raise Exception(  # pylint: disable=broad-exception-raised
-                "Non-word character in schema name '{}'! Possible SQL injection?".format(
-                    schema
-                )
-            )
+        self._validate_schema_name(schema)
 
         adapter = get_adapter(self.config)
 
-        try:
-            catalog = self.fetch_full_catalog(adapter, source_database, schema, banned_column_names)
-        except Exception as e:  # pylint: disable=broad-except
-            # TODO: Catch a less-broad exception than Exception.
-            if "Information schema query returned too much data" not in str(e):
-                raise
+        if self.catalog_engine == SHOW_COLUMNS_ENGINE:
+            catalog = self.fetch_catalog_with_show(
+                adapter, source_database, schema, banned_column_names, connection_name=connection_name
+            )
+            if catalog is not None:
+                if table_filter is not None:
+                    catalog = [row for row in catalog if row["TABLE_NAME"] in table_filter]
+                return catalog
+            logger.warning(
+                "SHOW COLUMNS output for {}.{} reached {} rows and may be incomplete, "
+                "reading INFORMATION_SCHEMA instead.".format(source_database, schema, SHOW_COLUMNS_ROW_LIMIT)
+            )
+
+        excluded_tables = ()
+        if table_filter is not None and table_filter.included_tables is not None:
+            try:
+                catalog = self.fetch_catalog_for_tables(
+                    adapter, source_database, schema, sorted(table_filter.included_tables), banned_column_names,
+                    connection_name=connection_name,
+                )
+            except Exception as e:  # pylint: disable=broad-except
+                if not self._is_too_much_data_error(e):
+                    raise
+                logger.info(
+                    "Included tables too large to fetch at once, fetching the whole schema instead."
+                )
+            else:
+                catalog.sort(key=lambda row: (row["TABLE_NAME"], row["COLUMN_INDEX"]))
+                return catalog
+        elif table_filter is not None:
+            excluded_tables = table_filter.excluded_tables
+
+        partitions = self.strategy_memo.get_partitions(source_database, schema) if self.strategy_memo else None
+        if partitions:
             logger.info(
-                "Schema too large to fetch at once, fetching by first letter instead."
+                "Schema needed partitioning last time, fetching by table name range."
+            )
+        else:
+            try:
+                catalog = self.fetch_full_catalog(
+                    adapter, source_database, schema, banned_column_names, connection_name=connection_name,
+                    excluded_tables=excluded_tables,
+                )
+            except Exception as e:  # pylint: disable=broad-except
+                # TODO: Catch a less-broad exception than Exception.
+                if not self._is_too_much_data_error(e):
+                    raise
+                logger.info(
+                    "Schema too large to fetch at once, fetching by table name range instead."
+                )
+            else:
+                if self.strategy_memo:
+                    self.strategy_memo.record(source_database, schema, FULL_STRATEGY, len(catalog))
+                return catalog
+
+        used_partitions = []
+        catalog = self.fetch_catalog_by_range(
+            adapter, source_database, schema, banned_column_names, partitions=partitions,
+            connection_name=connection_name, used_partitions=used_partitions, excluded_tables=excluded_tables,
+        )
+        if self.strategy_memo:
+            self.strategy_memo.record(
+                source_database, schema, PARTITIONED_STRATEGY, len(catalog), partitions=used_partitions
             )
-            catalog = self.fetch_catalog_by_letter(adapter, source_database, schema, banned_column_names)
 
         return catalog
 
+    def stream(
+        self, source_database, schema, banned_column_names, connection_name=CATALOG_CONNECTION_NAME,
+        table_filter=None
+    ):
+        """
+        Yield the (table_name, [column names]) pairs of the given schema, in TABLE_NAME order.
+
+        When the schema can be read with one INFORMATION_SCHEMA query, each table is yielded as soon as its
+        columns have come off the cursor, so only one table is held in memory at a time. Every other way of
+        fetching the catalog needs all of its rows before they can be ordered, so it goes through run() instead.
+        """
+        self._validate_schema_name(schema)
+
+        if self.get_fetch_plan(source_database, schema, table_filter) == SINGLE_QUERY_PLAN:
+            adapter = get_adapter(self.config)
+            with self._connection_named(adapter, connection_name):
+                sql = self._get_full_catalog_sql(
+                    source_database, schema, banned_column_names,
+                    table_filter.excluded_tables if table_filter is not None else (),
+                )
+                rows = self._iter_catalog_query(
+                    adapter, source_database, sql, columns=("TABLE_NAME", "COLUMN_NAME")
+                )
+                try:
+                    first_row = next(rows, None)
+                except Exception as e:  # pylint: disable=broad-except
+                    if not self._is_too_much_data_error(e):
+                        raise
+                    logger.info(
+                        "Schema too large to fetch at once, fetching by table name range instead."
+                    )
+                else:
+                    row_count = 0
+                    if first_row is not None:
+                        for table_name, column_names in iter_table_columns(chain([first_row], rows), 0, 1):
+                            row_count += len(column_names)
+                            yield table_name, column_names
+                    if self.strategy_memo:
+                        self.strategy_memo.record(source_database, schema, FULL_STRATEGY, row_count)
+                    return
+
+        yield from iter_table_columns(
+            self.run(
+                source_database, schema, banned_column_names, connection_name=connection_name,
+                table_filter=table_filter,
+            )
+        )
+
 
 class SchemaBuilder:
     """
@@ -182,19 +842,41 @@ class SchemaBuilder:
                  source_path,
                  source_project_path,
                  destination_project_path,
-                 get_catalog_task
+                 get_catalog_task,
+                 catalog_cache=None,
+                 incremental_catalog=False,
                  ):
         self.source_path = source_path
         self.source_project_path = source_project_path
         self.destination_project_path = destination_project_path
         self.get_catalog_task = get_catalog_task
-        self.redactions = self.get_redactions()
+        self.catalog_cache = catalog_cache
+        self.incremental_catalog = incremental_catalog and catalog_cache is not None
+        self.redactions = RedactionPlan(self.get_redactions())
+        for key in self.redactions.skipped_keys:
+            logger.warning(
+                'Skipping redactions.yml key {!r}, which does not name "<SCHEMA>.<TABLE>" with a mapping of columns '
+                'or "<SCHEMA>.<TABLE>.<COLUMN>".'.format(key)
+            )
         self.snowflake_keywords = self.get_snowflake_keywords()
         self.banned_column_names = self.get_banned_columns()
-        self.unmanaged_tables = self.get_unmanaged_tables()
-        self.downstream_sources_allow_list = self.get_downstream_sources_allow_list()
+        self.unmanaged_tables = UnmanagedTableMatcher(self.get_unmanaged_tables())
+        self.downstream_sources_allow_list = DownstreamSourcesAllowList(self.get_downstream_sources_allow_list())
 
         self.app_schema_configs = self.get_app_schema_configs()
+        self.table_filters = self.get_table_filters()
+
+        # Relations fetched during this run, keyed by (database, schema). The banned column names are the same
+        # for the whole run, so each raw schema is fetched once however many apps use it.
+        self.catalogs = {}
+        # How many raw schema catalogs were fetched from Snowflake or read from the catalog cache, and how many
+        # times one of them was reused. Catalogs are fetched on worker threads, so the counts are kept under a lock.
+        self.catalog_stats = {"fetched": 0, "cached": 0, "reused": 0}
+        self.catalog_stats_lock = threading.Lock()
+        # Keys of the catalogs that have been handed to an app already, so only later lookups count as reuse
+        self.served_catalogs = set()
+        # Column names shared by the catalogs of every raw schema
+        self.column_pool = StringPool()
 
     def get_app_schema_configs(self):
         """
@@ -203,7 +885,7 @@ class SchemaBuilder:
         """
         schema_config_file_path = os.path.join(self.source_project_path, "schema_config.yml")
         with open(schema_config_file_path, "r") as f:
-            config = yaml.safe_load(f)
+            config = load_yaml(f)
 
         self.validate_schema_config(config)
 
@@ -278,7 +960,7 @@ class SchemaBuilder:
             self.source_project_path, "banned_column_names.yml"
         )
         with open(banned_column_file_path, "r") as f:
-            banned_columns = yaml.safe_load(f)
+            banned_columns = load_yaml(f)
 
         return banned_columns if banned_columns else []
 
@@ -290,7 +972,7 @@ class SchemaBuilder:
         """
         redaction_file_path = os.path.join(self.source_project_path, "redactions.yml")
         with open(redaction_file_path, "r") as f:
-            redactions = yaml.safe_load(f)
+            redactions = load_yaml(f)
 
         return redactions if redactions else {}
 
@@ -314,7 +996,7 @@ class SchemaBuilder:
         tables = None
         if os.path.exists(yml_file_path):
             with open(yml_file_path, "r") as f:
-                tables = yaml.safe_load(f)
+                tables = load_yaml(f)
             if not tables or not isinstance(tables, list):
                 raise ValueError(
                     "downstream_sources_allow_list.yml must contain a non-empty list."
@@ -332,7 +1014,7 @@ class SchemaBuilder:
             self.source_project_path, "unmanaged_tables.yml"
         )
         with open(unmanaged_tables_file_path, "r") as f:
-            tables = yaml.safe_load(f)
+            tables = load_yaml(f)
 
         self.validate_unmanaged_tables(tables)
 
@@ -389,7 +1071,7 @@ class SchemaBuilder:
     @staticmethod
     def get_snowflake_keywords():
         with open(os.path.join(LOCAL_PATH, "snowflake_keywords.yml"), "r") as f:
-            return yaml.safe_load(f)
+            return load_yaml(f)
 
     def build_app_path(self, app_destination_database, app_destination_schema):
         """
@@ -410,7 +1092,7 @@ class SchemaBuilder:
         """
         if os.path.exists(design_file_path):
             with open(design_file_path, "r") as f:
-                current_schema = yaml.safe_load(f)
+                current_schema = load_yaml(f)
 
             logger.info("Found existing schema file: {}".format(design_file_path))
         else:
@@ -429,7 +1111,7 @@ class SchemaBuilder:
 
         if os.path.exists(downstream_sources_file_path):
             with open(downstream_sources_file_path, "r") as f:
-                current_downstream_sources = yaml.safe_load(f)
+                current_downstream_sources = load_yaml(f)
 
             logger.info(
                 "Found existing downstream sources file: {}".format(
@@ -442,40 +1124,380 @@ class SchemaBuilder:
         return current_downstream_sources
 
     @staticmethod
-    def write_sources_for_downstream_project(sources_file_path, yml):
+    def write_sources_for_downstream_project(sources_file_path, sources):
         """
-        Writes out the given schema file with the given string.
+        Writes out the given sources file, streaming the YAML for the given sources straight to it.
         """
         logger.info("Creating sources file: {}".format(sources_file_path))
         with open(sources_file_path, "w") as f:
-            f.write(yml)
+            dump_yaml(sources, f)
 
-    def get_relations(self, app_source_database, schema):
+    def get_raw_schema_names(self):
         """
-        Look up all of the relations in Snowflake using dbt's get_catalog macro.
+        Return every distinct (database, schema) pair referenced as a raw schema in schema_config.yml, in the
+        order they are first referenced.
+        """
+        raw_schema_names = []
+        for app_config in self.app_schema_configs.values():
+            for database, schema in self.get_app_raw_schema_names(app_config):
+                if (database, schema) not in raw_schema_names:
+                    raw_schema_names.append((database, schema))
+        return raw_schema_names
+
+    @staticmethod
+    def get_app_raw_schema_names(app_config):
+        """
+        Return the (database, schema) pairs of the raw schemas one app is built from.
+        """
+        return [tuple(raw_schema_name.split('.')) for raw_schema_name in app_config]
+
+    def iter_apps_pipelined(self, threads=None, depth=1):
+        """
+        Yield the (app_name, app_config) of every app in schema_config.yml once the catalogs of its raw schemas
+        have been fetched, fetching those of the next `depth` apps on `threads` worker threads in the meantime.
+
+        Apps come in the same order, with the same catalogs, as when every catalog is prefetched, so the output
+        is the same. While an app is being built, at most `depth` more apps' catalogs are fetched ahead, and the
+        catalog of a raw schema is dropped as soon as no app left to build uses it, which keeps memory bounded.
+        """
+        app_names = list(self.app_schema_configs)
+        remaining_uses = Counter(
+            key for app_config in self.app_schema_configs.values() for key in self.get_app_raw_schema_names(app_config)
+        )
+        futures = {}
+
+        threads = max(1, threads or 1)
+        with ThreadPoolExecutor(max_workers=threads, thread_name_prefix=CATALOG_CONNECTION_NAME) as executor:
+            def submit(app_name):
+                for database, schema in self.get_app_raw_schema_names(self.app_schema_configs[app_name]):
+                    if (database, schema) not in futures and (database, schema) not in self.catalogs:
+                        futures[(database, schema)] = executor.submit(self._fetch_relations, database, schema)
+
+            for app_name in app_names[:depth + 1]:
+                submit(app_name)
+
+            for i, app_name in enumerate(app_names):
+                app_raw_schema_names = self.get_app_raw_schema_names(self.app_schema_configs[app_name])
+                for key in app_raw_schema_names:
+                    if key in futures:
+                        self.catalogs[key] = futures.pop(key).result()
+                if i + depth + 1 < len(app_names):
+                    submit(app_names[i + depth + 1])
+
+                yield app_name, self.app_schema_configs[app_name]
+
+                for key in app_raw_schema_names:
+                    remaining_uses[key] -= 1
+                    if not remaining_uses[key]:
+                        self.catalogs.pop(key, None)
+
+    def get_table_filters(self):
+        """
+        Return the TableFilter of every raw schema, keyed by (database, schema). A raw schema used by several apps
+        gets the union of their INCLUDE and EXCLUDE lists, so that every app still finds the tables it needs.
+        """
+        table_filters = {}
+        for app_config in self.app_schema_configs.values():
+            for raw_schema_name, raw_schema_config in app_config.items():
+                database, schema = raw_schema_name.split('.')
+                table_filter = Schema.from_config(database, schema, raw_schema_config).table_filter()
+                if (database, schema) in table_filters:
+                    table_filter = table_filters[(database, schema)].union(table_filter)
+                table_filters[(database, schema)] = table_filter
+        return table_filters
+
+    def prefetch_catalogs(
+        self, threads=None, batch=False, async_queries=False,
+        max_queries_per_database=DEFAULT_MAX_QUERIES_PER_DATABASE,
+    ):
+        """
+        Fetch the catalog of every raw schema in schema_config.yml before any app is built.
+
+        The INFORMATION_SCHEMA queries are spread over a pool of `threads` workers, each of which uses its own
+        named adapter connection. build_app then reads the prefetched relations instead of querying Snowflake.
+
+        With batch set, the raw schemas are grouped by database and each database is fetched with one query.
+
+        With async_queries set, the queries are instead submitted asynchronously on one connection, with at
+        most `threads` of them in flight on the warehouse and max_queries_per_database against each database.
+        Incremental refreshes always use the worker threads.
+        """
+        raw_schema_names = self.get_raw_schema_names()
+        threads = max(1, threads or 1)
+
+        if async_queries and not self.incremental_catalog:
+            logger.info(
+                "Fetching catalogs for {} raw schemas with up to {} asynchronous queries".format(
+                    len(raw_schema_names), threads
+                )
+            )
+            asyncio.run(self._prefetch_catalogs_async(raw_schema_names, threads, max_queries_per_database))
+            return self.catalogs
+
+        logger.info(
+            "Fetching catalogs for {} raw schemas using {} threads".format(len(raw_schema_names), threads)
+        )
+
+        with ThreadPoolExecutor(max_workers=threads, thread_name_prefix=CATALOG_CONNECTION_NAME) as executor:
+            if batch:
+                schemas_by_database = {}
+                for database, schema in raw_schema_names:
+                    schemas_by_database.setdefault(database, []).append(schema)
+                futures = [
+                    executor.submit(self._fetch_database_relations, database, schemas)
+                    for database, schemas in schemas_by_database.items()
+                ]
+                for future in futures:
+                    self.catalogs.update(future.result())
+            else:
+                futures = {
+                    (database, schema): executor.submit(self._fetch_relations, database, schema)
+                    for database, schema in raw_schema_names
+                }
+                for key, future in futures.items():
+                    self.catalogs[key] = future.result()
+
+        return self.catalogs
+
+    async def _prefetch_catalogs_async(self, raw_schema_names, threads, max_queries_per_database):
+        """
+        Fetch the catalogs of the given raw schemas with an AsyncCatalogFetcher, grouping each one as soon as
+        it completes. Schemas the fetcher cannot handle are fetched on worker threads as usual.
+        """
+        uncached_schema_names = []
+        for database, schema in raw_schema_names:
+            rows = self._cached_rows(database, schema)
+            if rows is None:
+                uncached_schema_names.append((database, schema))
+            else:
+                self.catalogs[(database, schema)] = self.group_relations(schema, rows, pool=self.column_pool)
+
+        loop = asyncio.get_running_loop()
+        fallbacks = {}
+        with ThreadPoolExecutor(max_workers=threads, thread_name_prefix=CATALOG_CONNECTION_NAME) as executor:
+            with self.get_catalog_task.native_connection() as connection:
+                fetcher = AsyncCatalogFetcher(
+                    self.get_catalog_task, connection, threads, max_queries_per_database=max_queries_per_database
+                )
+                async for (database, schema), rows in fetcher.fetch_all(
+                    uncached_schema_names, self.banned_column_names, table_filters=self.table_filters
+                ):
+                    if rows is None:
+                        fallbacks[(database, schema)] = loop.run_in_executor(
+                            executor, self._fetch_relations, database, schema
+                        )
+                        continue
+
+                    self._count_catalogs("fetched")
+                    self._store_rows(database, schema, rows)
+                    self.catalogs[(database, schema)] = self.group_relations(schema, rows, pool=self.column_pool)
+
+            for key, future in fallbacks.items():
+                self.catalogs[key] = await future
+
+    def _count_catalogs(self, stat, count=1):
+        """
+        Add count to one of the catalog_stats, from any thread.
+        """
+        with self.catalog_stats_lock:
+            self.catalog_stats[stat] += count
+
+    def _cached_rows(self, app_source_database, schema):
+        """
+        Return the catalog rows of one raw schema from the catalog cache, or None if there is no cache or it holds
+        no fresh copy.
+        """
+        if not self.catalog_cache:
+            return None
+        rows = self.catalog_cache.get(
+            app_source_database, schema, self.banned_column_names,
+            table_filter=self.table_filters.get((app_source_database, schema)),
+        )
+        if rows is not None:
+            self._count_catalogs("cached")
+        return rows
+
+    def _store_rows(self, app_source_database, schema, rows, last_altered=None):
+        """
+        Store freshly fetched catalog rows of one raw schema in the catalog cache, if there is one.
+        """
+        if self.catalog_cache:
+            self.catalog_cache.put(
+                app_source_database, schema, self.banned_column_names, rows, last_altered=last_altered,
+                table_filter=self.table_filters.get((app_source_database, schema)),
+            )
+
+    def _fetch_database_relations(self, app_source_database, schemas):
+        """
+        Fetch and group the relations of several raw schemas in one database on a connection named after the
+        current thread. Schemas found in the catalog cache are left out of the query, and in incremental mode
+        schemas are refreshed one at a time instead.
         """
-        all_relations = self.get_catalog_task.run(app_source_database, schema, self.banned_column_names)
+        catalog_data = {}
+        for schema in schemas:
+            cached_rows = self._cached_rows(app_source_database, schema)
+            if cached_rows is not None:
+                catalog_data[schema] = cached_rows
+
+        uncached_schemas = [schema for schema in schemas if schema not in catalog_data]
+        if uncached_schemas and self.incremental_catalog:
+            for schema in uncached_schemas:
+                catalog_data[schema] = self._fetch_catalog_rows(
+                    app_source_database, schema, threading.current_thread().name
+                )
+        elif uncached_schemas:
+            fetched_data = self.get_catalog_task.run_batch(
+                app_source_database, uncached_schemas, self.banned_column_names,
+                connection_name=threading.current_thread().name,
+                table_filters={
+                    schema: self.table_filters[(app_source_database, schema)]
+                    for schema in uncached_schemas if (app_source_database, schema) in self.table_filters
+                },
+            )
+            self._count_catalogs("fetched", len(uncached_schemas))
+            for schema in uncached_schemas:
+                self._store_rows(app_source_database, schema, fetched_data[schema])
+                catalog_data[schema] = fetched_data[schema]
+
+        return {
+            (app_source_database, schema): self.group_relations(schema, catalog_data[schema], pool=self.column_pool)
+            for schema in schemas
+        }
 
-        selected_relations = {schema: {}}
-        curr_table_name = None
-        curr_table_cols = None
+    def _fetch_catalog_rows(self, app_source_database, schema, connection_name):
+        """
+        Fetch the catalog rows of one raw schema from Snowflake and store them in the catalog cache.
 
-        for r in all_relations:
-            if r["TABLE_NAME"] != curr_table_name:
-                if curr_table_name:
-                    selected_relations[schema][curr_table_name] = curr_table_cols
-                curr_table_name = r["TABLE_NAME"]
-                curr_table_cols = []
-            curr_table_cols.append(r["COLUMN_NAME"])
+        In incremental mode, only the tables altered since the cached copy was fetched are queried.
+        """
+        self._count_catalogs("fetched")
+        table_filter = self.table_filters.get((app_source_database, schema))
+        if self.incremental_catalog:
+            all_relations, last_altered = self.get_catalog_task.run_incremental(
+                app_source_database, schema, self.banned_column_names,
+                snapshot=self.catalog_cache.get_snapshot(
+                    app_source_database, schema, self.banned_column_names, table_filter=table_filter
+                ),
+                connection_name=connection_name,
+                table_filter=table_filter,
+            )
+            self._store_rows(app_source_database, schema, all_relations, last_altered=last_altered)
+            return all_relations
 
-        if curr_table_name:
-            selected_relations[schema][curr_table_name] = curr_table_cols
+        all_relations = self.get_catalog_task.run(
+            app_source_database, schema, self.banned_column_names, connection_name=connection_name,
+            table_filter=table_filter,
+        )
+        self._store_rows(app_source_database, schema, all_relations)
+        return all_relations
 
-        return selected_relations
+    def _fetch_relations(self, app_source_database, schema, connection_name=None):
+        """
+        Fetch and group the relations of one raw schema, from the catalog cache if it holds a fresh copy.
 
-    def build_app(self, app_name, app_config, no_pii=False, pii_only=False):
+        Unless a connection_name is given, the query runs on a connection named after the current thread. Without
+        a catalog cache, which needs the rows themselves, the relations are grouped as they are streamed in.
+        """
+        connection_name = connection_name or threading.current_thread().name
+        if not self.catalog_cache:
+            self._count_catalogs("fetched")
+            return {
+                schema: ColumnCatalog(
+                    self._stream_relations(app_source_database, schema, connection_name), pool=self.column_pool
+                )
+            }
+
+        all_relations = self._cached_rows(app_source_database, schema)
+        if all_relations is None:
+            all_relations = self._fetch_catalog_rows(app_source_database, schema, connection_name)
+
+        return self.group_relations(schema, all_relations, pool=self.column_pool)
+
+    def iter_relations(self, app_source_database, schema, connection_name=CATALOG_CONNECTION_NAME):
+        """
+        Yield the (table name, column names) pairs of one raw schema, with the column names as a read-only
+        ColumnView into the shared column_pool.
+
+        Relations that were prefetched or are in the catalog cache are read from there. Otherwise they are
+        streamed from Snowflake, so that each table can be used before the rest of the schema has been read.
+        """
+        if (app_source_database, schema) in self.catalogs or self.catalog_cache:
+            yield from self.get_relations(app_source_database, schema)[schema].items()
+            return
+
+        catalog = ColumnCatalog(pool=self.column_pool)
+        for table_name, column_names in self._stream_relations(app_source_database, schema, connection_name):
+            yield table_name, catalog.add_table(table_name, column_names)
+        self.catalogs[(app_source_database, schema)] = {schema: catalog}
+        self.served_catalogs.add((app_source_database, schema))
+        self._count_catalogs("fetched")
+
+    def _stream_relations(self, app_source_database, schema, connection_name):
+        """
+        Stream the (table name, column names) pairs of one raw schema from Snowflake.
+        """
+        return self.get_catalog_task.stream(
+            app_source_database, schema, self.banned_column_names, connection_name=connection_name,
+            table_filter=self.table_filters.get((app_source_database, schema)),
+        )
+
+    @staticmethod
+    def group_relations(schema, all_relations, pool=None):
+        """
+        Group the column rows returned by GetCatalogTask into a {schema: ColumnCatalog} dict, interning the
+        column names in the given StringPool.
+        """
+        return {schema: ColumnCatalog(iter_table_columns(all_relations), pool=pool)}
+
+    def get_relations(self, app_source_database, schema):
+        """
+        Look up all of the relations in Snowflake using dbt's get_catalog macro.
+
+        Relations already fetched during this run, by prefetch_catalogs or for another app, are returned without
+        querying Snowflake again, and the catalog cache is checked before falling back to Snowflake.
+        """
+        key = (app_source_database, schema)
+        if key in self.catalogs:
+            if key in self.served_catalogs:
+                self._count_catalogs("reused")
+            self.served_catalogs.add(key)
+            return self.catalogs[key]
+
+        relations = self._fetch_relations(app_source_database, schema, connection_name=CATALOG_CONNECTION_NAME)
+        self.catalogs[key] = relations
+        self.served_catalogs.add(key)
+        return relations
+
+    def log_catalog_stats(self):
+        """
+        Log how many raw schema catalogs this run fetched or read from the catalog cache, and how often they were
+        reused.
+        """
+        logger.info(
+            "Fetched {fetched} raw schema catalogs, read {cached} from the catalog cache, reused them {reused} "
+            "times".format(**self.catalog_stats)
+        )
+
+    def write_catalog_snapshot(self, snapshot_file_path):
+        """
+        Write every prefetched catalog to a snapshot file that later builds can use with --catalog-snapshot.
+        """
+        logger.info("Creating catalog snapshot file: {}".format(snapshot_file_path))
+        catalogs = {}
+        for (database, schema), relations in self.catalogs.items():
+            catalogs[(database, schema)] = [
+                {"TABLE_NAME": table_name, "COLUMN_NAME": column_name, "COLUMN_INDEX": column_index}
+                for table_name, columns in relations[schema].items()
+                for column_index, column_name in enumerate(columns, 1)
+            ]
+        write_catalog_snapshot(snapshot_file_path, catalogs, self.table_filters)
+
+    def build_app(self, app_name, app_config, no_pii=False, pii_only=False, strict_duplicates=False):
         """
         Build the requested application schema from the raw schemas.
+
+        With strict_duplicates, a DuplicateDownstreamSourceException is raised as soon as two tables of the same
+        downstream source get the same name, instead of logging them and carrying on.
         """
         # Create an App object to represent the current Application
         # that we will be building schemas for
@@ -501,30 +1523,33 @@ class SchemaBuilder:
         current_downstream_sources = self.get_current_downstream_sources_attrs(
             downstream_sources_dir_path, downstream_sources_file_path,
         )
+        current_sources = CurrentSources(current_raw_sources, current_downstream_sources)
 
         # Construct the raw schemas that act as sources for this application
         # and gather their relations
         app_raw_schemas = []
+        manual_models = ManualModels(app_path, app_destination_schema)
         for raw_schema_name, raw_schema_config in app_config.items():
             app_source_database = raw_schema_name.split('.')[0]
             app_source_schema = raw_schema_name.split('.')[1]
             raw_schema = Schema.from_config(
                 app_source_database, app_source_schema, raw_schema_config
             )
-            raw_schema_relations = self.get_relations(app_source_database, app_source_schema)
-            for source_relation_name, meta_data in raw_schema_relations[app_source_schema].items():
+            for source_relation_name, meta_data in self.iter_relations(app_source_database, app_source_schema):
                 relation = Relation(
                     source_relation_name, meta_data, app_destination_schema,
                     app_path, self.snowflake_keywords,
                     self.unmanaged_tables, self.redactions,
-                    self.downstream_sources_allow_list, prefix=raw_schema.prefix
+                    self.downstream_sources_allow_list, prefix=raw_schema.prefix,
+                    manual_models=manual_models,
                 )
                 raw_schema.relations.append(relation)
             app_raw_schemas.append(raw_schema)
 
         app_object = App(
             app_raw_schemas, app_destination_schema, app_path, design_file_path, current_raw_sources,
-            current_downstream_sources, app_destination_database, no_pii, pii_only
+            current_downstream_sources, app_destination_database, no_pii, pii_only,
+            strict_duplicates=strict_duplicates,
         )
 
         logger.info("Building schema for the {} app".format(app_object.app))
@@ -549,13 +1574,15 @@ class SchemaBuilder:
                 ) = relation.find_in_current_sources(
                     current_raw_sources,
                     current_downstream_sources,
-                    prefix=raw_schema.prefix
+                    prefix=raw_schema.prefix,
+                    current_sources=current_sources,
                 )
                 app_object.add_source_to_new_schema(current_raw_source, relation, raw_schema)
                 app_object.add_table_to_downstream_sources(
                     relation,
                     current_safe_source,
                     current_pii_source,
+                    raw_schema=raw_schema,
                 )
                 app_object.update_trifecta_models(relation, no_pii=no_pii, pii_only=pii_only)
 
@@ -564,16 +1591,13 @@ class SchemaBuilder:
                 ##############################
                 relation.write_sql(raw_schema, no_pii=no_pii, pii_only=pii_only)
         app_object.write_app_schema(design_file_path)
-        # Check downstream source tables for duplicate table names and log if so
-        dupes = app_object.check_downstream_sources_for_dupes()
-        if dupes:
-            logger.error("Duplicate table names found: {}".format(dupes))
+        for duplicate in app_object.find_duplicate_downstream_tables():
+            logger.error(DUPLICATE_TABLE_MESSAGE.format(*duplicate))
 
         # Create source definitions pertaining to app database views in the downstream dbt
         # project, i.e. reporting.
         self.write_sources_for_downstream_project(
-            downstream_sources_file_path,
-            yaml.safe_dump(app_object.new_downstream_sources, sort_keys=False),
+            downstream_sources_file_path, app_object.new_downstream_sources,
         )
 
 
@@ -584,14 +1608,63 @@ class SchemaBuilderTask:
 
     def __init__(self, args):
         self.args = args
+        self.source_project_path, self.destination_project_path = self.get_project_dirs()
+
+        if getattr(self.args, "catalog_snapshot", None):
+            # Build offline from the snapshot file, without any dbt profile or Snowflake connection
+            self.config = None
+            self.strategy_memo = None
+            self.connection_pool = None
+            self.builder = SchemaBuilder(
+                self.get_model_path(),
+                self.source_project_path,
+                self.destination_project_path,
+                CatalogSnapshot(self.args.catalog_snapshot),
+            )
+            return
+
         self.config = RuntimeConfig.from_args(args)
         register_adapter(self.config)
-        self.source_project_path, self.destination_project_path = self.get_project_dirs()
+        self.strategy_memo = CatalogStrategyMemo(
+            os.path.join(self.source_project_path, CATALOG_STRATEGY_FILE_NAME),
+            reprobe=self.args.reprobe_catalog,
+        )
+        self.connection_pool = CatalogConnectionPool(get_adapter(self.config))
         self.builder = SchemaBuilder(
             self.config.model_paths[0],
             self.source_project_path,
             self.destination_project_path,
-            GetCatalogTask(self.args, self.config, None)
+            GetCatalogTask(
+                self.args, self.config, None,
+                strategy_memo=self.strategy_memo, catalog_engine=self.args.catalog_engine,
+                connection_pool=self.connection_pool,
+            ),
+            catalog_cache=self.get_catalog_cache(),
+            incremental_catalog=self.args.incremental_catalog,
+        )
+
+    def get_model_path(self):
+        """
+        Read the first model path straight from dbt_project.yml, for runs that do not load a dbt config.
+        """
+        with open(os.path.join(self.source_project_path, "dbt_project.yml"), "r") as f:
+            project = load_yaml(f)
+
+        model_paths = project.get("model-paths") or project.get("source-paths") or ["models"]
+        return model_paths[0]
+
+    def get_catalog_cache(self):
+        """
+        Set up the local catalog cache if a cache directory was given.
+        """
+        if not self.args.catalog_cache_dir:
+            return None
+
+        return CatalogCache(
+            os.path.join(self.source_project_path, self.args.catalog_cache_dir),
+            ttl=self.args.catalog_cache_ttl,
+            refresh=self.args.refresh_catalog,
+            catalog_engine=self.args.catalog_engine,
         )
 
     def get_project_dirs(self):
@@ -612,14 +1685,96 @@ class SchemaBuilderTask:
 
         return source_project_path, destination_project_path
 
-    def run(self, no_pii=False, pii_only=False):
+    def prefetch_catalogs(self):
+        """
+        Fetch the catalogs of all raw schemas, and remember how each one had to be fetched.
+        """
+        threads = self.config.threads if self.config else None
+        self.builder.prefetch_catalogs(
+            threads=threads,
+            batch=self.args.batch_catalog,
+            async_queries=self.args.async_catalog and self.config is not None,
+            max_queries_per_database=self.args.max_queries_per_database,
+        )
+        if self.strategy_memo:
+            self.strategy_memo.save()
+
+    def iter_apps(self):
+        """
+        Yield each app to build once its catalogs are ready. Unless a pipeline depth was given, every catalog is
+        prefetched first; otherwise the catalogs of the next apps are fetched while each app is built.
+        """
+        if not self.args.pipeline_depth or self.args.batch_catalog or self.args.async_catalog:
+            self.prefetch_catalogs()
+            yield from self.builder.app_schema_configs.items()
+            return
+
+        threads = self.config.threads if self.config else None
+        yield from self.builder.iter_apps_pipelined(threads=threads, depth=self.args.pipeline_depth)
+        if self.strategy_memo:
+            self.strategy_memo.save()
+
+    def close_connections(self):
+        """
+        Close the connections kept open for the run, and log how many were opened and how long that took.
+        """
+        if self.connection_pool is None:
+            return
+
+        self.connection_pool.close()
+        logger.info(
+            "Opened {} Snowflake connections in {:.2f}s".format(
+                self.connection_pool.opened, self.connection_pool.open_seconds
+            )
+        )
+
+    def run(self, no_pii=False, pii_only=False, strict_duplicates=False):
         """
         Wraps the SchemaBuilder steps
         """
         with log_manager.applicationbound():
             os.chdir(self.builder.source_project_path)
 
-            for app_name, app_config in self.builder.app_schema_configs.items():
-                logger.info('\n')
-                logger.info('------- {} -------'.format(app_name))
-                self.builder.build_app(app_name, app_config, no_pii=no_pii, pii_only=pii_only)
+            try:
+                for app_name, app_config in self.iter_apps():
+                    logger.info('\n')
+                    logger.info('------- {} -------'.format(app_name))
+                    self.builder.build_app(
+                        app_name, app_config, no_pii=no_pii, pii_only=pii_only, strict_duplicates=strict_duplicates
+                    )
+            finally:
+                self.close_connections()
+
+            self.builder.log_catalog_stats()
+
+
+class SnapshotTask(SchemaBuilderTask):
+    """
+    This class fetches the catalogs of every raw schema and saves them to a file for offline builds.
+    """
+
+    def get_project_dirs(self):
+        """
+        Find the dbt project directory. Taking a snapshot does not involve a destination project.
+        """
+        source_project_path = os.getcwd()
+        if not os.path.exists(os.path.join(source_project_path, "dbt_project.yml")):
+            raise Exception(  # pylint: disable=broad-exception-raised
+                "fatal: {} is not a dbt project. Does not exist or is missing a "
+                "dbt_project.yml file.".format(source_project_path)
+            )
+
+        return source_project_path, None
+
+    def run(self, no_pii=False, pii_only=False, strict_duplicates=False):
+        """
+        Fetch every catalog and write the snapshot file.
+        """
+        with log_manager.applicationbound():
+            os.chdir(self.builder.source_project_path)
+
+            try:
+                self.prefetch_catalogs()
+            finally:
+                self.close_connections()
+            self.builder.write_catalog_snapshot(self.args.output)
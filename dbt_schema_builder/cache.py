@@ -0,0 +1,113 @@
+"""
+Class and helpers for caching raw schema catalogs on local disk between runs
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+DEFAULT_CATALOG_CACHE_TTL = 3600
+
+
+class CatalogCache:
+    """
+    Class to represent an on-disk cache of the column catalogs returned by GetCatalogTask.
+
+    Each entry is keyed by source database, schema, the set of banned column names and the TableFilter of the
+    schema (since those are all applied in the catalog query itself), as well as the catalog engine the cache was
+    set up with (since that decides how the columns are read), and is stored as one JSON file in cache_dir.
+    Entries older than ttl seconds are ignored, as are all entries when refresh is set; either way the freshly
+    fetched catalog replaces them.
+
+    Entries can also hold the LAST_ALTERED time of every table, which lets an expired entry be refreshed
+    incrementally instead of being fetched again from scratch.
+    """
+
+    def __init__(self, cache_dir, ttl=DEFAULT_CATALOG_CACHE_TTL, refresh=False, catalog_engine=None):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.refresh = refresh
+        self.catalog_engine = catalog_engine
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def get_cache_file_path(self, database, schema, banned_column_names, table_filter=None):
+        """
+        Return the path of the cache file for the given key.
+        """
+        key = "\n".join(sorted(banned_column_names or []))
+        if table_filter is not None and not table_filter.is_unfiltered:
+            key += "\n{!r}".format(table_filter)
+        if self.catalog_engine is not None:
+            key += "\nENGINE {}".format(self.catalog_engine)
+        key_hash = hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+        return os.path.join(self.cache_dir, "{}.{}.{}.json".format(database, schema, key_hash))
+
+    def read(self, database, schema, banned_column_names, table_filter=None):
+        """
+        Return the cache entry for the given key whatever its age, or None if there is none.
+        """
+        cache_file_path = self.get_cache_file_path(database, schema, banned_column_names, table_filter=table_filter)
+        if not os.path.exists(cache_file_path):
+            return None
+
+        with open(cache_file_path, "r") as f:
+            return json.load(f)
+
+    @staticmethod
+    def _entry_rows(entry):
+        """
+        Expand the compact rows of a cache entry into the dicts GetCatalogTask returns.
+        """
+        return [
+            {"TABLE_NAME": table_name, "COLUMN_NAME": column_name, "COLUMN_INDEX": column_index}
+            for table_name, column_name, column_index in entry["rows"]
+        ]
+
+    def get(self, database, schema, banned_column_names, table_filter=None):
+        """
+        Return the cached catalog rows for the given key, or None if they are missing, expired or being refreshed.
+        """
+        if self.refresh:
+            return None
+
+        entry = self.read(database, schema, banned_column_names, table_filter=table_filter)
+        if entry is None or time.time() - entry["fetched_at"] > self.ttl:
+            return None
+
+        return self._entry_rows(entry)
+
+    def get_snapshot(self, database, schema, banned_column_names, table_filter=None):
+        """
+        Return the cached (rows, last_altered) for the given key whatever its age, so that it can be refreshed
+        incrementally. Returns None if there is no entry with LAST_ALTERED times, or the cache is being refreshed.
+        """
+        if self.refresh:
+            return None
+
+        entry = self.read(database, schema, banned_column_names, table_filter=table_filter)
+        if entry is None or entry.get("last_altered") is None:
+            return None
+
+        return self._entry_rows(entry), entry["last_altered"]
+
+    def put(self, database, schema, banned_column_names, rows, last_altered=None, table_filter=None):
+        """
+        Store freshly fetched catalog rows for the given key, with the LAST_ALTERED time of each table if known.
+        """
+        entry = {
+            "database": database,
+            "schema": schema,
+            "banned_column_names": sorted(banned_column_names or []),
+            "fetched_at": time.time(),
+            "rows": [[row["TABLE_NAME"], row["COLUMN_NAME"], row["COLUMN_INDEX"]] for row in rows],
+            "last_altered": last_altered,
+        }
+
+        cache_file_path = self.get_cache_file_path(database, schema, banned_column_names, table_filter=table_filter)
+        # Write to a temporary file first so a concurrent or interrupted run never sees a partial entry
+        temp_file_path = "{}.{}.{}.tmp".format(cache_file_path, os.getpid(), threading.get_ident())
+        with open(temp_file_path, "w") as f:
+            json.dump(entry, f)
+        os.replace(temp_file_path, cache_file_path)
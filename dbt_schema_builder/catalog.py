@@ -0,0 +1,159 @@
+"""
+Classes and helpers for reading raw schema catalogs and holding their column names compactly in memory
+"""
+import threading
+from array import array
+from collections.abc import Mapping, Sequence
+from itertools import groupby
+from operator import itemgetter
+
+# Number of rows to read from a Snowflake cursor at a time
+CURSOR_FETCH_SIZE = 10000
+# Largest StringPool index that fits in an unsigned short array
+MAX_SHORT_OFFSET = 0xFFFF
+
+
+def iter_cursor_tuples(cursor):
+    """
+    Yield the rows of a Snowflake cursor as tuples, reading them CURSOR_FETCH_SIZE at a time with fetchmany.
+    """
+    batch = cursor.fetchmany(CURSOR_FETCH_SIZE)
+    while batch:
+        yield from batch
+        batch = cursor.fetchmany(CURSOR_FETCH_SIZE)
+
+
+def iter_cursor_rows(cursor):
+    """
+    Yield the rows of a Snowflake cursor as dicts, reading them CURSOR_FETCH_SIZE at a time with fetchmany.
+    """
+    column_names = [column[0] for column in cursor.description]
+    # The catalog columns are all text, apart from integer positions, so there are no decimals to coerce
+    for row in iter_cursor_tuples(cursor):
+        yield dict(zip(column_names, row))
+
+
+def iter_table_columns(rows, table_name_key="TABLE_NAME", column_name_key="COLUMN_NAME"):
+    """
+    Group catalog rows, which must be in TABLE_NAME, COLUMN_INDEX order, into (table_name, [column names])
+    pairs, yielding each table as soon as its last row has been read.
+
+    Rows are dicts by default. Tuples can be grouped too by passing the positions of the table and column
+    names as the keys.
+    """
+    get_column_name = itemgetter(column_name_key)
+    for table_name, table_rows in groupby(rows, key=itemgetter(table_name_key)):
+        yield table_name, list(map(get_column_name, table_rows))
+
+
+class StringPool:
+    """
+    Class to represent a pool of interned strings, each stored once and referred to by its index.
+
+    Large schemas repeat the same column names (ID, CREATED, MODIFIED, _FIVETRAN_SYNCED...) across thousands
+    of tables, so column names are kept here once and each table only stores an array of indexes into the pool.
+    """
+
+    def __init__(self):
+        self.strings = []
+        self.indexes = {}
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.strings)
+
+    def __getitem__(self, index):
+        return self.strings[index]
+
+    def intern(self, string):
+        """
+        Return the index of the given string, adding it to the pool if it is not there yet.
+        """
+        index = self.indexes.get(string)
+        if index is None:
+            with self.lock:
+                index = self.indexes.get(string)
+                if index is None:
+                    index = len(self.strings)
+                    self.strings.append(string)
+                    self.indexes[string] = index
+        return index
+
+    def view(self, strings):
+        """
+        Intern the given strings and return a read-only ColumnView of them.
+        """
+        if isinstance(strings, ColumnView) and strings.pool is self:
+            return strings
+        offsets = [self.intern(string) for string in strings]
+        # Two byte offsets are enough until the pool outgrows them, and four bytes after that
+        typecode = "H" if max(offsets, default=0) <= MAX_SHORT_OFFSET else "I"
+        return ColumnView(self, array(typecode, offsets))
+
+
+class ColumnView(Sequence):
+    """
+    Class to represent the read-only column names of one table, as indexes into a StringPool.
+
+    It behaves like the list of column names it replaces, and compares equal to one.
+    """
+
+    __slots__ = ("pool", "offsets")
+
+    def __init__(self, pool, offsets):
+        self.pool = pool
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.pool[offset] for offset in self.offsets[index]]
+        return self.pool[self.offsets[index]]
+
+    def __iter__(self):
+        strings = self.pool.strings
+        return (strings[offset] for offset in self.offsets)
+
+    def __eq__(self, other):
+        if isinstance(other, (ColumnView, list, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+class ColumnCatalog(Mapping):
+    """
+    Class to represent the column names of every table in one raw schema, as a mapping of table name
+    to ColumnView, with all column names held in a StringPool that can be shared between schemas.
+    """
+
+    def __init__(self, table_columns=(), pool=None):
+        self.pool = pool if pool is not None else StringPool()
+        self.tables = {}
+        for table_name, column_names in table_columns:
+            self.add_table(table_name, column_names)
+
+    def __getitem__(self, table_name):
+        return self.tables[table_name]
+
+    def add_table(self, table_name, column_names):
+        """
+        Add the columns of one table and return them as a ColumnView.
+        """
+        self.tables[table_name] = self.pool.view(column_names)
+        return self.tables[table_name]
+
+    def __iter__(self):
+        return iter(self.tables)
+
+    def __len__(self):
+        return len(self.tables)
+
+    def __repr__(self):
+        return "ColumnCatalog({!r})".format(self.tables)
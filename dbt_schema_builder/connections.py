@@ -0,0 +1,49 @@
+"""
+Class for keeping named adapter connections open for a whole schema builder run
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+
+class CatalogConnectionPool:
+    """
+    Class to represent the named Snowflake connections used to fetch catalogs during one run.
+
+    adapter.connection_named closes its connection on the way out, so every catalog query would otherwise pay
+    for a new connection, login and session setup. Connections handed out here stay open until close() is
+    called at the end of the run. dbt keeps one connection per thread, so each worker thread keeps its own.
+    """
+
+    def __init__(self, adapter):
+        self.adapter = adapter
+        self.lock = threading.Lock()
+        self.opened = 0
+        self.open_seconds = 0.0
+
+    @contextmanager
+    def connection_named(self, name):
+        """
+        Make the named connection the current thread's connection, opening it if it is not open yet.
+        """
+        query_header = self.adapter.connections.query_header
+        if query_header is not None:
+            query_header.set(name, None)
+        try:
+            connection = self.adapter.acquire_connection(name)
+            if connection.state != "open":
+                start = time.time()
+                connection.handle  # pylint: disable=pointless-statement
+                with self.lock:
+                    self.opened += 1
+                    self.open_seconds += time.time() - start
+            yield connection
+        finally:
+            if query_header is not None:
+                query_header.reset()
+
+    def close(self):
+        """
+        Close every connection opened during the run.
+        """
+        self.adapter.cleanup_connections()
@@ -15,19 +15,87 @@ SELECT
   ORDINAL_POSITION AS "COLUMN_INDEX"
 FROM {database}.INFORMATION_SCHEMA.COLUMNS
 WHERE {database}.INFORMATION_SCHEMA.COLUMNS.TABLE_SCHEMA = '{schema}'
+{table_name_filter}
 {column_name_filter}
 ORDER BY \"TABLE_NAME\", \"COLUMN_INDEX\"
 """
 
 
-GET_RELATIONS_BY_SCHEMA_AND_START_LETTER_SQL = """
+TABLE_NAME_FROM_FILTER = """
+    AND {database}.INFORMATION_SCHEMA.COLUMNS.TABLE_NAME >= '{table_name}'
+"""
+
+
+TABLE_NAME_BEFORE_FILTER = """
+    AND {database}.INFORMATION_SCHEMA.COLUMNS.TABLE_NAME < '{table_name}'
+"""
+
+
+GET_RELATIONS_BY_SCHEMA_AND_TABLE_NAME_SQL = """
 SELECT
   TABLE_NAME AS "TABLE_NAME",
   COLUMN_NAME AS "COLUMN_NAME",
   ORDINAL_POSITION AS "COLUMN_INDEX"
 FROM {database}.INFORMATION_SCHEMA.COLUMNS
 WHERE {database}.INFORMATION_SCHEMA.COLUMNS.TABLE_SCHEMA = '{schema}'
-    AND {database}.INFORMATION_SCHEMA.COLUMNS.TABLE_NAME LIKE '{start_letter}%' ESCAPE '{escape_char}'
+    {table_name_filter}
     {column_name_filter}
 ORDER BY \"TABLE_NAME\", \"COLUMN_INDEX\"
 """
+
+
+GET_RELATIONS_BY_SCHEMAS_SQL = """
+SELECT
+  TABLE_SCHEMA AS "TABLE_SCHEMA",
+  TABLE_NAME AS "TABLE_NAME",
+  COLUMN_NAME AS "COLUMN_NAME",
+  ORDINAL_POSITION AS "COLUMN_INDEX"
+FROM {database}.INFORMATION_SCHEMA.COLUMNS
+WHERE {database}.INFORMATION_SCHEMA.COLUMNS.TABLE_SCHEMA IN ({schemas})
+{column_name_filter}
+ORDER BY \"TABLE_SCHEMA\", \"TABLE_NAME\", \"COLUMN_INDEX\"
+"""
+
+
+TABLE_NAME_IN_FILTER = """
+    AND {database}.INFORMATION_SCHEMA.COLUMNS.TABLE_NAME IN ({table_names})
+"""
+
+
+GET_TABLES_LAST_ALTERED_SQL = """
+SELECT
+  TABLE_NAME AS "TABLE_NAME",
+  LAST_ALTERED AS "LAST_ALTERED"
+FROM {database}.INFORMATION_SCHEMA.TABLES
+WHERE {database}.INFORMATION_SCHEMA.TABLES.TABLE_SCHEMA = '{schema}'
+ORDER BY \"TABLE_NAME\"
+"""
+
+
+GET_TABLE_NAMES_SQL = """
+SELECT
+  TABLE_NAME AS "TABLE_NAME"
+FROM {database}.INFORMATION_SCHEMA.TABLES
+WHERE {database}.INFORMATION_SCHEMA.TABLES.TABLE_SCHEMA = '{schema}'
+ORDER BY \"TABLE_NAME\"
+"""
+
+
+SHOW_COLUMNS_IN_SCHEMA_SQL = """
+SHOW COLUMNS IN SCHEMA {database}.{schema}
+"""
+
+
+# Reads back the output of a SHOW COLUMNS query, so banned columns can be dropped before they are fetched
+SHOW_COLUMNS_RESULT_SCAN_SQL = """
+SELECT
+  "table_name" AS "TABLE_NAME",
+  "column_name" AS "COLUMN_NAME"
+FROM TABLE(RESULT_SCAN('{query_id}'))
+WHERE "column_name" NOT IN ({banned_column_names})
+"""
+
+
+TABLE_NAME_NOT_IN_FILTER = """
+    AND {database}.INFORMATION_SCHEMA.COLUMNS.TABLE_NAME NOT IN ({table_names})
+"""
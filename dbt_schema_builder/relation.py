@@ -2,6 +2,7 @@
 Class and helpers for dealing with DBT relations
 """
 
+import fnmatch
 import os
 import re
 
@@ -17,6 +18,353 @@ SQL_TEMPLATE_PII = TEMPLATE_ENV.get_template("model_sql_pii.tpl")
 SQL_TEMPLATE_SAFE = TEMPLATE_ENV.get_template("model_sql_safe.tpl")
 
 
+class UnmanagedTableMatcher:
+    """
+    Class to represent the entries of unmanaged_tables.yml, compiled once for matching against relations.
+
+    Each entry is a regex that marks a relation as unmanaged when it matches the end of "APP.RELATION".
+    Entries without capturing groups are merged into one alternation, so each relation is checked with a single
+    regex search, and the verdict for each relation name is remembered.
+    """
+
+    def __init__(self, unmanaged_tables):
+        self.unmanaged_tables = list(unmanaged_tables or [])
+        merged = []
+        self.patterns = []
+        for unmanaged_table in self.unmanaged_tables:
+            # make sure to include the EOL character in the regex, to prevent
+            # matching a substring in a larger string.
+            pattern = re.compile(r'{}$'.format(unmanaged_table))
+            if pattern.groups:
+                # Merging would renumber its groups and break any backreferences, so keep it on its own
+                self.patterns.append(pattern)
+            else:
+                merged.append(pattern)
+        if merged:
+            try:
+                self.patterns.insert(0, re.compile("|".join(r'(?:{})'.format(p.pattern) for p in merged)))
+            except re.error:
+                # Entries such as ones starting with inline flags only work on their own
+                self.patterns[:0] = merged
+        self.verdicts = {}
+
+    def __iter__(self):
+        return iter(self.unmanaged_tables)
+
+    def __len__(self):
+        return len(self.unmanaged_tables)
+
+    def matches(self, relation_name):
+        """
+        Return True if the given "APP.RELATION" name is unmanaged.
+        """
+        verdict = self.verdicts.get(relation_name)
+        if verdict is None:
+            verdict = any(pattern.search(relation_name) for pattern in self.patterns)
+            self.verdicts[relation_name] = verdict
+        return verdict
+
+
+class DownstreamSourcesAllowList:
+    """
+    Class to represent the entries of downstream_sources_allow_list.yml, compiled once for matching relations.
+
+    Plain "APP.RELATION" entries are kept upper-cased in a set, and match names in any case. Entries containing
+    *, ? or [ are globs, and mappings such as {"regex": "LMS\\.BACKUP_\\d+"} are regexes, which must match the
+    whole "APP.RELATION" name. Globs and regexes are merged into a single regex, and the verdict for each relation
+    name is remembered.
+    """
+
+    GLOB_CHARACTERS = re.compile(r'[*?\[]')
+
+    def __init__(self, entries):
+        self.entries = list(entries or [])
+        self.names = set()
+        patterns = []
+        for entry in self.entries:
+            if isinstance(entry, dict) and set(entry) == {"regex"}:
+                patterns.append(re.compile(entry["regex"]))
+            elif not isinstance(entry, str):
+                raise ValueError(
+                    'downstream_sources_allow_list.yml entries must be "<SCHEMA>.<TABLE>" names, globs or '
+                    '{{regex: <pattern>}} mappings, not {!r}.'.format(entry)
+                )
+            elif self.GLOB_CHARACTERS.search(entry):
+                patterns.append(re.compile(fnmatch.translate(entry)))
+            else:
+                self.names.add(entry.upper())
+
+        # Merging would renumber unnamed groups and break any backreferences, so those regexes are kept on their own
+        merged = [pattern for pattern in patterns if pattern.groups == len(pattern.groupindex)]
+        self.patterns = [pattern for pattern in patterns if pattern not in merged]
+        if merged:
+            try:
+                self.patterns.insert(0, re.compile("|".join(r'(?:{})'.format(p.pattern) for p in merged)))
+            except re.error:
+                # Entries such as ones starting with inline flags only work on their own
+                self.patterns[:0] = merged
+        self.verdicts = {}
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def allows(self, relation_name):
+        """
+        Return True if the given "APP.RELATION" name is on the allow list.
+        """
+        verdict = self.verdicts.get(relation_name)
+        if verdict is None:
+            verdict = relation_name.upper() in self.names or any(
+                pattern.fullmatch(relation_name) for pattern in self.patterns
+            )
+            self.verdicts[relation_name] = verdict
+        return verdict
+
+
+class RedactionPlan:
+    """
+    Class to represent redactions.yml, compiled once into the column redactions of each relation.
+
+    Keys are split on their unescaped dots into names, and looked up exactly: "APP.TABLE" with a mapping of
+    column name to expression, as before, or "APP.TABLE.COLUMN" with the expression itself. Within one name, *
+    matches any run of characters and ? any single character, but neither ever matches a dot, so for example
+    "LMS.*.EMAIL" is the EMAIL column of every LMS table. Full regexes over "APP.TABLE.COLUMN" can be given in a
+    mapping under the "regex" key. Exact keys win over patterns, and the first matching pattern in the file wins.
+    All the patterns are merged into a single regex. Keys that do not name a column are skipped, and listed in
+    skipped_keys for the caller to report.
+    """
+
+    REGEX_KEY = "regex"
+    # An escaped character, a dot or wildcard, or a run of anything else
+    KEY_TOKEN = re.compile(r'\\(.)|([.*?])|([^\\.*?]+)|\\', re.S)
+
+    def __init__(self, redactions):
+        self.redactions = redactions or {}
+        # "APP.TABLE" to {column name: expression}, for the exact keys
+        self.exact = {}
+        # (regex over "APP.TABLE.COLUMN", expression) pairs, in the order of the file
+        self.rules = []
+        # Keys that do not name a column, in the order of the file
+        self.skipped_keys = []
+        for table_key, table_redactions in self.redactions.items():
+            if table_key == self.REGEX_KEY and isinstance(table_redactions, dict):
+                for pattern, expression in table_redactions.items():
+                    self.rules.append((re.compile(pattern), expression))
+            elif isinstance(table_redactions, dict):
+                for column_key, expression in table_redactions.items():
+                    self._add(
+                        self._split_key(table_key) + self._split_key(column_key), expression,
+                        "{}.{}".format(table_key, column_key),
+                    )
+            else:
+                self._add(self._split_key(table_key), table_redactions, table_key)
+
+        self.pattern = None
+        if self.rules and not any(pattern.groups for pattern, _ in self.rules):
+            try:
+                self.pattern = re.compile("|".join(
+                    r'(?P<rule{}>{})'.format(index, pattern.pattern) for index, (pattern, _) in enumerate(self.rules)
+                ))
+            except re.error:
+                # Rules such as ones starting with inline flags only work on their own
+                pass
+
+    @classmethod
+    def _split_key(cls, key):
+        """
+        Split a key on its unescaped dots, returning a (regex, name) pair for each name in it. name is None for
+        names with a wildcard, and a backslash makes the character after it literal.
+        """
+        segments = [([], [])]
+        for escaped, special, text in cls.KEY_TOKEN.findall(str(key)):
+            patterns, names = segments[-1]
+            if special == ".":
+                segments.append(([], []))
+            elif special:
+                patterns.append("[^.]*" if special == "*" else "[^.]")
+                names.append(None)
+            else:
+                literal = escaped or text or "\\"
+                patterns.append(re.escape(literal))
+                names.append(literal)
+        return [
+            ("".join(patterns), None if None in names else "".join(names))
+            for patterns, names in segments
+        ]
+
+    def _add(self, segments, expression, key):
+        """
+        Add the redaction of the columns matching the given APP, TABLE and COLUMN segments of key, or skip key
+        if it does not have exactly those three.
+        """
+        if len(segments) != 3:
+            self.skipped_keys.append(key)
+            return
+        names = [name for _, name in segments]
+        if None not in names:
+            self.exact.setdefault("{}.{}".format(*names[:2]), {}).setdefault(names[2], expression)
+            return
+        self.rules.append((re.compile(r'\.'.join(regex for regex, _ in segments)), expression))
+
+    def match(self, column_path):
+        """
+        Return the expression of the first regex matching the given "APP.TABLE.COLUMN", or None.
+        """
+        if self.pattern is not None:
+            match = self.pattern.fullmatch(column_path)
+            if match is None:
+                return None
+            return self.rules[int(match.lastgroup[len("rule"):])][1]
+        for pattern, expression in self.rules:
+            if pattern.fullmatch(column_path):
+                return expression
+        return None
+
+    def column_redactions(self, app, relation_alias, column_names):
+        """
+        Return the redaction expression of each redacted column of a relation, keyed by column name.
+        """
+        app_table = "{}.{}".format(app.upper(), relation_alias.upper())
+        exact = self.exact.get(app_table, {})
+        column_redactions = {}
+        for column_name in column_names:
+            if column_name in exact:
+                column_redactions[column_name] = exact[column_name]
+            elif self.rules:
+                expression = self.match("{}.{}".format(app_table, column_name))
+                if expression is not None:
+                    column_redactions[column_name] = expression
+        return column_redactions
+
+
+class CurrentSources:
+    """
+    Class to represent the existing <APP>.yml and downstream sources file of one app, indexed by table name.
+
+    The index is built once per app, so finding the current entries of each relation does not scan every table
+    of both files again.
+    """
+
+    def __init__(self, current_raw_sources, current_downstream_sources):
+        # Table name to its entry in the raw sources. When several raw sources contain the same table name, the
+        # first entry in the last of them wins.
+        self.raw_tables = {}
+        if current_raw_sources and "sources" in current_raw_sources:
+            for source in current_raw_sources["sources"]:
+                source_tables = {}
+                for table in source["tables"]:
+                    if table and table["name"] not in source_tables:
+                        source_tables[table["name"]] = table
+                self.raw_tables.update(source_tables)
+
+        # (source name, {table name: [positions]}, tables) for each downstream source, in the order of the file
+        self.downstream_sources = []
+        if current_downstream_sources and "sources" in current_downstream_sources:
+            for source in current_downstream_sources["sources"]:
+                positions = {}
+                for position, table in enumerate(source["tables"]):
+                    if table:
+                        positions.setdefault(table["name"], []).append(position)
+                self.downstream_sources.append((source["name"], positions, source["tables"]))
+
+    @staticmethod
+    def _find_downstream_table(positions, tables, source_relation_name, prefix):
+        """
+        Find the entry of a relation in one downstream source, or None.
+
+        With a prefix, entries still named after the unprefixed relation from prior runs are renamed to the
+        prefixed name. When several entries match, the last one wins.
+        """
+        if not prefix:
+            matches = positions.get(source_relation_name)
+            return tables[matches[-1]] if matches else None
+
+        prefixed_name = prefix + '_' + source_relation_name
+        unprefixed = positions.pop(source_relation_name, [])
+        for position in unprefixed:
+            tables[position]["name"] = prefixed_name
+        matches = sorted(positions.get(prefixed_name, []) + unprefixed)
+        if unprefixed:
+            positions[prefixed_name] = matches
+        return tables[matches[-1]] if matches else None
+
+    def find(self, source_relation_name, app, prefix=None):
+        """
+        Return the current raw, safe downstream and PII downstream entries of a relation, each None if missing.
+        """
+        current_raw_source = self.raw_tables.get(source_relation_name)
+        current_safe_downstream_source = None
+        current_pii_downstream_source = None
+
+        pii_source_name = "{}_PII".format(app)
+        for source_name, positions, tables in self.downstream_sources:
+            if source_name == app:
+                table = self._find_downstream_table(positions, tables, source_relation_name, prefix)
+                current_safe_downstream_source = table or current_safe_downstream_source
+            elif source_name == pii_source_name:
+                table = self._find_downstream_table(positions, tables, source_relation_name, prefix)
+                current_pii_downstream_source = table or current_pii_downstream_source
+
+            if current_safe_downstream_source and current_pii_downstream_source:
+                break
+
+        return (
+            current_raw_source,
+            current_safe_downstream_source,
+            current_pii_downstream_source,
+        )
+
+
+class ManualModels:
+    """
+    Class to represent the manually written models in the {APP}_MANUAL directory of one app.
+
+    The directory is only scanned the first time it is needed, and then once for the whole app, instead of
+    once per relation.
+    """
+
+    def __init__(self, app_path, app):
+        self.manual_models_directory = os.path.join(app_path, "{}_MANUAL".format(app))
+        self._model_names = None
+
+    @property
+    def model_names(self):
+        """
+        The names, without the .sql extension, of the models in the MANUAL directory.
+
+        Raises:
+            RuntimeError: When the manual models directory is not flat.
+        """
+        if self._model_names is None:
+            self._model_names = self._scan()
+        return self._model_names
+
+    def _scan(self):
+        """
+        Read the model names from the MANUAL directory, ensuring that its contents are flat.
+        """
+        if not os.path.isdir(self.manual_models_directory):
+            return frozenset()
+
+        model_names = set()
+        for entry in os.scandir(self.manual_models_directory):
+            if entry.is_dir():
+                raise RuntimeError(
+                    'MANUAL directory is not "flat", i.e. it contains subdirectories: {}'.format(
+                        self.manual_models_directory,
+                    )
+                )
+            if entry.name.endswith(".sql"):
+                model_names.add(entry.name[:-len(".sql")])
+        return frozenset(model_names)
+
+    def __contains__(self, model_name):
+        return model_name in self.model_names
+
+
 class Relation:
     """
     Class to represent a DBT relation (a table/view)
@@ -24,9 +372,12 @@ class Relation:
 
     def __init__(
         self, source_relation_name, meta_data, app, app_path,
-        snowflake_keywords, unmanaged_tables, redactions, downstream_sources_allow_list, prefix=None
+        snowflake_keywords, unmanaged_tables, redactions, downstream_sources_allow_list, prefix=None,
+        manual_models=None,
     ):
         self.snowflake_keywords = snowflake_keywords
+        if not isinstance(redactions, RedactionPlan):
+            redactions = RedactionPlan(redactions)
         self.redactions = redactions
         self.prefix = prefix
         self.source_relation_name = source_relation_name
@@ -38,8 +389,13 @@ class Relation:
 
         self.app = app
         self.app_path = app_path
+        self.manual_models = manual_models if manual_models is not None else ManualModels(app_path, app)
 
+        if not isinstance(unmanaged_tables, UnmanagedTableMatcher):
+            unmanaged_tables = UnmanagedTableMatcher(unmanaged_tables)
         self.unmanaged_tables = unmanaged_tables
+        if not isinstance(downstream_sources_allow_list, DownstreamSourcesAllowList):
+            downstream_sources_allow_list = DownstreamSourcesAllowList(downstream_sources_allow_list)
         self.downstream_sources_allow_list = downstream_sources_allow_list
 
     def __repr__(self):
@@ -79,63 +435,21 @@ class Relation:
         return model
 
     def find_in_current_sources(
-        self, current_raw_sources, current_downstream_sources, prefix=None
+        self, current_raw_sources, current_downstream_sources, prefix=None, current_sources=None
     ):
         """
         Find source data in an existing loaded schema yml file.
 
         If a file already exists for this schema, find the values for the current relation
-        so we can preserve any manual modifications (tests, description, etc.).
+        so we can preserve any manual modifications (tests, description, etc.). Pass a CurrentSources
+        built from the same files to look the relation up in its index instead of indexing them again.
         """
         if not current_raw_sources and not current_downstream_sources:
             return None, None, None
 
-        current_raw_source = None
-        current_safe_downstream_source = None
-        current_pii_downstream_source = None
-
-        if current_raw_sources and "sources" in current_raw_sources:
-            for source in current_raw_sources["sources"]:
-                for table in source["tables"]:
-                    if table and table["name"] == self.source_relation_name:
-                        current_raw_source = table
-                        break
-
-        if current_downstream_sources and "sources" in current_downstream_sources:
-            for source in current_downstream_sources["sources"]:
-                if source["name"] == self.app:
-                    for table in source["tables"]:
-                        if table and prefix and table["name"] == self.source_relation_name:
-                            # Handle prefix when no prefix has been applied already from prior runs
-                            table["name"] = prefix + '_' + table["name"]
-                            current_safe_downstream_source = table
-                        elif table and table["name"] == self.source_relation_name:
-                            # No prefix already applied, no prefix to be applied
-                            current_safe_downstream_source = table
-                        elif prefix and table and table["name"] == prefix + '_' + self.source_relation_name:
-                            # Handle prefix when already applied from prior runs
-                            current_safe_downstream_source = table
-                elif source["name"] == "{}_PII".format(self.app):
-                    for table in source["tables"]:
-                        if table and prefix and table["name"] == self.source_relation_name:
-                            # Handle prefix for PII schema when no prefix has been applied already from prior runs
-                            table["name"] = prefix + '_' + table["name"]
-                            current_pii_downstream_source = table
-                        elif table and table["name"] == self.source_relation_name:
-                            # No prefix already applied, no prefix to be applied for PII schema
-                            current_pii_downstream_source = table
-                        elif prefix and table and table["name"] == prefix + '_' + self.source_relation_name:
-                            # Handle prefix for PII schema when already applied from prior runs
-                            current_pii_downstream_source = table
-
-                if current_safe_downstream_source and current_pii_downstream_source:
-                    break
-
-        return (
-            current_raw_source,
-            current_safe_downstream_source,
-            current_pii_downstream_source,
-        )
+        if current_sources is None:
+            current_sources = CurrentSources(current_raw_sources, current_downstream_sources)
+        return current_sources.find(self.source_relation_name, self.app, prefix=prefix)
 
     @property
     def is_unmanaged(self):
@@ -144,14 +458,7 @@ class Relation:
         unmanaged_tables.yml, indicating that we do not want schema builder to manage this table's
         view-generating models)
         """
-        for unmanaged_table in self.unmanaged_tables:
-            # make sure to include the EOL character in the regex, to prevent
-            # matching a substring in a larger string.
-            unmanaged_table_regex = re.compile(r'{}$'.format(unmanaged_table))
-            relation_name = "{}.{}".format(self.app, self.relation)
-            if re.search(unmanaged_table_regex, relation_name):
-                return True
-        return False
+        return self.unmanaged_tables.matches("{}.{}".format(self.app, self.relation))
 
     @property
     def manual_safe_model_exists(self):
@@ -168,10 +475,8 @@ class Relation:
         was not listed in an allow_list or has otherwise been flagged for exclusion.  An empty allow_list
         signifies that all relations are to be included.
         """
-        return (
-            self.downstream_sources_allow_list
-            and "{}.{}".format(self.app, self.relation)
-            not in self.downstream_sources_allow_list
+        return bool(self.downstream_sources_allow_list) and not self.downstream_sources_allow_list.allows(
+            "{}.{}".format(self.app, self.relation)
         )
 
     def _manual_model_exists(self, view_type):
@@ -184,24 +489,7 @@ class Relation:
         Raises:
             RuntimeError: When the manual models directory is not flat.
         """
-        manual_models_directory = os.path.join(self.app_path, "{}_MANUAL".format(self.app))
-        if os.path.isdir(manual_models_directory):
-
-            # Ensure that the directory contents are flat.
-            if not self._dir_is_flat(manual_models_directory):
-                raise RuntimeError(
-                    'MANUAL directory is not "flat", i.e. it contains subdirectories: {}'.format(
-                        manual_models_directory,
-                    )
-                )
-
-            manual_model_name = self.get_model_name(view_type)
-            manual_model_path = os.path.join(
-                manual_models_directory, "{}.sql".format(manual_model_name)
-            )
-            if os.path.exists(manual_model_path):
-                return True
-        return False
+        return self.get_model_name(view_type) in self.manual_models
 
     def get_model_name(self, view_type):
         """
@@ -214,19 +502,12 @@ class Relation:
         else:
             return "{}_{}_{}".format(self.app, view_type, self.relation)
 
-    def _dir_is_flat(self, path):
-        """
-        Returns True iff the given directory is "flat", i.e. contains no subdirectories.
-        """
-        for entry in os.scandir(path):
-            if entry.is_dir():
-                return False
-        return True
-
     @staticmethod
-    def render_sql(app, view_type, relation_dict, raw_schema, redactions):
+    def render_sql(app, view_type, relation_dict, raw_schema, column_redactions):
         """
         Renders the appropriate SQL file template for the source and returns the rendered string.
+
+        column_redactions maps the name of each redacted column of the relation to its redaction expression.
         """
         if view_type == "SAFE":
             tpl = SQL_TEMPLATE_SAFE
@@ -237,7 +518,7 @@ class Relation:
             app=app,
             raw_schema=raw_schema,
             relation=relation_dict,
-            redactions=redactions,
+            column_redactions=column_redactions,
         )
 
     @staticmethod
@@ -269,6 +550,11 @@ class Relation:
                 view_types = ["PII"]
             else:
                 view_types = ["SAFE", "PII"]
+            column_redactions = {}
+            if "SAFE" in view_types:
+                column_redactions = self.redactions.column_redactions(
+                    self.app, self.relation, [column["name"] for column in relation_dict["columns"]]
+                )
             for view_type in view_types:
                 if view_type == "SAFE":
                     sql_path = os.path.join(self.app_path, self.app)
@@ -283,6 +569,6 @@ class Relation:
                 sql_file_name = "{}.sql".format(model_name)
                 sql_file_path = os.path.join(sql_path, sql_file_name)
                 sql = self.render_sql(
-                    self.app, view_type, relation_dict, raw_schema, self.redactions
+                    self.app, view_type, relation_dict, raw_schema, column_redactions
                 )
                 self.write_sql_file(sql_file_path, sql)
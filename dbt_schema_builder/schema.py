@@ -102,6 +102,15 @@ class Schema:
                 )
         return filtered_relations
 
+    def table_filter(self):
+        """
+        Return the TableFilter of the tables this Schema needs from the catalog.
+        """
+        return TableFilter(
+            included_tables=self.inclusion_list or None,
+            excluded_tables=self.exclusion_list or (),
+        )
+
     def soft_delete_sql_clause(self):
         """
         Return the SQL to exclude soft deleted rows based on configuration.
@@ -112,5 +121,85 @@ class Schema:
         return "{} {}".format(self.soft_delete_column_name, self.soft_delete_sql_predicate)
 
 
+class TableFilter:
+    """
+    Class to represent which tables of a raw schema need to be fetched from the catalog.
+
+    Either included_tables is the set of the only tables needed, or excluded_tables is the (possibly empty) set
+    of tables that are not needed.
+    """
+
+    def __init__(self, included_tables=None, excluded_tables=()):
+        self.included_tables = frozenset(included_tables) if included_tables is not None else None
+        self.excluded_tables = frozenset(excluded_tables) if included_tables is None else frozenset()
+
+    def __repr__(self):
+        if self.included_tables is not None:
+            return "INCLUDE {}".format(sorted(self.included_tables))
+        return "EXCLUDE {}".format(sorted(self.excluded_tables))
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, TableFilter)
+            and self.included_tables == other.included_tables
+            and self.excluded_tables == other.excluded_tables
+        )
+
+    def __hash__(self):
+        return hash((self.included_tables, self.excluded_tables))
+
+    def __contains__(self, table_name):
+        if self.included_tables is not None:
+            return table_name in self.included_tables
+        return table_name not in self.excluded_tables
+
+    @property
+    def is_unfiltered(self):
+        """
+        True if every table is needed.
+        """
+        return self.included_tables is None and not self.excluded_tables
+
+    def union(self, other):
+        """
+        Return the TableFilter of the tables needed by either this filter or the other one.
+        """
+        if self.included_tables is not None and other.included_tables is not None:
+            return TableFilter(included_tables=self.included_tables | other.included_tables)
+
+        # A table is only left out if every filter leaves it out
+        included_tables = (self.included_tables or frozenset()) | (other.included_tables or frozenset())
+        if self.included_tables is None and other.included_tables is None:
+            excluded_tables = self.excluded_tables & other.excluded_tables
+        else:
+            excluded_tables = self.excluded_tables or other.excluded_tables
+        return TableFilter(excluded_tables=excluded_tables - included_tables)
+
+    def issubset(self, other):
+        """
+        True if every table needed by this filter is also needed by the other one.
+        """
+        if self.included_tables is not None:
+            return all(table_name in other for table_name in self.included_tables)
+        if other.included_tables is not None:
+            return False
+        return other.excluded_tables <= self.excluded_tables
+
+    def to_config(self):
+        """
+        Return this filter as the INCLUDE or EXCLUDE section of a raw schema config.
+        """
+        if self.included_tables is not None:
+            return {"INCLUDE": sorted(self.included_tables)}
+        return {"EXCLUDE": sorted(self.excluded_tables)}
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Construct a TableFilter from the INCLUDE or EXCLUDE section of a raw schema config.
+        """
+        return cls(included_tables=config.get("INCLUDE"), excluded_tables=config.get("EXCLUDE", ()))
+
+
 class InvalidConfigurationException(Exception):
     pass
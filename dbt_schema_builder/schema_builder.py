@@ -8,7 +8,9 @@ import sys
 from dbt import flags
 from dbt.flags import get_flag_dict
 
-from .builder import SchemaBuilderTask
+from .async_catalog import DEFAULT_MAX_QUERIES_PER_DATABASE
+from .builder import CATALOG_ENGINES, INFORMATION_SCHEMA_ENGINE, SchemaBuilderTask, SnapshotTask
+from .cache import DEFAULT_CATALOG_CACHE_TTL
 
 PROFILES_DIR = get_flag_dict().get('PROFILES_DIR')
 
@@ -61,6 +63,78 @@ def parse_args(args):
         type=int,
         help="Number of threads for dbt to run.",
     )
+    base_subparser.add_argument(
+        "--batch-catalog",
+        required=False,
+        action='store_true',
+        help="Fetch the catalogs of all raw schemas in the same database with one query per database",
+        default=False,
+    )
+    base_subparser.add_argument(
+        "--catalog-engine",
+        default=INFORMATION_SCHEMA_ENGINE,
+        choices=CATALOG_ENGINES,
+        help="""How to read the columns of each raw schema: from INFORMATION_SCHEMA.COLUMNS, or with
+            SHOW COLUMNS IN SCHEMA. Default = {}""".format(INFORMATION_SCHEMA_ENGINE),
+    )
+    base_subparser.add_argument(
+        "--reprobe-catalog",
+        required=False,
+        action='store_true',
+        help="Ignore the remembered catalog fetch strategies and try fetching every schema in one query again",
+        default=False,
+    )
+    base_subparser.add_argument(
+        "--catalog-cache-dir",
+        default=None,
+        type=str,
+        help="""Directory, relative to the source project, in which to cache raw schema catalogs between runs.
+            Catalogs are fetched from Snowflake on every run when this is not set.""",
+    )
+    base_subparser.add_argument(
+        "--catalog-cache-ttl",
+        default=DEFAULT_CATALOG_CACHE_TTL,
+        type=int,
+        help="Number of seconds a cached catalog stays valid. Default = {}".format(DEFAULT_CATALOG_CACHE_TTL),
+    )
+    base_subparser.add_argument(
+        "--refresh-catalog",
+        required=False,
+        action='store_true',
+        help="Ignore any cached catalogs and fetch them all from Snowflake again",
+        default=False,
+    )
+    base_subparser.add_argument(
+        "--incremental-catalog",
+        required=False,
+        action='store_true',
+        help="""Refresh expired cached catalogs by only fetching the columns of tables altered since they were
+            cached. Requires --catalog-cache-dir.""",
+        default=False,
+    )
+    base_subparser.add_argument(
+        "--async-catalog",
+        required=False,
+        action='store_true',
+        help="""Submit catalog queries asynchronously on one connection instead of running one per thread. At
+            most --threads queries are in flight at once.""",
+        default=False,
+    )
+    base_subparser.add_argument(
+        "--max-queries-per-database",
+        default=DEFAULT_MAX_QUERIES_PER_DATABASE,
+        type=int,
+        help="""Maximum number of asynchronous catalog queries in flight against any one source database.
+            Default = {}""".format(DEFAULT_MAX_QUERIES_PER_DATABASE),
+    )
+
+    base_subparser.add_argument(
+        "--pipeline-depth",
+        default=0,
+        type=int,
+        help="""Fetch the catalogs of this many apps ahead while each app is built, instead of fetching every
+            catalog before building. Ignored with --batch-catalog or --async-catalog. Default = 0""",
+    )
 
     group = base_subparser.add_mutually_exclusive_group()
 
@@ -92,25 +166,57 @@ def parse_args(args):
         required=True,
         help="Required. Specify the project that will use the generated sources, relative to the source project.",
     )
+    build_sub.add_argument(
+        "--catalog-snapshot",
+        default=None,
+        type=str,
+        help="""Build from the raw schema catalogs in this snapshot file, taken with the snapshot sub-command,
+            instead of connecting to Snowflake.""",
+    )
+    build_sub.add_argument(
+        "--strict-duplicates",
+        required=False,
+        action='store_true',
+        help="Fail as soon as two tables of the same downstream source get the same name, instead of logging it",
+        default=False,
+    )
+
+    snapshot_sub = subs.add_parser(
+        "snapshot",
+        parents=[base_subparser],
+        help="Saves the catalogs of all raw schemas in schema_config.yml to a file for offline builds",
+    )
+    snapshot_sub.set_defaults(cls=SnapshotTask, which="snapshot", defer=None, state=None, defer_state=None)
+
+    snapshot_sub.add_argument(
+        "--output",
+        required=True,
+        help="Required. The path of the snapshot file to write.",
+    )
 
     if not args:
         p.print_help()
         sys.exit(1)
 
     parsed = p.parse_args(args)
+    if getattr(parsed, "incremental_catalog", False) and not parsed.catalog_cache_dir:
+        p.error("--incremental-catalog requires --catalog-cache-dir")
     flags.set_from_args(parsed, {})
     return parsed
 
 
 def handle(args):
     """
-    Execute the given command. Currently only "build" exists, but it can be expanded here.
+    Execute the given command.
     """
     parsed = parse_args(args)
 
     if parsed.command == "build":
         task = SchemaBuilderTask(parsed)
-        task.run(no_pii=parsed.nopii, pii_only=parsed.piionly)
+        task.run(no_pii=parsed.nopii, pii_only=parsed.piionly, strict_duplicates=parsed.strict_duplicates)
+    elif parsed.command == "snapshot":
+        task = SnapshotTask(parsed)
+        task.run()
 
 
 def main(args=None):
@@ -0,0 +1,114 @@
+"""
+Class and helpers for saving raw schema catalogs to a file and building from that file offline
+"""
+import json
+
+from .catalog import iter_table_columns
+from .schema import InvalidConfigurationException, TableFilter
+
+
+def write_catalog_snapshot(snapshot_file_path, catalogs, table_filters=None):
+    """
+    Write the given catalogs to a snapshot file.
+
+    catalogs maps each (database, schema) pair to its rows, in the form GetCatalogTask.run returns them, and
+    table_filters maps (database, schema) pairs to the TableFilter the rows were fetched with. The file is a JSON
+    object whose "catalogs" and "table_filters" each have one "DATABASE.SCHEMA" key per raw schema. Raw schemas
+    without a table filter were fetched whole.
+    """
+    table_filters = table_filters or {}
+    snapshot = {
+        "catalogs": {
+            "{}.{}".format(database, schema): [
+                {
+                    "TABLE_NAME": row["TABLE_NAME"],
+                    "COLUMN_NAME": row["COLUMN_NAME"],
+                    "COLUMN_INDEX": row["COLUMN_INDEX"],
+                }
+                for row in rows
+            ]
+            for (database, schema), rows in catalogs.items()
+        },
+        "table_filters": {
+            "{}.{}".format(database, schema): table_filters[(database, schema)].to_config()
+            for database, schema in catalogs
+            if (database, schema) in table_filters
+        },
+    }
+    with open(snapshot_file_path, "w") as f:
+        json.dump(snapshot, f)
+
+
+class CatalogSnapshot:
+    """
+    Stand-in for GetCatalogTask that answers catalog requests from a snapshot file instead of Snowflake.
+
+    Banned column names are filtered out again on read, so the banned column list can be edited without taking
+    a new snapshot. INCLUDE and EXCLUDE lists can only be narrowed, since tables they left out when the snapshot
+    was taken are not in it.
+    """
+
+    def __init__(self, snapshot_file_path):
+        self.snapshot_file_path = snapshot_file_path
+        with open(snapshot_file_path, "r") as f:
+            snapshot = json.load(f)
+        self.catalogs = snapshot["catalogs"]
+        self.table_filters = {
+            key: TableFilter.from_config(config) for key, config in snapshot["table_filters"].items()
+        }
+
+    def run(  # pylint: disable=unused-argument
+        self, source_database, schema, banned_column_names, connection_name=None, table_filter=None
+    ):
+        """
+        Return the rows of the given schema, as GetCatalogTask.run would.
+
+        Raises:
+          InvalidConfigurationException: When table_filter needs tables that were filtered out of the snapshot.
+        """
+        key = "{}.{}".format(source_database, schema)
+        if key not in self.catalogs:
+            raise KeyError(
+                "{} is not in the catalog snapshot {}. Take a new snapshot after changing schema_config.yml".format(
+                    key, self.snapshot_file_path
+                )
+            )
+        snapshot_filter = self.table_filters.get(key)
+        if snapshot_filter is not None and not (table_filter or TableFilter()).issubset(snapshot_filter):
+            raise InvalidConfigurationException(
+                "The tables of {} needed by schema_config.yml ({}) are not all in the catalog snapshot {}, which "
+                "was taken with {}. Take a new snapshot after changing schema_config.yml".format(
+                    key, table_filter or TableFilter(), self.snapshot_file_path, snapshot_filter
+                )
+            )
+
+        banned_column_names = set(banned_column_names or [])
+        return [
+            row for row in self.catalogs[key]
+            if row["COLUMN_NAME"] not in banned_column_names
+            and (table_filter is None or row["TABLE_NAME"] in table_filter)
+        ]
+
+    def stream(self, source_database, schema, banned_column_names, connection_name=None, table_filter=None):
+        """
+        Yield the (table_name, [column names]) pairs of the given schema, as GetCatalogTask.stream would.
+        """
+        yield from iter_table_columns(
+            self.run(
+                source_database, schema, banned_column_names, connection_name=connection_name,
+                table_filter=table_filter,
+            )
+        )
+
+    def run_batch(self, source_database, schemas, banned_column_names, connection_name=None, table_filters=None):
+        """
+        Return the rows of several schemas in the same database, as GetCatalogTask.run_batch would.
+        """
+        table_filters = table_filters or {}
+        return {
+            schema: self.run(
+                source_database, schema, banned_column_names, connection_name=connection_name,
+                table_filter=table_filters.get(schema),
+            )
+            for schema in schemas
+        }
@@ -0,0 +1,123 @@
+"""
+Class and helpers for remembering which catalog fetch strategy worked for each raw schema
+"""
+import os
+import threading
+
+from .yaml_io import dump_yaml, load_yaml
+
+CATALOG_STRATEGY_FILE_NAME = ".schema_builder_catalog_strategies.yml"
+FULL_STRATEGY = "full"
+PARTITIONED_STRATEGY = "partitioned"
+
+
+def merge_empty_partitions(partitions):
+    """
+    Merge every partition that returned no rows into the neighbouring partition, so it costs no query of its own.
+
+    partitions is a list of adjacent (low, high, row count) table name ranges in order. Empty ranges are merged
+    into the range after them, or into the one before when they come last, and the merged list is returned.
+    """
+    merged = []
+    empty_low = None
+    has_empty = False
+    for low, high, rows in partitions:
+        if not rows:
+            if not has_empty:
+                empty_low = low
+                has_empty = True
+            continue
+        if has_empty:
+            low = empty_low
+            has_empty = False
+        merged.append((low, high, rows))
+
+    if has_empty:
+        if merged:
+            low, _, rows = merged.pop()
+            merged.append((low, partitions[-1][1], rows))
+        else:
+            merged.append((empty_low, partitions[-1][1], 0))
+    return merged
+
+
+class CatalogStrategyMemo:
+    """
+    Class to represent the persisted record of how the catalog of each raw schema was last fetched.
+
+    Schemas that Snowflake refuses to return in a single INFORMATION_SCHEMA query are remembered along with
+    the table name partitions that worked, so the next run can skip the failing full query. The file looks like:
+
+    DATABASE.SCHEMA:
+      strategy: partitioned
+      rows: 123456
+      partitions:
+        - [null, M, 40000]
+        - [M, null, 83456]
+        ...
+
+    Each partition is the TABLE_NAME range from its first name up to but excluding its second, where null
+    leaves that end open, followed by the number of rows it returned.
+    """
+
+    def __init__(self, file_path, reprobe=False):
+        self.file_path = file_path
+        self.reprobe = reprobe
+        self.lock = threading.Lock()
+        self.strategies = self.load()
+
+    def load(self):
+        """
+        Load the memo file, or start an empty memo if there is none yet.
+        """
+        if not os.path.exists(self.file_path):
+            return {}
+
+        with open(self.file_path, "r") as f:
+            strategies = load_yaml(f)
+
+        return strategies if strategies else {}
+
+    @staticmethod
+    def _key(database, schema):
+        return "{}.{}".format(database, schema)
+
+    def get(self, database, schema):
+        """
+        Return the strategy that last worked for the given schema, or None if it should be probed again.
+        """
+        if self.reprobe:
+            return None
+        with self.lock:
+            return self.strategies.get(self._key(database, schema))
+
+    def get_partitions(self, database, schema):
+        """
+        Return the (low, high) table name ranges to fetch the given schema with, or None if the schema has not
+        needed partitioning.
+        """
+        strategy = self.get(database, schema)
+        if not strategy or strategy["strategy"] != PARTITIONED_STRATEGY:
+            return None
+        return [(low, high) for low, high, _ in strategy["partitions"]]
+
+    def record(self, database, schema, strategy, rows, partitions=None):
+        """
+        Remember the strategy that just worked for the given schema.
+
+        partitions is a list of (low, high, row count) tuples for the partitioned strategy. Partitions that
+        returned no rows are merged into their neighbours, so later runs do not query them on their own.
+        """
+        entry = {"strategy": strategy, "rows": rows}
+        if partitions is not None:
+            entry["partitions"] = [list(partition) for partition in merge_empty_partitions(partitions)]
+        with self.lock:
+            self.strategies[self._key(database, schema)] = entry
+
+    def save(self):
+        """
+        Write the memo back out next to the project.
+        """
+        with self.lock:
+            with open(self.file_path, "w") as f:
+                dump_yaml(self.strategies, f, sort_keys=True)
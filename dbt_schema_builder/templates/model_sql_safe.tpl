@@ -3,10 +3,9 @@
 {{ '{{' }} config(schema='{{app}}', alias='{{relation.alias}}') {{ '}}' }}
 {% set soft_del_ns = {'found':false} %}
 SELECT
-{% for col in relation.columns -%}
-  {% set app_table = app|upper ~ '.' ~ relation.alias|upper %}
-  {% if app_table in redactions and col.name in redactions[app_table] -%}
-    {{ redactions[app_table][col.name]|safe }} as {{ col.name|upper|indent -}}
+{% for col in relation.columns %}
+  {% if col.name in column_redactions -%}
+    {{ column_redactions[col.name]|safe }} as {{ col.name|upper|indent -}}
   {% else -%}
     {{ col.name|upper|indent }}
   {%- endif -%}
@@ -0,0 +1,66 @@
+"""
+Helpers for reading and writing YAML files, with libyaml when PyYAML was built with it
+"""
+import re
+
+import yaml
+
+SafeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+CSafeDumper = getattr(yaml, "CSafeDumper", None)
+
+# libyaml wraps and escapes double quoted strings differently from PyYAML, and only writes mapping keys
+# shorter than this as simple keys, so only documents within these limits are dumped with it.
+LIBYAML_SAFE_STRING = re.compile(r'[\x20-\x7e]*')
+LIBYAML_MAX_KEY_LENGTH = 100
+
+
+def load_yaml(stream):
+    """
+    Parse the YAML document in the given stream or string into plain Python objects.
+    """
+    return yaml.load(stream, Loader=SafeLoader)
+
+
+def _emits_like_pyyaml(data):
+    """
+    Return True if libyaml writes the given document byte for byte the same as PyYAML.
+
+    That is the case for mappings and lists of strings made of printable ASCII characters, numbers, booleans
+    and nulls, without empty or long keys and without objects that appear more than once (which get anchors).
+    """
+    if not isinstance(data, (dict, list)):
+        return False
+
+    seen = set()
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, str):
+            if not LIBYAML_SAFE_STRING.fullmatch(value):
+                return False
+        elif isinstance(value, (dict, list)):
+            if id(value) in seen:
+                return False
+            seen.add(id(value))
+            if isinstance(value, dict):
+                for key in value:
+                    if not isinstance(key, str) or not 0 < len(key) < LIBYAML_MAX_KEY_LENGTH:
+                        return False
+                stack.extend(value)
+                stack.extend(value.values())
+            else:
+                stack.extend(value)
+        elif value is not None and not isinstance(value, (bool, int, float)):
+            return False
+    return True
+
+
+def dump_yaml(data, stream=None, sort_keys=False):
+    """
+    Write data as YAML to the given stream, or return it as a string when no stream is given.
+
+    The output is always the same as yaml.safe_dump's, but libyaml is used to write it whenever that is
+    guaranteed.
+    """
+    dumper = CSafeDumper if CSafeDumper is not None and _emits_like_pyyaml(data) else yaml.SafeDumper
+    return yaml.dump(data, stream, Dumper=dumper, sort_keys=sort_keys)
@@ -8,3 +8,314 @@ in multiple test modules (i.e. factoryboy factories, base test classes).
 
 So this package is the place to put them.
 """
+
+import re
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+from dbt.exceptions import DbtDatabaseError
+
+from dbt_schema_builder.builder import INFORMATION_SCHEMA_ENGINE, GetCatalogTask
+
+
+class FakeTable:
+    """
+    Stand-in for the agate Table returned by adapter.execute(sql, fetch=True).
+    """
+
+    def __init__(self, column_names, rows):
+        self.column_names = column_names
+        self.rows = rows
+
+    def __iter__(self):
+        return iter(self.rows)
+
+
+class FakeCursor:
+    """
+    Stand-in for a Snowflake cursor holding the result of one query.
+    """
+
+    def __init__(self, table):
+        self.description = [(column_name,) for column_name in table.column_names]
+        self.rows = list(table.rows)
+        self.fetchmany_sizes = []
+
+    def fetchmany(self, size):
+        """
+        Return the next `size` rows.
+        """
+        self.fetchmany_sizes.append(size)
+        batch, self.rows = self.rows[:size], self.rows[size:]
+        return batch
+
+
+class FakeConnections:
+    """
+    Stand-in for the connection manager of a dbt adapter, answering add_query with a FakeCursor.
+    """
+
+    def __init__(self, adapter):
+        self.adapter = adapter
+        self.cursors = []
+
+    def add_query(self, sql):
+        """
+        Run the query against the FakeAdapter and return (connection, cursor).
+        """
+        _, table = self.adapter.execute(sql, fetch=True)
+        self.cursors.append(FakeCursor(table))
+        return None, self.cursors[-1]
+
+
+FakeResponse = namedtuple("FakeResponse", ["rows_affected", "query_id"])
+
+SHOW_COLUMNS_COLUMN_NAMES = [
+    "table_name", "schema_name", "column_name", "data_type", "null?", "default", "kind", "expression", "comment",
+    "database_name", "autoincrement",
+]
+
+
+class FakeAdapter:
+    """
+    Stand-in for a dbt Snowflake adapter that answers catalog queries from canned column rows.
+
+    `columns` maps a (database, schema) pair to a list of (table_name, column_name) tuples, in column order.
+    Any query whose result would contain more than `max_rows` rows fails the same way Snowflake does when an
+    INFORMATION_SCHEMA query returns too much data. `last_altered` maps a (database, schema) pair to a dict of
+    table name to LAST_ALTERED time, for queries against INFORMATION_SCHEMA.TABLES.
+
+    SHOW COLUMNS IN SCHEMA is answered from `show_output`, which maps a (database, schema) pair to canned rows in
+    the SHOW_COLUMNS_COLUMN_NAMES layout, and otherwise from `columns`. RESULT_SCAN reads back the last SHOW.
+
+    With `native_cursor` set, the adapter also exposes `connections.add_query` for reading results off a cursor.
+    """
+
+    def __init__(self, columns, max_rows=None, last_altered=None, show_output=None, native_cursor=False):
+        if native_cursor:
+            self.connections = FakeConnections(self)
+        self.columns = columns
+        self.max_rows = max_rows
+        self.last_altered = last_altered or {}
+        self.show_output = show_output or {}
+        self.last_show_rows = []
+        self.queries = []
+        self.connection_names = []
+
+    @contextmanager
+    def connection_named(self, name):
+        """
+        Record the name of each connection the catalog code asks for.
+        """
+        self.connection_names.append(name)
+        yield
+
+    def _column_rows(self, database, schema):
+        """
+        Return (schema, table, column, column index) rows for one schema.
+        """
+        if (database, schema) not in self.columns:
+            return []
+        rows = []
+        index = {}
+        for table_name, column_name in self.columns[(database, schema)]:
+            index[table_name] = index.get(table_name, 0) + 1
+            rows.append((schema, table_name, column_name, index[table_name]))
+        return rows
+
+    def execute(self, sql, fetch=False):  # pylint: disable=unused-argument
+        """
+        Answer a query built from the templates in dbt_schema_builder.queries.
+        """
+        self.queries.append(sql)
+
+        show = re.search(r"SHOW COLUMNS IN SCHEMA (\w+)\.(\w+)", sql)
+        if show:
+            return self._show_columns(show.group(1), show.group(2))
+        if "RESULT_SCAN" in sql:
+            return self._result_scan(sql)
+
+        database = re.search(r"FROM (\w+)\.INFORMATION_SCHEMA", sql)
+        if not database or all(db != database.group(1) for db, _ in self.columns):
+            raise DbtDatabaseError("Database does not exist or not authorized.")
+        database = database.group(1)
+
+        if "INFORMATION_SCHEMA.TABLES" in sql:
+            schema = re.search(r"TABLE_SCHEMA = '(\w+)'", sql).group(1)
+            if "LAST_ALTERED" not in sql:
+                table_names = sorted({row[1] for row in self._column_rows(database, schema)})
+                return None, FakeTable(["TABLE_NAME"], [(name,) for name in table_names])
+            last_altered = self.last_altered.get((database, schema), {})
+            return None, FakeTable(["TABLE_NAME", "LAST_ALTERED"], sorted(last_altered.items()))
+
+        in_match = re.search(r"TABLE_SCHEMA IN \(([^)]*)\)", sql)
+        if in_match:
+            schemas = [s.strip().strip("'") for s in in_match.group(1).split(",")]
+        else:
+            schemas = [re.search(r"TABLE_SCHEMA = '(\w+)'", sql).group(1)]
+
+        rows = []
+        for schema in schemas:
+            rows.extend(self._column_rows(database, schema))
+
+        banned = re.search(r"COLUMN_NAME NOT IN \(([^)]*)\)", sql)
+        if banned:
+            banned_names = [s.strip().strip("'") for s in banned.group(1).split(",")]
+            rows = [row for row in rows if row[2] not in banned_names]
+
+        table_names = re.search(r"TABLE_NAME IN \(([^)]*)\)", sql)
+        if table_names:
+            names = [s.strip().strip("'") for s in table_names.group(1).split(",")]
+            rows = [row for row in rows if row[1] in names]
+
+        for excluded in re.findall(r"TABLE_NAME NOT IN \(([^)]*)\)", sql):
+            names = [s.strip().strip("'") for s in excluded.split(",")]
+            rows = [row for row in rows if row[1] not in names]
+
+        low = re.search(r"TABLE_NAME >= '((?:[^']|'')*)'", sql)
+        if low:
+            rows = [row for row in rows if row[1] >= low.group(1).replace("''", "'")]
+
+        high = re.search(r"TABLE_NAME < '((?:[^']|'')*)'", sql)
+        if high:
+            rows = [row for row in rows if row[1] < high.group(1).replace("''", "'")]
+
+        if self.max_rows is not None and len(rows) > self.max_rows:
+            raise DbtDatabaseError("Information schema query returned too much data. Please repeat query with "
+                                   "more selective predicates.")
+
+        rows.sort(key=lambda row: (row[0], row[1], row[3]))
+        if in_match:
+            return None, FakeTable(["TABLE_SCHEMA", "TABLE_NAME", "COLUMN_NAME", "COLUMN_INDEX"], rows)
+        return None, FakeTable(["TABLE_NAME", "COLUMN_NAME", "COLUMN_INDEX"], [row[1:] for row in rows])
+
+    def _show_columns(self, database, schema):
+        """
+        Answer SHOW COLUMNS IN SCHEMA the way Snowflake lays it out.
+        """
+        if all(db != database for db, _ in self.columns) and (database, schema) not in self.show_output:
+            raise DbtDatabaseError("Schema does not exist or not authorized.")
+
+        if (database, schema) in self.show_output:
+            rows = self.show_output[(database, schema)]
+        else:
+            rows = [
+                (table_name, schema, column_name, '{"type":"TEXT"}', "true", "", "COLUMN", "", "", database, "")
+                for _, table_name, column_name, _ in self._column_rows(database, schema)
+            ]
+        self.last_show_rows = rows
+        return FakeResponse(len(rows), "fake-query-id"), FakeTable(SHOW_COLUMNS_COLUMN_NAMES, rows)
+
+    def _result_scan(self, sql):
+        """
+        Answer a RESULT_SCAN over the last SHOW COLUMNS, dropping banned columns.
+        """
+        banned = re.search(r'"column_name" NOT IN \(([^)]*)\)', sql)
+        banned_names = [s.strip().strip("'") for s in banned.group(1).split(",")] if banned else []
+        rows = [(row[0], row[2]) for row in self.last_show_rows if row[2] not in banned_names]
+        return FakeResponse(len(rows), "fake-query-id"), FakeTable(["TABLE_NAME", "COLUMN_NAME"], rows)
+
+
+class FakeAsyncConnection:
+    """
+    Stand-in for a Snowflake connector connection that runs queries asynchronously with simulated latency.
+
+    Queries are answered by the given FakeAdapter once `latency` seconds have passed since they were submitted.
+    The highest number of queries in flight at once is recorded, overall and per source database. Queries can
+    be submitted and polled from any thread.
+    """
+
+    def __init__(self, adapter, latency=0.0, warehouse="WAREHOUSE"):
+        self.adapter = adapter
+        self.latency = latency
+        self.warehouse = warehouse
+        self.queries = {}
+        self.in_flight = {}
+        self.max_in_flight = 0
+        self.max_in_flight_per_database = {}
+        self.lock = threading.Lock()
+
+    def cursor(self):
+        """
+        Return a new cursor on this connection.
+        """
+        return FakeAsyncCursor(self)
+
+    def submit(self, sql):
+        """
+        Start the clock on a new query and return its id.
+        """
+        database = re.search(r"FROM (\w+)\.INFORMATION_SCHEMA", sql).group(1)
+        with self.lock:
+            query_id = str(len(self.queries))
+            self.queries[query_id] = {
+                "sql": sql, "database": database, "submitted": time.monotonic(), "finished": None, "result": None,
+            }
+            self.in_flight[database] = self.in_flight.get(database, 0) + 1
+            self.max_in_flight = max(self.max_in_flight, sum(self.in_flight.values()))
+            self.max_in_flight_per_database[database] = max(
+                self.max_in_flight_per_database.get(database, 0), self.in_flight[database]
+            )
+        return query_id
+
+    def get_query_status_throw_if_error(self, query_id):
+        """
+        Return RUNNING until the latency has passed, then run the query, raising any error it fails with.
+        """
+        with self.lock:
+            query = self.queries[query_id]
+            if query["result"] is None:
+                if time.monotonic() - query["submitted"] < self.latency:
+                    return "RUNNING"
+                self.in_flight[query["database"]] -= 1
+                query["finished"] = time.monotonic()
+                _, query["result"] = self.adapter.execute(query["sql"], fetch=True)
+        return "SUCCESS"
+
+    @staticmethod
+    def is_still_running(status):
+        """
+        Return True for the status of a query that has not finished.
+        """
+        return status == "RUNNING"
+
+
+class FakeAsyncCursor(FakeCursor):
+    """
+    Stand-in for a Snowflake cursor that submits queries asynchronously on a FakeAsyncConnection.
+    """
+
+    def __init__(self, connection):  # pylint: disable=super-init-not-called
+        self.connection = connection
+        self.sfqid = None
+        self.description = None
+        self.rows = []
+        self.fetchmany_sizes = []
+
+    def execute_async(self, sql):
+        """
+        Submit the query without waiting for it.
+        """
+        self.sfqid = self.connection.submit(sql)
+
+    def get_results_from_sfqid(self, query_id):
+        """
+        Load the result of a finished query into the cursor.
+        """
+        table = self.connection.queries[query_id]["result"]
+        self.description = [(column_name,) for column_name in table.column_names]
+        self.rows = list(table.rows)
+
+
+def get_catalog_task(catalog_engine=INFORMATION_SCHEMA_ENGINE):
+    """
+    Create a GetCatalogTask without loading a dbt config.
+    """
+    task = GetCatalogTask.__new__(GetCatalogTask)
+    task.config = None
+    task.strategy_memo = None
+    task.catalog_engine = catalog_engine
+    task.connection_pool = None
+    return task
@@ -2,8 +2,12 @@
 Tests for the App class
 """
 
-from dbt_schema_builder.app import App
-from dbt_schema_builder.relation import Relation
+from copy import deepcopy
+
+import pytest
+
+from dbt_schema_builder.app import App, DuplicateDownstreamSourceException
+from dbt_schema_builder.relation import CurrentSources, Relation
 from dbt_schema_builder.schema import Schema
 
 
@@ -232,6 +236,76 @@ def test_add_table_to_downstream_sources(tmpdir):
     assert app.new_downstream_sources == expected_downstream_sources
 
 
+def test_add_table_to_downstream_sources_among_other_sources():
+    current_downstream_sources = {
+        "version": 2,
+        "sources": [
+            {"name": "ECOM", "database": "PROD", "tables": [{"name": "ORDERS"}]},
+            {"name": "LMS_PII", "database": "PROD", "tables": [{"name": "OLD_TABLE"}]},
+            {"name": "ECOM_PII", "database": "PROD", "tables": [{"name": "ORDERS"}]},
+        ],
+    }
+    app = App(
+        [Schema('PROD', 'LMS_RAW', [], [], None, None)],
+        'LMS',
+        'models/PROD/LMS',
+        'models/PROD/LMS/LMS.yml',
+        {},
+        current_downstream_sources,
+        'PROD'
+    )
+    assert app.downstream_source_indexes == {"ECOM": [0], "LMS_PII": [1], "ECOM_PII": [2], "LMS": [3]}
+
+    relation = Relation('THIS_TABLE', ['COLUMN_1'], 'LMS', 'models/PROD/LMS', [], [], [], [])
+    app.add_table_to_downstream_sources(relation, None, None)
+
+    assert app.new_downstream_sources["sources"] == [
+        {"name": "ECOM", "database": "PROD", "tables": [{"name": "ORDERS"}]},
+        {"name": "LMS_PII", "database": "PROD", "tables": [{"name": "THIS_TABLE", "description": "TODO: Replace me"}]},
+        {"name": "ECOM_PII", "database": "PROD", "tables": [{"name": "ORDERS"}]},
+        {"name": "LMS", "database": "PROD", "tables": [{"name": "THIS_TABLE", "description": "TODO: Replace me"}]},
+    ]
+
+
+def test_current_downstream_sources_not_mutated():
+    current_downstream_sources = {
+        "version": 2,
+        "sources": [
+            {
+                "name": "ECOM",
+                "database": "PROD",
+                "tables": [{"name": "ORDERS", "tests": ["not_null"], "description": "Hand written"}],
+            },
+            {"name": "LMS", "database": "PROD", "tables": [{"name": "OLD_TABLE"}]},
+            {"name": "LMS", "database": "PROD", "tables": [{"name": "OTHER_OLD_TABLE"}]},
+            {"name": "LMS_PII", "database": "PROD", "tables": [{"name": "THIS_TABLE", "description": "Kept"}]},
+        ],
+    }
+    original = deepcopy(current_downstream_sources)
+
+    app = App(
+        [Schema('PROD', 'LMS_RAW', [], [], None, None)],
+        'LMS',
+        'models/PROD/LMS',
+        'models/PROD/LMS/LMS.yml',
+        {},
+        current_downstream_sources,
+        'PROD'
+    )
+    relation = Relation('THIS_TABLE', ['COLUMN_1'], 'LMS', 'models/PROD/LMS', [], [], [], [])
+    _, current_safe_source, current_pii_source = relation.find_in_current_sources({}, current_downstream_sources)
+    app.add_table_to_downstream_sources(relation, current_safe_source, current_pii_source)
+
+    assert current_downstream_sources == original
+    new_sources = app.new_downstream_sources["sources"]
+    # Sources of other apps are shared, the sources of this app are rebuilt
+    assert new_sources[0] is current_downstream_sources["sources"][0]
+    assert all(new is not current for new, current in zip(new_sources[1:], current_downstream_sources["sources"][1:]))
+    assert [table["name"] for table in new_sources[1]["tables"]] == ["OLD_TABLE", "THIS_TABLE"]
+    assert [table["name"] for table in new_sources[2]["tables"]] == ["THIS_TABLE"]
+    assert new_sources[3]["tables"] == [{"name": "THIS_TABLE", "description": "Kept"}]
+
+
 def test_add_table_to_downstream_sources_no_pii(tmpdir):
     app_path_base = tmpdir.mkdir('models')
     db_path = app_path_base.mkdir('PROD')
@@ -599,6 +673,63 @@ def test_dupe_detection(tmpdir):
     assert app.check_downstream_sources_for_dupes()
 
 
+def test_dupe_detection_reports_origin():
+    raw_schemas = [
+        Schema('PROD', 'LMS_RAW', [], [], None, None),
+        Schema('PROD', 'LMS_STITCH_RAW', [], [], None, 'RAW'),
+    ]
+    relations = [
+        Relation('RAW_TABLE', ['COLUMN_1'], 'LMS', 'models/PROD/LMS', [], [], [], []),
+        Relation('TABLE', ['COLUMN_1'], 'LMS', 'models/PROD/LMS', [], [], [], [], prefix='RAW'),
+    ]
+
+    app = App(raw_schemas, 'LMS', 'models/PROD/LMS', 'models/PROD/LMS/LMS.yml', {}, {}, 'PROD', no_pii=True)
+    for raw_schema, relation in zip(raw_schemas, relations):
+        app.add_table_to_downstream_sources(relation, None, None, raw_schema=raw_schema)
+
+    assert app.check_downstream_sources_for_dupes() == ['LMS.RAW_TABLE']
+    assert app.find_duplicate_downstream_tables() == [
+        ('LMS.RAW_TABLE', 'LMS_STITCH_RAW.TABLE (prefix RAW)', 'LMS_RAW.RAW_TABLE')
+    ]
+
+    app = App(
+        raw_schemas, 'LMS', 'models/PROD/LMS', 'models/PROD/LMS/LMS.yml', {}, {}, 'PROD', no_pii=True,
+        strict_duplicates=True,
+    )
+    app.add_table_to_downstream_sources(relations[0], None, None, raw_schema=raw_schemas[0])
+    with pytest.raises(DuplicateDownstreamSourceException, match='LMS.RAW_TABLE from LMS_STITCH_RAW.TABLE'):
+        app.add_table_to_downstream_sources(relations[1], None, None, raw_schema=raw_schemas[1])
+    assert len(app.new_downstream_sources['sources'][0]['tables']) == 1
+
+
+def test_dupe_detection_after_prefix_rename():
+    raw_schemas = [
+        Schema('PROD', 'LMS_RAW', [], [], None, None),
+        Schema('PROD', 'LMS_STITCH_RAW', [], [], None, 'RAW'),
+    ]
+    relations = [
+        Relation('TABLE', ['COLUMN_1'], 'LMS', 'models/PROD/LMS', [], [], [], []),
+        Relation('TABLE', ['COLUMN_1'], 'LMS', 'models/PROD/LMS', [], [], [], [], prefix='RAW'),
+    ]
+    current_downstream_sources = {
+        'sources': [{'name': 'LMS', 'database': 'PROD', 'tables': [{'name': 'TABLE'}]}],
+    }
+    current_sources = CurrentSources({}, current_downstream_sources)
+
+    app = App(
+        raw_schemas, 'LMS', 'models/PROD/LMS', 'models/PROD/LMS/LMS.yml', {}, current_downstream_sources, 'PROD',
+        no_pii=True,
+    )
+    for raw_schema, relation in zip(raw_schemas, relations):
+        _, current_safe_source, _ = current_sources.find(relation.source_relation_name, 'LMS', relation.prefix)
+        app.add_table_to_downstream_sources(relation, current_safe_source, None, raw_schema=raw_schema)
+
+    # The entry added for LMS_RAW.TABLE was renamed to RAW_TABLE when the prefixed relation looked it up
+    assert app.find_duplicate_downstream_tables() == [
+        ('LMS.RAW_TABLE', 'LMS_STITCH_RAW.TABLE (prefix RAW)', 'LMS_RAW.TABLE')
+    ]
+
+
 def test_add_table_to_downstream_sources_pii_only(tmpdir):
     app_path_base = tmpdir.mkdir('models')
     db_path = app_path_base.mkdir('PROD')
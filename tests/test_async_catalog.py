@@ -0,0 +1,104 @@
+"""
+Tests for the AsyncCatalogFetcher class
+"""
+
+import asyncio
+from contextlib import contextmanager
+from unittest.mock import patch
+
+from dbt_schema_builder.async_catalog import AsyncCatalogFetcher
+from dbt_schema_builder.builder import SHOW_COLUMNS_ENGINE, SchemaBuilder
+from test_utils import FakeAdapter, FakeAsyncConnection, get_catalog_task
+
+
+def fetch_all(fetcher, raw_schema_names, banned_column_names=()):
+    """
+    Run fetcher.fetch_all to completion, returning the results in completion order.
+    """
+    async def collect():
+        return [result async for result in fetcher.fetch_all(raw_schema_names, banned_column_names)]
+
+    return asyncio.run(collect())
+
+
+def test_fetch_all_limits_queries_in_flight():
+    columns = {
+        ('DB_1', 'RAW_SCHEMA_{}'.format(i)): [('TABLE_A', 'COLUMN_A'), ('TABLE_A', 'BANNED')] for i in range(4)
+    }
+    columns.update({('DB_2', 'RAW_SCHEMA_{}'.format(i)): [('TABLE_B', 'COLUMN_B')] for i in range(4)})
+    connection = FakeAsyncConnection(FakeAdapter(columns), latency=0.02)
+    fetcher = AsyncCatalogFetcher(
+        get_catalog_task(), connection, max_queries_per_warehouse=3, max_queries_per_database=2, poll_interval=0.005
+    )
+
+    results = dict(fetch_all(fetcher, sorted(columns), ['BANNED']))
+
+    assert results[('DB_1', 'RAW_SCHEMA_0')] == [
+        {'TABLE_NAME': 'TABLE_A', 'COLUMN_NAME': 'COLUMN_A', 'COLUMN_INDEX': 1}
+    ]
+    assert results[('DB_2', 'RAW_SCHEMA_3')] == [
+        {'TABLE_NAME': 'TABLE_B', 'COLUMN_NAME': 'COLUMN_B', 'COLUMN_INDEX': 1}
+    ]
+    assert connection.max_in_flight == 3
+    assert connection.max_in_flight_per_database == {'DB_1': 2, 'DB_2': 2}
+
+
+def test_busy_database_does_not_hold_warehouse_slots():
+    columns = {('DB_1', 'RAW_SCHEMA_{}'.format(i)): [('TABLE_A', 'COLUMN_A')] for i in range(3)}
+    columns[('DB_2', 'RAW_SCHEMA_0')] = [('TABLE_B', 'COLUMN_B')]
+    connection = FakeAsyncConnection(FakeAdapter(columns), latency=0.05)
+    fetcher = AsyncCatalogFetcher(
+        get_catalog_task(), connection, max_queries_per_warehouse=2, max_queries_per_database=1, poll_interval=0.005
+    )
+
+    fetch_all(fetcher, sorted(columns))
+
+    # The DB_2 query went out alongside the first DB_1 one, instead of waiting behind the other DB_1 queries
+    queries = sorted(connection.queries.values(), key=lambda query: query['finished'])
+    assert sorted(query['database'] for query in queries[:2]) == ['DB_1', 'DB_2']
+    assert connection.max_in_flight_per_database == {'DB_1': 1, 'DB_2': 1}
+
+
+def test_fetch_leaves_unsupported_schemas_to_run():
+    columns = {('DB_1', 'RAW_SCHEMA_1'): [('TABLE_A', 'COLUMN_A'), ('TABLE_B', 'COLUMN_B')]}
+
+    too_much_data = FakeAsyncConnection(FakeAdapter(columns, max_rows=1))
+    fetcher = AsyncCatalogFetcher(get_catalog_task(), too_much_data, max_queries_per_warehouse=1, poll_interval=0)
+    assert fetch_all(fetcher, [('DB_1', 'RAW_SCHEMA_1')]) == [(('DB_1', 'RAW_SCHEMA_1'), None)]
+
+    show = FakeAsyncConnection(FakeAdapter(columns))
+    fetcher = AsyncCatalogFetcher(get_catalog_task(SHOW_COLUMNS_ENGINE), show, max_queries_per_warehouse=1)
+    assert fetch_all(fetcher, [('DB_1', 'RAW_SCHEMA_1')]) == [(('DB_1', 'RAW_SCHEMA_1'), None)]
+    assert not show.queries
+
+
+@patch.object(SchemaBuilder, 'get_redactions', lambda x: {})
+@patch.object(SchemaBuilder, 'get_snowflake_keywords', lambda x: {})
+@patch.object(SchemaBuilder, 'get_banned_columns', lambda x: {})
+@patch.object(SchemaBuilder, 'get_unmanaged_tables', lambda x: {})
+@patch.object(SchemaBuilder, 'get_downstream_sources_allow_list', lambda x: {})
+def test_prefetch_catalogs_async(tmpdir):
+    app_config = {
+        'DB_1.APP_1': {
+            'DB_2.RAW_SCHEMA_1': {},
+            'DB_2.RAW_SCHEMA_2': {},
+        },
+    }
+    adapter = FakeAdapter(
+        {
+            ('DB_2', 'RAW_SCHEMA_1'): [('TABLE_A', 'COLUMN_A')],
+            ('DB_2', 'RAW_SCHEMA_2'): [('TABLE_B', 'COLUMN_B'), ('TABLE_C', 'COLUMN_C')],
+        },
+        max_rows=1,
+    )
+    task = get_catalog_task()
+    task.native_connection = contextmanager(lambda: iter([FakeAsyncConnection(adapter)]))
+
+    with patch.object(SchemaBuilder, 'get_app_schema_configs', lambda x: app_config):
+        with patch('dbt_schema_builder.builder.get_adapter', lambda config: adapter):
+            builder = SchemaBuilder(str(tmpdir), str(tmpdir), str(tmpdir), task)
+            catalogs = builder.prefetch_catalogs(threads=2, async_queries=True)
+
+    # RAW_SCHEMA_2 is too large for one query, so it is fetched by table name range on a worker thread
+    assert catalogs[('DB_2', 'RAW_SCHEMA_1')] == {'RAW_SCHEMA_1': {'TABLE_A': ['COLUMN_A']}}
+    assert catalogs[('DB_2', 'RAW_SCHEMA_2')] == {'RAW_SCHEMA_2': {'TABLE_B': ['COLUMN_B'], 'TABLE_C': ['COLUMN_C']}}
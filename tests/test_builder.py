@@ -3,14 +3,29 @@ Tests for various things in builder.py
 """
 
 import os
+import re
 from tempfile import mkdtemp
 from unittest.mock import MagicMock, patch
 
 import pytest
 import yaml
 
-from dbt_schema_builder.builder import GetCatalogTask, SchemaBuilder
-from dbt_schema_builder.schema import InvalidConfigurationException
+from dbt_schema_builder.builder import (
+    INCLUDED_TABLES_PLAN,
+    SHOW_COLUMNS_ENGINE,
+    SINGLE_QUERY_PLAN,
+    TABLE_NAME_CHUNK_SIZE,
+    GetCatalogTask,
+    InvalidDatabaseException,
+    SchemaBuilder,
+    SchemaBuilderTask,
+)
+from dbt_schema_builder.cache import CatalogCache
+from dbt_schema_builder.schema import InvalidConfigurationException, TableFilter
+from dbt_schema_builder.schema_builder import parse_args
+from dbt_schema_builder.snapshot import CatalogSnapshot, write_catalog_snapshot
+from dbt_schema_builder.strategy import CATALOG_STRATEGY_FILE_NAME, PARTITIONED_STRATEGY, CatalogStrategyMemo
+from test_utils import FakeAdapter, get_catalog_task
 
 
 def get_valid_test_config():
@@ -191,9 +206,9 @@ def test_build_app():
 
     temp_dir = mkdtemp()
     mock_get_catalog_task = MagicMock(GetCatalogTask)
-    mock_get_catalog_task.run.return_value = [
-        {"TABLE_NAME": "TABLE_A", "COLUMN_NAME": "COLUMN_A"},
-        {"TABLE_NAME": "TABLE_B", "COLUMN_NAME": "COLUMN_D"},
+    mock_get_catalog_task.stream.return_value = [
+        ("TABLE_A", ["COLUMN_A"]),
+        ("TABLE_B", ["COLUMN_D"]),
     ]
     with patch.object(SchemaBuilder, 'build_app_path', lambda x, y, z: temp_dir):
         with patch.object(SchemaBuilder, 'get_app_schema_configs', lambda x: app_config):
@@ -209,3 +224,754 @@ def test_build_app():
     assert raw_source['sources'][0]['name'] == 'RAW_SCHEMA_1'
     assert raw_source['sources'][1]['database'] == 'DB_3'
     assert raw_source['sources'][1]['name'] == 'RAW_SCHEMA_2'
+
+
+@patch.object(SchemaBuilder, 'get_redactions', lambda x: {})
+@patch.object(SchemaBuilder, 'get_snowflake_keywords', lambda x: {})
+@patch.object(SchemaBuilder, 'get_banned_columns', lambda x: {})
+@patch.object(SchemaBuilder, 'get_unmanaged_tables', lambda x: {})
+@patch.object(SchemaBuilder, 'get_downstream_sources_allow_list', lambda x: {})
+def test_prefetch_catalogs():
+    app_config = {
+        'DB_1.APP_1': {
+            'DB_2.RAW_SCHEMA_1': {},
+            'DB_3.RAW_SCHEMA_2': {},
+        },
+        'DB_1.APP_2': {
+            'DB_2.RAW_SCHEMA_1': {},
+        },
+    }
+
+    temp_dir = mkdtemp()
+    mock_get_catalog_task = MagicMock(GetCatalogTask)
+    mock_get_catalog_task.stream.return_value = [
+        ("TABLE_A", ["COLUMN_A", "COLUMN_B"]),
+        ("TABLE_B", ["COLUMN_C"]),
+    ]
+    with patch.object(SchemaBuilder, 'get_app_schema_configs', lambda x: app_config):
+        builder = SchemaBuilder(temp_dir, temp_dir, temp_dir, mock_get_catalog_task)
+        catalogs = builder.prefetch_catalogs(threads=4)
+
+    # Each raw schema is fetched once, no matter how many apps use it
+    assert mock_get_catalog_task.stream.call_count == 2
+    assert set(catalogs) == {('DB_2', 'RAW_SCHEMA_1'), ('DB_3', 'RAW_SCHEMA_2')}
+    for call in mock_get_catalog_task.stream.call_args_list:
+        assert call.kwargs['connection_name'].startswith('generate_catalog_')
+
+    assert builder.get_relations('DB_2', 'RAW_SCHEMA_1') == {
+        'RAW_SCHEMA_1': {
+            'TABLE_A': ['COLUMN_A', 'COLUMN_B'],
+            'TABLE_B': ['COLUMN_C'],
+        }
+    }
+    assert mock_get_catalog_task.stream.call_count == 2
+
+
+def test_run_batch():
+    adapter = FakeAdapter({
+        ('DB_1', 'RAW_SCHEMA_1'): [('TABLE_A', 'COLUMN_A'), ('TABLE_A', 'BANNED')],
+        ('DB_1', 'RAW_SCHEMA_2'): [('TABLE_B', 'COLUMN_B')],
+    })
+    with patch('dbt_schema_builder.builder.get_adapter', lambda config: adapter):
+        catalog = get_catalog_task().run_batch('DB_1', ['RAW_SCHEMA_1', 'RAW_SCHEMA_2', 'EMPTY'], ['BANNED'])
+
+    assert len(adapter.queries) == 1
+    assert catalog == {
+        'RAW_SCHEMA_1': [{'TABLE_NAME': 'TABLE_A', 'COLUMN_NAME': 'COLUMN_A', 'COLUMN_INDEX': 1}],
+        'RAW_SCHEMA_2': [{'TABLE_NAME': 'TABLE_B', 'COLUMN_NAME': 'COLUMN_B', 'COLUMN_INDEX': 1}],
+        'EMPTY': [],
+    }
+
+
+def test_run_batch_too_much_data():
+    adapter = FakeAdapter(
+        {
+            ('DB_1', 'RAW_SCHEMA_1'): [('TABLE_A', 'COLUMN_A'), ('TABLE_A', 'COLUMN_B')],
+            ('DB_1', 'RAW_SCHEMA_2'): [('TABLE_B', 'COLUMN_C')],
+        },
+        max_rows=2,
+    )
+    with patch('dbt_schema_builder.builder.get_adapter', lambda config: adapter):
+        catalog = get_catalog_task().run_batch('DB_1', ['RAW_SCHEMA_1', 'RAW_SCHEMA_2'], [])
+
+    # One failed batched query, then one query per schema
+    assert len(adapter.queries) == 3
+    assert [r['COLUMN_NAME'] for r in catalog['RAW_SCHEMA_1']] == ['COLUMN_A', 'COLUMN_B']
+    assert [r['COLUMN_NAME'] for r in catalog['RAW_SCHEMA_2']] == ['COLUMN_C']
+
+
+@patch.object(SchemaBuilder, 'get_redactions', lambda x: {})
+@patch.object(SchemaBuilder, 'get_snowflake_keywords', lambda x: {})
+@patch.object(SchemaBuilder, 'get_banned_columns', lambda x: {})
+@patch.object(SchemaBuilder, 'get_unmanaged_tables', lambda x: {})
+@patch.object(SchemaBuilder, 'get_downstream_sources_allow_list', lambda x: {})
+def test_prefetch_catalogs_batch():
+    app_config = {
+        'DB_1.APP_1': {
+            'DB_2.RAW_SCHEMA_1': {},
+            'DB_2.RAW_SCHEMA_2': {},
+            'DB_3.RAW_SCHEMA_3': {},
+        },
+    }
+    adapter = FakeAdapter({
+        ('DB_2', 'RAW_SCHEMA_1'): [('TABLE_A', 'COLUMN_A')],
+        ('DB_2', 'RAW_SCHEMA_2'): [('TABLE_B', 'COLUMN_B')],
+        ('DB_3', 'RAW_SCHEMA_3'): [('TABLE_C', 'COLUMN_C')],
+    })
+
+    temp_dir = mkdtemp()
+    with patch.object(SchemaBuilder, 'get_app_schema_configs', lambda x: app_config):
+        with patch('dbt_schema_builder.builder.get_adapter', lambda config: adapter):
+            builder = SchemaBuilder(temp_dir, temp_dir, temp_dir, get_catalog_task())
+            catalogs = builder.prefetch_catalogs(threads=2, batch=True)
+
+    # One query per database
+    assert len(adapter.queries) == 2
+    assert catalogs[('DB_2', 'RAW_SCHEMA_2')] == {'RAW_SCHEMA_2': {'TABLE_B': ['COLUMN_B']}}
+    assert catalogs[('DB_3', 'RAW_SCHEMA_3')] == {'RAW_SCHEMA_3': {'TABLE_C': ['COLUMN_C']}}
+
+
+def test_fetch_catalog_by_range():
+    columns = [
+        ('AA', 'COLUMN_1'), ('AA', 'COLUMN_2'),
+        ('AB', 'COLUMN_1'), ('AB', 'COLUMN_2'),
+        ('A', 'COLUMN_1'),
+        ('A-1', 'COLUMN_1'),
+        ('B', 'COLUMN_1'),
+        ('1_TABLE', 'COLUMN_1'),
+        ('lower', 'COLUMN_1'),
+        ('_HIDDEN', 'COLUMN_1'),
+        ("-O'DD", 'COLUMN_1'),
+    ]
+    adapter = FakeAdapter({('DB_1', 'RAW_SCHEMA_1'): columns}, max_rows=3)
+    with patch('dbt_schema_builder.builder.get_adapter', lambda config: adapter):
+        catalog = get_catalog_task().run('DB_1', 'RAW_SCHEMA_1', [])
+
+    # Every table is found, in order, whatever characters its name is made of
+    assert [(row['TABLE_NAME'], row['COLUMN_NAME']) for row in catalog] == sorted(columns)
+    # The table names were read once, and only the ranges that were too large got split again
+    assert sum('INFORMATION_SCHEMA.TABLES' in query for query in adapter.queries) == 1
+    range_queries = [
+        re.findall(r"TABLE_NAME (>=|<) '([^']*)'", query) for query in adapter.queries
+        if 'INFORMATION_SCHEMA.COLUMNS' in query
+    ][1:]
+    assert range_queries == [
+        [('<', 'AA')],
+        [('<', 'A')],
+        [('>=', 'A'), ('<', 'AA')],
+        [('>=', 'AA')],
+        [('>=', 'AA'), ('<', 'B')],
+        [('>=', 'AA'), ('<', 'AB')],
+        [('>=', 'AB'), ('<', 'B')],
+        [('>=', 'B')],
+    ]
+
+
+def test_get_fetch_plan(tmpdir):
+    task = get_catalog_task()
+    task.strategy_memo = CatalogStrategyMemo(str(tmpdir.join(CATALOG_STRATEGY_FILE_NAME)))
+    task.strategy_memo.record('DB_1', 'RAW_SCHEMA_2', PARTITIONED_STRATEGY, 10, partitions=[(None, None, 10)])
+    included = TableFilter(included_tables=['TABLE_A'])
+    excluded = TableFilter(excluded_tables=['TABLE_A'])
+
+    assert task.get_fetch_plan('DB_1', 'RAW_SCHEMA_1') == SINGLE_QUERY_PLAN
+    assert task.get_fetch_plan('DB_1', 'RAW_SCHEMA_1', excluded) == SINGLE_QUERY_PLAN
+    assert task.get_fetch_plan('DB_1', 'RAW_SCHEMA_1', included) == INCLUDED_TABLES_PLAN
+    assert task.get_fetch_plan('DB_1', 'RAW_SCHEMA_2') is None
+    assert task.get_fetch_plan('DB_1', 'RAW_SCHEMA_2', included) == INCLUDED_TABLES_PLAN
+    assert get_catalog_task(SHOW_COLUMNS_ENGINE).get_fetch_plan('DB_1', 'RAW_SCHEMA_1') is None
+
+
+def test_split_partition():
+    table_names = ['A', 'B', 'C', 'D', 'E']
+
+    assert GetCatalogTask.split_partition((None, None), table_names) == [(None, 'C'), ('C', None)]
+    assert GetCatalogTask.split_partition(('C', None), table_names) == [('C', 'D'), ('D', None)]
+    assert GetCatalogTask.split_partition(('AA', 'D'), table_names) == [('AA', 'C'), ('C', 'D')]
+    assert GetCatalogTask.split_partition(('B', 'C'), table_names) is None
+    assert GetCatalogTask.split_partition((None, 'A'), table_names) is None
+
+
+def test_fetch_catalog_by_range_single_table_too_large():
+    adapter = FakeAdapter({('DB_1', 'RAW_SCHEMA_1'): [('-ODD', 'COLUMN_1'), ('-ODD', 'COLUMN_2')]}, max_rows=1)
+    with patch('dbt_schema_builder.builder.get_adapter', lambda config: adapter):
+        with pytest.raises(InvalidDatabaseException):
+            get_catalog_task().run('DB_1', 'RAW_SCHEMA_1', [])
+
+
+def test_run_uses_strategy_memo(tmpdir):
+    columns = [('AA', 'COLUMN_1'), ('AA', 'COLUMN_2'), ('AB', 'COLUMN_1'), ('B', 'COLUMN_1')]
+    memo_path = str(tmpdir.join(CATALOG_STRATEGY_FILE_NAME))
+    task = get_catalog_task()
+
+    task.strategy_memo = CatalogStrategyMemo(memo_path)
+    adapter = FakeAdapter({('DB_1', 'RAW_SCHEMA_1'): columns}, max_rows=2)
+    with patch('dbt_schema_builder.builder.get_adapter', lambda config: adapter):
+        first_catalog = task.run('DB_1', 'RAW_SCHEMA_1', [])
+    task.strategy_memo.save()
+    # The full query failed before partitioning
+    assert 'TABLE_NAME >=' not in adapter.queries[0]
+
+    task.strategy_memo = CatalogStrategyMemo(memo_path)
+    adapter = FakeAdapter({('DB_1', 'RAW_SCHEMA_1'): columns}, max_rows=2)
+    with patch('dbt_schema_builder.builder.get_adapter', lambda config: adapter):
+        second_catalog = task.run('DB_1', 'RAW_SCHEMA_1', [])
+
+    # The second run goes straight to the partitions that worked, without failing on any query
+    assert all('TABLE_NAME >=' in query or 'TABLE_NAME <' in query for query in adapter.queries)
+    assert len(adapter.queries) == len(task.strategy_memo.get_partitions('DB_1', 'RAW_SCHEMA_1'))
+    assert second_catalog == first_catalog
+
+    task.strategy_memo = CatalogStrategyMemo(memo_path, reprobe=True)
+    adapter = FakeAdapter({('DB_1', 'RAW_SCHEMA_1'): columns}, max_rows=2)
+    with patch('dbt_schema_builder.builder.get_adapter', lambda config: adapter):
+        task.run('DB_1', 'RAW_SCHEMA_1', [])
+    assert 'TABLE_NAME >=' not in adapter.queries[0]
+
+
+@patch.object(SchemaBuilder, 'get_redactions', lambda x: {})
+@patch.object(SchemaBuilder, 'get_snowflake_keywords', lambda x: {})
+@patch.object(SchemaBuilder, 'get_banned_columns', lambda x: {})
+@patch.object(SchemaBuilder, 'get_unmanaged_tables', lambda x: {})
+@patch.object(SchemaBuilder, 'get_downstream_sources_allow_list', lambda x: {})
+def test_get_relations_from_catalog_cache(tmpdir):
+    app_config = {'DB_1.APP_1': {'DB_2.RAW_SCHEMA_1': {}}}
+    catalog_cache = CatalogCache(str(tmpdir.mkdir('cache')))
+    mock_get_catalog_task = MagicMock(GetCatalogTask)
+    mock_get_catalog_task.run.return_value = [
+        {"TABLE_NAME": "TABLE_A", "COLUMN_NAME": "COLUMN_A", "COLUMN_INDEX": 1},
+    ]
+
+    with patch.object(SchemaBuilder, 'get_app_schema_configs', lambda x: app_config):
+        builder = SchemaBuilder(str(tmpdir), str(tmpdir), str(tmpdir), mock_get_catalog_task, catalog_cache)
+        first_relations = builder.get_relations('DB_2', 'RAW_SCHEMA_1')
+        builder = SchemaBuilder(str(tmpdir), str(tmpdir), str(tmpdir), mock_get_catalog_task, catalog_cache)
+        second_relations = builder.get_relations('DB_2', 'RAW_SCHEMA_1')
+
+    assert mock_get_catalog_task.run.call_count == 1
+    assert first_relations == second_relations == {'RAW_SCHEMA_1': {'TABLE_A': ['COLUMN_A']}}
+    # The second builder read the catalog from the cache without fetching it
+    assert builder.catalog_stats == {'fetched': 0, 'cached': 1, 'reused': 0}
+
+
+def test_run_incremental():
+    adapter = FakeAdapter(
+        {('DB_1', 'RAW_SCHEMA_1'): [
+            ('TABLE_A', 'COLUMN_1'),
+            ('TABLE_B', 'COLUMN_1'), ('TABLE_B', 'NEW_COLUMN'),
+            ('TABLE_D', 'COLUMN_1'),
+        ]},
+        last_altered={('DB_1', 'RAW_SCHEMA_1'): {
+            'TABLE_A': '2020-01-01', 'TABLE_B': '2020-01-03', 'TABLE_D': '2020-01-03',
+        }},
+    )
+    snapshot = (
+        [
+            {'TABLE_NAME': 'TABLE_A', 'COLUMN_NAME': 'COLUMN_1', 'COLUMN_INDEX': 1},
+            {'TABLE_NAME': 'TABLE_B', 'COLUMN_NAME': 'COLUMN_1', 'COLUMN_INDEX': 1},
+            {'TABLE_NAME': 'TABLE_C', 'COLUMN_NAME': 'COLUMN_1', 'COLUMN_INDEX': 1},
+        ],
+        {'TABLE_A': '2020-01-01', 'TABLE_B': '2020-01-01', 'TABLE_C': '2020-01-01'},
+    )
+    with patch('dbt_schema_builder.builder.get_adapter', lambda config: adapter):
+        catalog, last_altered = get_catalog_task().run_incremental('DB_1', 'RAW_SCHEMA_1', [], snapshot=snapshot)
+
+    # Only the altered TABLE_B and new TABLE_D are fetched, and the dropped TABLE_C is gone
+    assert "TABLE_NAME IN ('TABLE_B','TABLE_D')" in adapter.queries[1]
+    assert [(row['TABLE_NAME'], row['COLUMN_NAME']) for row in catalog] == [
+        ('TABLE_A', 'COLUMN_1'), ('TABLE_B', 'COLUMN_1'), ('TABLE_B', 'NEW_COLUMN'), ('TABLE_D', 'COLUMN_1'),
+    ]
+    assert last_altered == {'TABLE_A': '2020-01-01', 'TABLE_B': '2020-01-03', 'TABLE_D': '2020-01-03'}
+
+
+def test_run_incremental_too_much_data(tmpdir):
+    columns = {('DB_1', 'RAW_SCHEMA_1'): [
+        ('TABLE_A', 'COLUMN_1'),
+        ('TABLE_B', 'COLUMN_1'), ('TABLE_B', 'NEW_COLUMN'),
+        ('TABLE_C', 'COLUMN_1'),
+        ('TABLE_D', 'COLUMN_1'),
+    ]}
+    last_altered = {('DB_1', 'RAW_SCHEMA_1'): {
+        'TABLE_A': '2020-01-01', 'TABLE_B': '2020-01-03', 'TABLE_C': '2020-01-01', 'TABLE_D': '2020-01-03',
+    }}
+    snapshot = (
+        [
+            {'TABLE_NAME': 'TABLE_A', 'COLUMN_NAME': 'COLUMN_1', 'COLUMN_INDEX': 1},
+            {'TABLE_NAME': 'TABLE_B', 'COLUMN_NAME': 'COLUMN_1', 'COLUMN_INDEX': 1},
+            {'TABLE_NAME': 'TABLE_C', 'COLUMN_NAME': 'COLUMN_1', 'COLUMN_INDEX': 1},
+        ],
+        {'TABLE_A': '2020-01-01', 'TABLE_B': '2020-01-01', 'TABLE_C': '2020-01-01'},
+    )
+    expected_catalog = [
+        ('TABLE_A', 'COLUMN_1'), ('TABLE_B', 'COLUMN_1'), ('TABLE_B', 'NEW_COLUMN'), ('TABLE_C', 'COLUMN_1'),
+        ('TABLE_D', 'COLUMN_1'),
+    ]
+
+    # The changed TABLE_B and TABLE_D are too large to fetch by name, so they are fetched by range
+    task = get_catalog_task()
+    adapter = FakeAdapter(columns, max_rows=2, last_altered=last_altered)
+    with patch('dbt_schema_builder.builder.get_adapter', lambda config: adapter):
+        catalog, _ = task.run_incremental('DB_1', 'RAW_SCHEMA_1', [], snapshot=snapshot)
+    assert "TABLE_NAME IN ('TABLE_B','TABLE_D')" in adapter.queries[1]
+    assert any('TABLE_NAME >=' in query for query in adapter.queries[2:])
+    assert [(row['TABLE_NAME'], row['COLUMN_NAME']) for row in catalog] == expected_catalog
+
+    # With memoised partitions, only the partitions holding a changed table are queried
+    task.strategy_memo = CatalogStrategyMemo(str(tmpdir.join(CATALOG_STRATEGY_FILE_NAME)))
+    task.strategy_memo.record(
+        'DB_1', 'RAW_SCHEMA_1', PARTITIONED_STRATEGY, 5,
+        partitions=[(None, 'TABLE_B', 1), ('TABLE_B', 'TABLE_C', 2), ('TABLE_C', 'TABLE_D', 1), ('TABLE_D', None, 1)],
+    )
+    adapter = FakeAdapter(columns, max_rows=2, last_altered=last_altered)
+    with patch('dbt_schema_builder.builder.get_adapter', lambda config: adapter):
+        catalog, _ = task.run_incremental('DB_1', 'RAW_SCHEMA_1', [], snapshot=snapshot)
+    assert len(adapter.queries) == 4
+    assert "TABLE_NAME >= 'TABLE_B'" in adapter.queries[2] and "TABLE_NAME < 'TABLE_C'" in adapter.queries[2]
+    assert "TABLE_NAME >= 'TABLE_D'" in adapter.queries[3]
+    assert [(row['TABLE_NAME'], row['COLUMN_NAME']) for row in catalog] == expected_catalog
+
+
+@patch.object(SchemaBuilder, 'get_redactions', lambda x: {})
+@patch.object(SchemaBuilder, 'get_snowflake_keywords', lambda x: {})
+@patch.object(SchemaBuilder, 'get_banned_columns', lambda x: {})
+@patch.object(SchemaBuilder, 'get_unmanaged_tables', lambda x: {})
+@patch.object(SchemaBuilder, 'get_downstream_sources_allow_list', lambda x: {})
+def test_get_relations_incremental(tmpdir):
+    app_config = {'DB_1.APP_1': {'DB_1.RAW_SCHEMA_1': {}}}
+    catalog_cache = CatalogCache(str(tmpdir.mkdir('cache')), ttl=-1)
+    columns = {('DB_1', 'RAW_SCHEMA_1'): [('TABLE_A', 'COLUMN_1'), ('TABLE_B', 'COLUMN_1')]}
+    last_altered = {('DB_1', 'RAW_SCHEMA_1'): {'TABLE_A': '2020-01-01', 'TABLE_B': '2020-01-01'}}
+
+    with patch.object(SchemaBuilder, 'get_app_schema_configs', lambda x: app_config):
+        adapter = FakeAdapter(columns, last_altered=last_altered)
+        with patch('dbt_schema_builder.builder.get_adapter', lambda config: adapter):
+            builder = SchemaBuilder(
+                str(tmpdir), str(tmpdir), str(tmpdir), get_catalog_task(), catalog_cache, incremental_catalog=True
+            )
+            first_relations = builder.get_relations('DB_1', 'RAW_SCHEMA_1')
+        # LAST_ALTERED, then the full catalog
+        assert len(adapter.queries) == 2
+
+        adapter = FakeAdapter(columns, last_altered=last_altered)
+        with patch('dbt_schema_builder.builder.get_adapter', lambda config: adapter):
+            builder = SchemaBuilder(
+                str(tmpdir), str(tmpdir), str(tmpdir), get_catalog_task(), catalog_cache, incremental_catalog=True
+            )
+            second_relations = builder.get_relations('DB_1', 'RAW_SCHEMA_1')
+        # Nothing changed, so only LAST_ALTERED is read
+        assert len(adapter.queries) == 1
+
+    assert first_relations == second_relations == {
+        'RAW_SCHEMA_1': {'TABLE_A': ['COLUMN_1'], 'TABLE_B': ['COLUMN_1']}
+    }
+
+
+def make_project(tmpdir):
+    """
+    Create a minimal source project, with a destination project inside it, and return its path.
+    """
+    source_project = tmpdir.mkdir('source_project')
+    source_project.join('dbt_project.yml').write(yaml.safe_dump({'name': 'source', 'model-paths': ['models']}))
+    source_project.join('schema_config.yml').write(yaml.safe_dump({'PROD.APP': {'DB_1.RAW_SCHEMA_1': {}}}))
+    source_project.join('banned_column_names.yml').write(yaml.safe_dump(['BANNED']))
+    source_project.join('redactions.yml').write('')
+    source_project.join('unmanaged_tables.yml').write('[]')
+    source_project.mkdir('destination_project').join('dbt_project.yml').write(yaml.safe_dump({'name': 'dest'}))
+    return source_project
+
+
+def test_build_from_catalog_snapshot(tmpdir):
+    source_project = make_project(tmpdir)
+    snapshot_path = str(tmpdir.join('snapshot.json'))
+    write_catalog_snapshot(snapshot_path, {
+        ('DB_1', 'RAW_SCHEMA_1'): [
+            {'TABLE_NAME': 'TABLE_A', 'COLUMN_NAME': 'COLUMN_1', 'COLUMN_INDEX': 1},
+            {'TABLE_NAME': 'TABLE_A', 'COLUMN_NAME': 'BANNED', 'COLUMN_INDEX': 2},
+        ],
+    })
+
+    cwd = os.getcwd()
+    try:
+        os.chdir(str(source_project))
+        args = parse_args([
+            'build', '--destination-project', 'destination_project', '--catalog-snapshot', snapshot_path,
+            '--profiles-dir', str(tmpdir),
+        ])
+        with patch('dbt_schema_builder.builder.RuntimeConfig.from_args') as from_args:
+            task = SchemaBuilderTask(args)
+            task.run()
+        # No dbt config is loaded, so no adapter is registered
+        assert not from_args.called
+    finally:
+        os.chdir(cwd)
+
+    with open(str(source_project.join('models', 'PROD', 'APP', 'APP.yml'))) as fp:
+        raw_source = yaml.safe_load(fp)
+    assert raw_source['sources'][0]['tables'] == [{'name': 'TABLE_A'}]
+    assert raw_source['models'][0]['columns'] == [{'name': 'COLUMN_1'}]
+    assert source_project.join('models', 'PROD', 'APP', 'APP', 'APP_TABLE_A.sql').exists()
+
+
+@patch.object(SchemaBuilder, 'get_redactions', lambda x: {})
+@patch.object(SchemaBuilder, 'get_snowflake_keywords', lambda x: {})
+@patch.object(SchemaBuilder, 'get_banned_columns', lambda x: {})
+@patch.object(SchemaBuilder, 'get_unmanaged_tables', lambda x: {})
+@patch.object(SchemaBuilder, 'get_downstream_sources_allow_list', lambda x: {})
+def test_write_catalog_snapshot(tmpdir):
+    app_config = {'DB_1.APP_1': {'DB_1.RAW_SCHEMA_1': {}}}
+    adapter = FakeAdapter({('DB_1', 'RAW_SCHEMA_1'): [('TABLE_A', 'COLUMN_1'), ('TABLE_A', 'COLUMN_2')]})
+    snapshot_path = str(tmpdir.join('snapshot.json'))
+
+    with patch.object(SchemaBuilder, 'get_app_schema_configs', lambda x: app_config):
+        with patch('dbt_schema_builder.builder.get_adapter', lambda config: adapter):
+            builder = SchemaBuilder(str(tmpdir), str(tmpdir), None, get_catalog_task())
+            builder.prefetch_catalogs()
+            builder.write_catalog_snapshot(snapshot_path)
+
+        offline_builder = SchemaBuilder(str(tmpdir), str(tmpdir), None, CatalogSnapshot(snapshot_path))
+        assert offline_builder.get_relations('DB_1', 'RAW_SCHEMA_1') == builder.get_relations('DB_1', 'RAW_SCHEMA_1')
+
+
+@patch.object(SchemaBuilder, 'get_redactions', lambda x: {})
+@patch.object(SchemaBuilder, 'get_snowflake_keywords', lambda x: {})
+@patch.object(SchemaBuilder, 'get_banned_columns', lambda x: {})
+@patch.object(SchemaBuilder, 'get_unmanaged_tables', lambda x: {})
+@patch.object(SchemaBuilder, 'get_downstream_sources_allow_list', lambda x: {})
+def test_catalog_snapshot_with_wider_table_filter(tmpdir):
+    adapter = FakeAdapter({('DB_1', 'RAW_SCHEMA_1'): [
+        ('TABLE_A', 'COLUMN_1'), ('TABLE_B', 'COLUMN_1'), ('TABLE_C', 'COLUMN_1'),
+    ]})
+    snapshot_path = str(tmpdir.join('snapshot.json'))
+
+    app_config = {'DB_1.APP_1': {'DB_1.RAW_SCHEMA_1': {'INCLUDE': ['TABLE_A', 'TABLE_B']}}}
+    with patch.object(SchemaBuilder, 'get_app_schema_configs', lambda x: app_config):
+        with patch('dbt_schema_builder.builder.get_adapter', lambda config: adapter):
+            builder = SchemaBuilder(str(tmpdir), str(tmpdir), None, get_catalog_task())
+            builder.prefetch_catalogs()
+            builder.write_catalog_snapshot(snapshot_path)
+
+    # Narrowing the filter still works offline
+    app_config = {'DB_1.APP_1': {'DB_1.RAW_SCHEMA_1': {'INCLUDE': ['TABLE_A']}}}
+    with patch.object(SchemaBuilder, 'get_app_schema_configs', lambda x: app_config):
+        offline_builder = SchemaBuilder(str(tmpdir), str(tmpdir), None, CatalogSnapshot(snapshot_path))
+        assert offline_builder.get_relations('DB_1', 'RAW_SCHEMA_1') == {'RAW_SCHEMA_1': {'TABLE_A': ['COLUMN_1']}}
+
+    # Widening it needs TABLE_C, which the snapshot left out
+    app_config = {'DB_1.APP_1': {'DB_1.RAW_SCHEMA_1': {'INCLUDE': ['TABLE_A', 'TABLE_C']}}}
+    with patch.object(SchemaBuilder, 'get_app_schema_configs', lambda x: app_config):
+        offline_builder = SchemaBuilder(str(tmpdir), str(tmpdir), None, CatalogSnapshot(snapshot_path))
+        with pytest.raises(InvalidConfigurationException, match='Take a new snapshot'):
+            offline_builder.get_relations('DB_1', 'RAW_SCHEMA_1')
+
+
+@patch.object(SchemaBuilder, 'get_redactions', lambda x: {'LMS.*': "'<redacted>'"})
+@patch.object(SchemaBuilder, 'get_snowflake_keywords', lambda x: {})
+@patch.object(SchemaBuilder, 'get_banned_columns', lambda x: {})
+@patch.object(SchemaBuilder, 'get_unmanaged_tables', lambda x: {})
+@patch.object(SchemaBuilder, 'get_downstream_sources_allow_list', lambda x: {})
+@patch.object(SchemaBuilder, 'get_app_schema_configs', lambda x: {})
+def test_skipped_redaction_keys_are_logged(caplog):
+    temp_dir = mkdtemp()
+    SchemaBuilder(temp_dir, temp_dir, temp_dir, MagicMock(GetCatalogTask))
+
+    assert any("Skipping redactions.yml key 'LMS.*'" in message for message in caplog.messages)
+
+
+def test_run_with_show_columns():
+    show_output = {('DB_1', 'RAW_SCHEMA_1'): [
+        ('TABLE_B', 'RAW_SCHEMA_1', 'COLUMN_1', '{"type":"TEXT"}', 'true', '', 'COLUMN', '', '', 'DB_1', ''),
+        ('TABLE_A', 'RAW_SCHEMA_1', 'COLUMN_2', '{"type":"TEXT"}', 'true', '', 'COLUMN', '', '', 'DB_1', ''),
+        ('TABLE_A', 'RAW_SCHEMA_1', 'BANNED', '{"type":"TEXT"}', 'true', '', 'COLUMN', '', '', 'DB_1', ''),
+        ('TABLE_A', 'RAW_SCHEMA_1', 'COLUMN_1', '{"type":"TEXT"}', 'true', '', 'COLUMN', '', '', 'DB_1', ''),
+    ]}
+    task = get_catalog_task()
+    task.catalog_engine = SHOW_COLUMNS_ENGINE
+
+    adapter = FakeAdapter({}, show_output=show_output)
+    with patch('dbt_schema_builder.builder.get_adapter', lambda config: adapter):
+        catalog = task.run('DB_1', 'RAW_SCHEMA_1', [])
+    assert len(adapter.queries) == 1
+    assert catalog == [
+        {'TABLE_NAME': 'TABLE_A', 'COLUMN_NAME': 'COLUMN_2', 'COLUMN_INDEX': 1},
+        {'TABLE_NAME': 'TABLE_A', 'COLUMN_NAME': 'BANNED', 'COLUMN_INDEX': 2},
+        {'TABLE_NAME': 'TABLE_A', 'COLUMN_NAME': 'COLUMN_1', 'COLUMN_INDEX': 3},
+        {'TABLE_NAME': 'TABLE_B', 'COLUMN_NAME': 'COLUMN_1', 'COLUMN_INDEX': 1},
+    ]
+
+    adapter = FakeAdapter({}, show_output=show_output)
+    with patch('dbt_schema_builder.builder.get_adapter', lambda config: adapter):
+        catalog = task.run('DB_1', 'RAW_SCHEMA_1', ['BANNED'])
+    # Banned columns are filtered out by a RESULT_SCAN of the SHOW output
+    assert 'RESULT_SCAN' in adapter.queries[1]
+    assert [(row['TABLE_NAME'], row['COLUMN_NAME']) for row in catalog] == [
+        ('TABLE_A', 'COLUMN_2'), ('TABLE_A', 'COLUMN_1'), ('TABLE_B', 'COLUMN_1'),
+    ]
+
+
+def test_run_with_show_columns_row_limit():
+    columns = {('DB_1', 'RAW_SCHEMA_1'): [('TABLE_A', 'COLUMN_1'), ('TABLE_A', 'COLUMN_2')]}
+    task = get_catalog_task()
+    task.catalog_engine = SHOW_COLUMNS_ENGINE
+
+    adapter = FakeAdapter(columns)
+    with patch('dbt_schema_builder.builder.SHOW_COLUMNS_ROW_LIMIT', 2):
+        with patch('dbt_schema_builder.builder.get_adapter', lambda config: adapter):
+            catalog = task.run('DB_1', 'RAW_SCHEMA_1', [])
+
+    # The SHOW output may have been cut short, so INFORMATION_SCHEMA is read instead
+    assert 'INFORMATION_SCHEMA.COLUMNS' in adapter.queries[1]
+    assert [row['COLUMN_NAME'] for row in catalog] == ['COLUMN_1', 'COLUMN_2']
+
+
+def test_run_with_table_filter():
+    adapter = FakeAdapter({
+        ('DB_1', 'RAW_SCHEMA_1'): [('TABLE_A', 'COLUMN_A'), ('TABLE_B', 'COLUMN_B'), ('TABLE_C', 'COLUMN_C')],
+    })
+    with patch('dbt_schema_builder.builder.get_adapter', lambda config: adapter):
+        included = get_catalog_task().run(
+            'DB_1', 'RAW_SCHEMA_1', [], table_filter=TableFilter(included_tables=['TABLE_A', 'TABLE_C'])
+        )
+        excluded = get_catalog_task().run(
+            'DB_1', 'RAW_SCHEMA_1', [], table_filter=TableFilter(excluded_tables=['TABLE_A'])
+        )
+
+    assert [row['TABLE_NAME'] for row in included] == ['TABLE_A', 'TABLE_C']
+    assert [row['TABLE_NAME'] for row in excluded] == ['TABLE_B', 'TABLE_C']
+    assert "TABLE_NAME IN ('TABLE_A','TABLE_C')" in adapter.queries[0]
+    assert "TABLE_NAME NOT IN ('TABLE_A')" in adapter.queries[1]
+
+
+def test_excluded_tables_filter_is_chunked():
+    table_names = ['TABLE_{}'.format(i) for i in range(TABLE_NAME_CHUNK_SIZE + 1)]
+    table_name_filter = GetCatalogTask._get_table_name_not_in_filter(  # pylint: disable=protected-access
+        'DB_1', table_names
+    )
+
+    assert table_name_filter.count('NOT IN') == 2
+    assert GetCatalogTask._get_table_name_not_in_filter('DB_1', []) == ''  # pylint: disable=protected-access
+
+
+@patch.object(SchemaBuilder, 'get_redactions', lambda x: {})
+@patch.object(SchemaBuilder, 'get_snowflake_keywords', lambda x: {})
+@patch.object(SchemaBuilder, 'get_banned_columns', lambda x: {})
+@patch.object(SchemaBuilder, 'get_unmanaged_tables', lambda x: {})
+@patch.object(SchemaBuilder, 'get_downstream_sources_allow_list', lambda x: {})
+def test_prefetch_catalogs_with_table_filters():
+    app_config = {
+        'DB_1.APP_1': {
+            'DB_2.RAW_SCHEMA_1': {'INCLUDE': ['TABLE_A']},
+            'DB_2.RAW_SCHEMA_2': {},
+        },
+        'DB_1.APP_2': {
+            'DB_2.RAW_SCHEMA_1': {'INCLUDE': ['TABLE_B']},
+        },
+    }
+    adapter = FakeAdapter({
+        ('DB_2', 'RAW_SCHEMA_1'): [('TABLE_A', 'COLUMN_A'), ('TABLE_B', 'COLUMN_B'), ('TABLE_C', 'COLUMN_C')],
+        ('DB_2', 'RAW_SCHEMA_2'): [('TABLE_D', 'COLUMN_D')],
+    })
+
+    temp_dir = mkdtemp()
+    with patch.object(SchemaBuilder, 'get_app_schema_configs', lambda x: app_config):
+        with patch('dbt_schema_builder.builder.get_adapter', lambda config: adapter):
+            builder = SchemaBuilder(temp_dir, temp_dir, temp_dir, get_catalog_task())
+            catalogs = builder.prefetch_catalogs(batch=True)
+
+    # The filtered schema is fetched on its own with the INCLUDE lists of both apps
+    assert len(adapter.queries) == 2
+    assert catalogs[('DB_2', 'RAW_SCHEMA_1')] == {
+        'RAW_SCHEMA_1': {'TABLE_A': ['COLUMN_A'], 'TABLE_B': ['COLUMN_B']}
+    }
+    assert catalogs[('DB_2', 'RAW_SCHEMA_2')] == {'RAW_SCHEMA_2': {'TABLE_D': ['COLUMN_D']}}
+
+
+def test_run_with_native_cursor():
+    columns = {
+        ('DB_1', 'RAW_SCHEMA_1'): [('TABLE_A', 'COLUMN_A'), ('TABLE_A', 'COLUMN_B'), ('TABLE_B', 'COLUMN_C')],
+    }
+    agate_adapter = FakeAdapter(columns)
+    cursor_adapter = FakeAdapter(columns, native_cursor=True)
+    with patch('dbt_schema_builder.catalog.CURSOR_FETCH_SIZE', 2):
+        with patch('dbt_schema_builder.builder.get_adapter', lambda config: agate_adapter):
+            agate_catalog = get_catalog_task().run('DB_1', 'RAW_SCHEMA_1', [])
+        with patch('dbt_schema_builder.builder.get_adapter', lambda config: cursor_adapter):
+            cursor_catalog = get_catalog_task().run('DB_1', 'RAW_SCHEMA_1', [])
+
+    assert cursor_catalog == agate_catalog
+    # Three rows read two at a time, then an empty batch
+    assert cursor_adapter.connections.cursors[0].fetchmany_sizes == [2, 2, 2]
+
+
+def test_stream():
+    adapter = FakeAdapter(
+        {('DB_1', 'RAW_SCHEMA_1'): [('TABLE_A', 'COLUMN_A'), ('TABLE_A', 'COLUMN_B'), ('TABLE_B', 'COLUMN_C')]},
+        native_cursor=True,
+    )
+    with patch('dbt_schema_builder.catalog.CURSOR_FETCH_SIZE', 1):
+        with patch('dbt_schema_builder.builder.get_adapter', lambda config: adapter):
+            tables = get_catalog_task().stream('DB_1', 'RAW_SCHEMA_1', [])
+            assert next(tables) == ('TABLE_A', ['COLUMN_A', 'COLUMN_B'])
+            # TABLE_A is handed over once the first TABLE_B row is read, before the rest of the result
+            assert adapter.connections.cursors[0].fetchmany_sizes == [1, 1, 1]
+            assert list(tables) == [('TABLE_B', ['COLUMN_C'])]
+
+
+def test_stream_too_much_data():
+    adapter = FakeAdapter(
+        {('DB_1', 'RAW_SCHEMA_1'): [('AA', 'COLUMN_A'), ('BB', 'COLUMN_B'), ('BB', 'COLUMN_C')]},
+        max_rows=2,
+        native_cursor=True,
+    )
+    with patch('dbt_schema_builder.builder.get_adapter', lambda config: adapter):
+        tables = list(get_catalog_task().stream('DB_1', 'RAW_SCHEMA_1', []))
+
+    assert tables == [('AA', ['COLUMN_A']), ('BB', ['COLUMN_B', 'COLUMN_C'])]
+
+
+@patch.object(SchemaBuilder, 'get_redactions', lambda x: {})
+@patch.object(SchemaBuilder, 'get_snowflake_keywords', lambda x: {})
+@patch.object(SchemaBuilder, 'get_banned_columns', lambda x: {})
+@patch.object(SchemaBuilder, 'get_unmanaged_tables', lambda x: {})
+@patch.object(SchemaBuilder, 'get_downstream_sources_allow_list', lambda x: {})
+def test_build_apps_sharing_a_raw_schema():
+    app_config = {
+        'DB_1.APP_1': {
+            'DB_2.RAW_SCHEMA_1': {'INCLUDE': ['TABLE_A']},
+        },
+        'DB_1.APP_2': {
+            'DB_2.RAW_SCHEMA_1': {'PREFIX': 'SHARED'},
+        },
+    }
+
+    temp_dir = mkdtemp()
+    mock_get_catalog_task = MagicMock(GetCatalogTask)
+    mock_get_catalog_task.stream.return_value = [
+        ("TABLE_A", ["COLUMN_A"]),
+        ("TABLE_B", ["COLUMN_B"]),
+    ]
+    with patch.object(SchemaBuilder, 'build_app_path', lambda x, y, z: temp_dir):
+        with patch.object(SchemaBuilder, 'get_app_schema_configs', lambda x: app_config):
+            builder = SchemaBuilder(temp_dir, temp_dir, temp_dir, mock_get_catalog_task)
+            for app_name, config in app_config.items():
+                builder.build_app(app_name, config)
+
+    # The raw schema is queried for the first app and reused for the second
+    assert mock_get_catalog_task.stream.call_count == 1
+    assert builder.catalog_stats == {'fetched': 1, 'cached': 0, 'reused': 1}
+
+
+@patch.object(SchemaBuilder, 'get_redactions', lambda x: {})
+@patch.object(SchemaBuilder, 'get_snowflake_keywords', lambda x: {})
+@patch.object(SchemaBuilder, 'get_banned_columns', lambda x: {})
+@patch.object(SchemaBuilder, 'get_unmanaged_tables', lambda x: {})
+@patch.object(SchemaBuilder, 'get_downstream_sources_allow_list', lambda x: {})
+def test_build_app_logs_duplicate_downstream_tables(caplog):
+    app_config = {
+        'DB_2.RAW_SCHEMA_1': {},
+        'DB_2.RAW_SCHEMA_2': {'PREFIX': 'RAW'},
+    }
+
+    temp_dir = mkdtemp()
+    mock_get_catalog_task = MagicMock(GetCatalogTask)
+    mock_get_catalog_task.stream.side_effect = lambda database, schema, *args, **kwargs: {
+        'RAW_SCHEMA_1': [("RAW_TABLE", ["COLUMN_A"])],
+        'RAW_SCHEMA_2': [("TABLE", ["COLUMN_B"])],
+    }[schema]
+    with patch.object(SchemaBuilder, 'build_app_path', lambda x, y, z: temp_dir):
+        with patch.object(SchemaBuilder, 'get_app_schema_configs', lambda x: {'DB_1.APP_1': app_config}):
+            builder = SchemaBuilder(temp_dir, temp_dir, temp_dir, mock_get_catalog_task)
+            builder.build_app('DB_1.APP_1', app_config)
+
+    # Each duplicate is logged once, for the safe and the PII downstream source
+    duplicate_messages = [message for message in caplog.messages if 'Duplicate table name' in message]
+    assert len(duplicate_messages) == 2
+    for source_name, message in zip(['APP_1', 'APP_1_PII'], duplicate_messages):
+        assert message.endswith(
+            'Duplicate table name {}.RAW_TABLE from RAW_SCHEMA_2.TABLE (prefix RAW), already added from '
+            'RAW_SCHEMA_1.RAW_TABLE'.format(source_name)
+        )
+
+
+@patch.object(SchemaBuilder, 'get_redactions', lambda x: {})
+@patch.object(SchemaBuilder, 'get_snowflake_keywords', lambda x: {})
+@patch.object(SchemaBuilder, 'get_banned_columns', lambda x: {})
+@patch.object(SchemaBuilder, 'get_unmanaged_tables', lambda x: {})
+@patch.object(SchemaBuilder, 'get_downstream_sources_allow_list', lambda x: {})
+def test_prefetched_catalogs_are_only_reused_when_shared():
+    app_config = {
+        'DB_1.APP_1': {'DB_2.RAW_SCHEMA_1': {}},
+        'DB_1.APP_2': {'DB_2.RAW_SCHEMA_2': {}},
+        'DB_1.APP_3': {'DB_2.RAW_SCHEMA_2': {'PREFIX': 'SHARED'}},
+    }
+    adapter = FakeAdapter({
+        ('DB_2', 'RAW_SCHEMA_1'): [('TABLE_A', 'COLUMN_A')],
+        ('DB_2', 'RAW_SCHEMA_2'): [('TABLE_B', 'COLUMN_B')],
+    })
+
+    temp_dir = mkdtemp()
+    with patch.object(SchemaBuilder, 'build_app_path', lambda x, y, z: temp_dir):
+        with patch.object(SchemaBuilder, 'get_app_schema_configs', lambda x: app_config):
+            with patch('dbt_schema_builder.builder.get_adapter', lambda config: adapter):
+                builder = SchemaBuilder(temp_dir, temp_dir, temp_dir, get_catalog_task())
+                builder.prefetch_catalogs(threads=2)
+                for app_name in ('DB_1.APP_1', 'DB_1.APP_2'):
+                    builder.build_app(app_name, app_config[app_name])
+                # No raw schema has been used by more than one app yet
+                assert builder.catalog_stats == {'fetched': 2, 'cached': 0, 'reused': 0}
+                builder.build_app('DB_1.APP_3', app_config['DB_1.APP_3'])
+
+    assert builder.catalog_stats == {'fetched': 2, 'cached': 0, 'reused': 1}
+
+
+def read_tree(root):
+    """
+    Return the contents of every file under root, keyed by path relative to root.
+    """
+    contents = {}
+    for dirpath, _, filenames in os.walk(root):
+        for filename in filenames:
+            with open(os.path.join(dirpath, filename)) as f:
+                contents[os.path.relpath(os.path.join(dirpath, filename), root)] = f.read()
+    return contents
+
+
+@patch.object(SchemaBuilder, 'get_redactions', lambda x: {})
+@patch.object(SchemaBuilder, 'get_snowflake_keywords', lambda x: {})
+@patch.object(SchemaBuilder, 'get_banned_columns', lambda x: {})
+@patch.object(SchemaBuilder, 'get_unmanaged_tables', lambda x: {})
+@patch.object(SchemaBuilder, 'get_downstream_sources_allow_list', lambda x: {})
+def test_iter_apps_pipelined_matches_prefetch():
+    app_config = {
+        'DB_1.APP_1': {'DB_2.RAW_SCHEMA_1': {}, 'DB_2.RAW_SCHEMA_2': {}},
+        'DB_1.APP_2': {'DB_2.RAW_SCHEMA_2': {'PREFIX': 'SHARED'}},
+        'DB_1.APP_3': {'DB_2.RAW_SCHEMA_3': {'EXCLUDE': ['TABLE_C']}},
+    }
+    adapter = FakeAdapter({
+        ('DB_2', 'RAW_SCHEMA_1'): [('TABLE_A', 'COLUMN_A')],
+        ('DB_2', 'RAW_SCHEMA_2'): [('TABLE_B', 'COLUMN_B'), ('TABLE_B', 'COLUMN_C')],
+        ('DB_2', 'RAW_SCHEMA_3'): [('TABLE_C', 'COLUMN_C'), ('TABLE_D', 'COLUMN_D')],
+    })
+
+    outputs = []
+    for pipelined in (False, True):
+        temp_dir = mkdtemp()
+        with patch.object(SchemaBuilder, 'build_app_path', lambda x, y, z, d=temp_dir: d):
+            with patch.object(SchemaBuilder, 'get_app_schema_configs', lambda x: app_config):
+                with patch('dbt_schema_builder.builder.get_adapter', lambda config: adapter):
+                    builder = SchemaBuilder(temp_dir, temp_dir, temp_dir, get_catalog_task())
+                    if pipelined:
+                        apps = builder.iter_apps_pipelined(threads=2, depth=1)
+                    else:
+                        builder.prefetch_catalogs(threads=2)
+                        apps = builder.app_schema_configs.items()
+                    for app_name, config in apps:
+                        builder.build_app(app_name, config)
+        outputs.append(read_tree(temp_dir))
+
+        if pipelined:
+            # Each raw schema was fetched once, and dropped once the last app using it was built
+            assert builder.catalog_stats == {'fetched': 3, 'cached': 0, 'reused': 1}
+            assert not builder.catalogs
+
+    assert outputs[0] == outputs[1]
+    assert 'APP_3.yml' in outputs[1]
@@ -0,0 +1,63 @@
+"""
+Tests for the CatalogCache class
+"""
+
+from unittest.mock import patch
+
+from dbt_schema_builder.cache import CatalogCache
+
+ROWS = [
+    {"TABLE_NAME": "TABLE_A", "COLUMN_NAME": "COLUMN_A", "COLUMN_INDEX": 1},
+    {"TABLE_NAME": "TABLE_A", "COLUMN_NAME": "COLUMN_B", "COLUMN_INDEX": 2},
+]
+
+
+def test_put_and_get(tmpdir):
+    cache = CatalogCache(str(tmpdir))
+    assert cache.get('DB_1', 'RAW_SCHEMA_1', ['BANNED']) is None
+
+    cache.put('DB_1', 'RAW_SCHEMA_1', ['BANNED'], ROWS)
+    assert cache.get('DB_1', 'RAW_SCHEMA_1', ['BANNED']) == ROWS
+
+
+def test_banned_columns_are_part_of_key(tmpdir):
+    cache = CatalogCache(str(tmpdir))
+    cache.put('DB_1', 'RAW_SCHEMA_1', ['BANNED_1', 'BANNED_2'], ROWS)
+
+    assert cache.get('DB_1', 'RAW_SCHEMA_1', ['BANNED_2', 'BANNED_1']) == ROWS
+    assert cache.get('DB_1', 'RAW_SCHEMA_1', ['BANNED_1']) is None
+    assert cache.get('DB_1', 'RAW_SCHEMA_1', []) is None
+
+
+def test_catalog_engine_is_part_of_key(tmpdir):
+    CatalogCache(str(tmpdir), catalog_engine='information_schema').put('DB_1', 'RAW_SCHEMA_1', [], ROWS)
+
+    assert CatalogCache(str(tmpdir), catalog_engine='information_schema').get('DB_1', 'RAW_SCHEMA_1', []) == ROWS
+    assert CatalogCache(str(tmpdir), catalog_engine='show').get('DB_1', 'RAW_SCHEMA_1', []) is None
+
+
+def test_expired(tmpdir):
+    cache = CatalogCache(str(tmpdir), ttl=60)
+    with patch('dbt_schema_builder.cache.time.time', lambda: 1000):
+        cache.put('DB_1', 'RAW_SCHEMA_1', [], ROWS)
+    with patch('dbt_schema_builder.cache.time.time', lambda: 1059):
+        assert cache.get('DB_1', 'RAW_SCHEMA_1', []) == ROWS
+    with patch('dbt_schema_builder.cache.time.time', lambda: 1061):
+        assert cache.get('DB_1', 'RAW_SCHEMA_1', []) is None
+
+
+def test_refresh(tmpdir):
+    CatalogCache(str(tmpdir)).put('DB_1', 'RAW_SCHEMA_1', [], ROWS)
+    assert CatalogCache(str(tmpdir), refresh=True).get('DB_1', 'RAW_SCHEMA_1', []) is None
+
+
+def test_get_snapshot(tmpdir):
+    cache = CatalogCache(str(tmpdir), ttl=-1)
+    cache.put('DB_1', 'RAW_SCHEMA_1', [], ROWS)
+    # Entries without LAST_ALTERED times cannot be refreshed incrementally
+    assert cache.get_snapshot('DB_1', 'RAW_SCHEMA_1', []) is None
+
+    cache.put('DB_1', 'RAW_SCHEMA_1', [], ROWS, last_altered={'TABLE_A': '2020-01-01'})
+    assert cache.get('DB_1', 'RAW_SCHEMA_1', []) is None
+    assert cache.get_snapshot('DB_1', 'RAW_SCHEMA_1', []) == (ROWS, {'TABLE_A': '2020-01-01'})
+    assert CatalogCache(str(tmpdir), refresh=True).get_snapshot('DB_1', 'RAW_SCHEMA_1', []) is None
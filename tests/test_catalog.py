@@ -0,0 +1,64 @@
+"""
+Tests for the ColumnCatalog, ColumnView and StringPool classes and the catalog row helpers
+"""
+
+import pytest
+
+from dbt_schema_builder.catalog import MAX_SHORT_OFFSET, ColumnCatalog, StringPool, iter_table_columns
+
+
+def test_column_names_are_interned():
+    pool = StringPool()
+    catalog_1 = ColumnCatalog([('TABLE_A', ['ID', 'NAME']), ('TABLE_B', ['ID', 'CREATED'])], pool=pool)
+    catalog_2 = ColumnCatalog([('TABLE_C', ['ID', 'CREATED', 'MODIFIED'])], pool=pool)
+
+    assert len(pool) == 4
+    assert list(catalog_1) == ['TABLE_A', 'TABLE_B']
+    assert catalog_2['TABLE_C'][0] is catalog_1['TABLE_A'][0]
+
+
+def test_column_view_behaves_like_a_list():
+    catalog = ColumnCatalog([('TABLE_A', ['ID', 'NAME', 'CREATED'])])
+    columns = catalog['TABLE_A']
+
+    assert columns == ['ID', 'NAME', 'CREATED']
+    assert columns != ['ID', 'NAME']
+    assert list(columns) == ['ID', 'NAME', 'CREATED']
+    assert len(columns) == 3
+    assert columns[-1] == 'CREATED'
+    assert columns[1:] == ['NAME', 'CREATED']
+    assert 'NAME' in columns
+    assert catalog == {'TABLE_A': ['ID', 'NAME', 'CREATED']}
+
+
+def test_column_view_is_read_only():
+    columns = ColumnCatalog([('TABLE_A', ['ID'])])['TABLE_A']
+
+    with pytest.raises(TypeError):
+        columns[0] = 'OTHER'  # pylint: disable=unsupported-assignment-operation
+    with pytest.raises(AttributeError):
+        columns.append('OTHER')  # pylint: disable=no-member
+
+
+def test_iter_table_columns():
+    rows = [('TABLE_A', 'ID', 1), ('TABLE_A', 'NAME', 2), ('TABLE_B', 'ID', 1)]
+    expected = [('TABLE_A', ['ID', 'NAME']), ('TABLE_B', ['ID'])]
+
+    assert list(iter_table_columns(rows, 0, 1)) == expected
+    assert list(iter_table_columns(
+        {'TABLE_NAME': table_name, 'COLUMN_NAME': column_name, 'COLUMN_INDEX': column_index}
+        for table_name, column_name, column_index in rows
+    )) == expected
+
+
+def test_column_view_offsets_grow_with_the_pool():
+    pool = StringPool()
+    short_columns = pool.view(['ID', 'NAME'])
+    for i in range(MAX_SHORT_OFFSET):
+        pool.intern('COLUMN_{}'.format(i))
+    long_columns = pool.view(['ID', 'OTHER'])
+
+    assert short_columns.offsets.typecode == 'H'
+    assert long_columns.offsets.typecode == 'I'
+    assert short_columns == ['ID', 'NAME']
+    assert long_columns == ['ID', 'OTHER']
@@ -0,0 +1,79 @@
+"""
+Tests for the CatalogConnectionPool class
+"""
+
+import threading
+from types import SimpleNamespace
+
+from dbt_schema_builder.connections import CatalogConnectionPool
+
+
+class FakeConnectionAdapter:
+    """
+    Stand-in for a dbt adapter keeping one lazily opened connection per thread.
+    """
+
+    def __init__(self):
+        self.connections = SimpleNamespace(query_header=None)
+        self.thread_connections = {}
+        self.opened = []
+
+    def acquire_connection(self, name):
+        """
+        Name the current thread's connection, creating it unopened if there is none.
+        """
+        connection = self.thread_connections.setdefault(threading.get_ident(), FakeConnection(self))
+        connection.name = name
+        return connection
+
+    def cleanup_connections(self):
+        """
+        Close every connection.
+        """
+        for connection in self.thread_connections.values():
+            connection.state = "closed"
+
+
+class FakeConnection:
+    """
+    Stand-in for a dbt Connection that opens when its handle is first read.
+    """
+
+    def __init__(self, adapter):
+        self.adapter = adapter
+        self.name = None
+        self.state = "init"
+
+    @property
+    def handle(self):
+        """
+        Open the connection the first time it is used.
+        """
+        if self.state != "open":
+            self.state = "open"
+            self.adapter.opened.append(self.name)
+        return self
+
+
+def test_connections_stay_open():
+    adapter = FakeConnectionAdapter()
+    pool = CatalogConnectionPool(adapter)
+
+    for _ in range(3):
+        with pool.connection_named('generate_catalog'):
+            pass
+
+    def worker():
+        with pool.connection_named('generate_catalog_0'):
+            pass
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    thread.join()
+
+    # One connection for the main thread, reused, and one for the worker thread
+    assert adapter.opened == ['generate_catalog', 'generate_catalog_0']
+    assert pool.opened == 2
+
+    pool.close()
+    assert {connection.state for connection in adapter.thread_connections.values()} == {'closed'}
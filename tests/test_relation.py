@@ -2,9 +2,19 @@
 Tests for the Relation class
 """
 
+import os
+from unittest.mock import patch
+
 import pytest
 
-from dbt_schema_builder.relation import Relation
+from dbt_schema_builder.relation import (
+    CurrentSources,
+    DownstreamSourcesAllowList,
+    ManualModels,
+    RedactionPlan,
+    Relation,
+    UnmanagedTableMatcher,
+)
 
 
 def test_prep_meta_data():
@@ -47,6 +57,36 @@ def test_excluded_from_downstream_sources():
     assert relation.excluded_from_downstream_sources
 
 
+def test_downstream_sources_allow_list():
+    allow_list = DownstreamSourcesAllowList([
+        'LMS.THIS_TABLE',
+        'LMS.AUTH_*',
+        {'regex': r'ECOM\.ORDERS_\d+'},
+        {'regex': r'ECOM\.(\w)\1_DOUBLED'},
+    ])
+
+    assert allow_list.allows('LMS.THIS_TABLE')
+    assert allow_list.allows('LMS.AUTH_USER')
+    assert allow_list.allows('ECOM.ORDERS_2020')
+    assert allow_list.allows('ECOM.AA_DOUBLED')
+    assert not allow_list.allows('ECOM.AB_DOUBLED')
+    assert not allow_list.allows('ECOM.ORDERS_2020_BACKUP')
+    assert not allow_list.allows('LMS.THAT_TABLE')
+    assert allow_list.verdicts['LMS.THAT_TABLE'] is False
+    assert len(allow_list) == 4
+
+    with pytest.raises(ValueError, match='downstream_sources_allow_list.yml entries'):
+        DownstreamSourcesAllowList([['LMS.THIS_TABLE']])
+
+
+def test_downstream_sources_allow_list_mixed_case():
+    allow_list = DownstreamSourcesAllowList(['lms.This_Table'])
+
+    assert allow_list.allows('LMS.THIS_TABLE')
+    assert allow_list.allows('Lms.this_table')
+    assert not allow_list.allows('LMS.THAT_TABLE')
+
+
 def test_manual_model_not_exist():
     relation = Relation(
         'TABLE',
@@ -289,6 +329,50 @@ def test_sql_soft_delete_no_pii_no_redactions():
     assert 'WHERE SOFT_DELETE_COLUMN IS NULL' in sql
 
 
+def test_current_sources_prefix():
+    current_raw_sources = {
+        "sources": [
+            {"name": "RAW_1", "tables": [{"name": "TABLE", "source": 1}, {"name": "TABLE", "source": 2}]},
+            {"name": "RAW_2", "tables": [None, {"name": "TABLE", "source": 3}, {"name": "TABLE", "source": 4}]},
+        ]
+    }
+    current_downstream_sources = {
+        "sources": [
+            {
+                "name": "LMS",
+                "tables": [
+                    {"name": "TABLE", "description": "from a run without the prefix"},
+                    {"name": "PRE_OTHER", "description": "from a run with the prefix"},
+                ],
+            },
+            {"name": "LMS_PII", "tables": [{"name": "PRE_TABLE"}, {"name": "TABLE"}]},
+        ]
+    }
+    current_sources = CurrentSources(current_raw_sources, current_downstream_sources)
+
+    def find(source_relation_name, prefix=None):
+        relation = Relation(source_relation_name, [], 'LMS', 'app_path', [], [], [], [])
+        return relation.find_in_current_sources(
+            current_raw_sources, current_downstream_sources, prefix=prefix, current_sources=current_sources
+        )
+
+    raw, safe, pii = find('TABLE', prefix='PRE')
+    assert raw == {"name": "TABLE", "source": 3}
+    assert safe == {"name": "PRE_TABLE", "description": "from a run without the prefix"}
+    # Both PII entries now have the prefixed name, and the last one wins
+    assert pii is current_downstream_sources["sources"][1]["tables"][1]
+    assert [table["name"] for table in current_downstream_sources["sources"][1]["tables"]] == ["PRE_TABLE"] * 2
+
+    # The renamed entries are found under their new names
+    assert find('PRE_TABLE')[1:] == (safe, pii)
+    assert find('TABLE') == (raw, None, None)
+
+    raw, safe, pii = find('OTHER', prefix='PRE')
+    assert raw is None
+    assert safe == {"name": "PRE_OTHER", "description": "from a run with the prefix"}
+    assert pii is None
+
+
 def test_add_prefix_to_model_alias_with_snowflake_keyword_collision():
     relation = Relation(
         'START',
@@ -350,3 +434,155 @@ def test_snowflake_keyword_quoting():
     test_dict = relation.prep_meta_data()
     assert test_dict['columns'][0]["name"].startswith('"')
     assert test_dict['columns'][1]["name"].startswith('"')
+
+
+def test_unmanaged_table_matcher():
+    matcher = UnmanagedTableMatcher([
+        'LMS.EXACT_TABLE',
+        'LMS.BACKUP_.*',
+        r'ECOM.(\w)\1_DOUBLED',
+        '(?i)ORA.lower',
+    ])
+
+    assert matcher.matches('LMS.EXACT_TABLE')
+    assert not matcher.matches('LMS.EXACT_TABLE_2')
+    assert matcher.matches('LMS.BACKUP_2020')
+    assert matcher.matches('ECOM.AA_DOUBLED')
+    assert not matcher.matches('ECOM.AB_DOUBLED')
+    assert matcher.matches('ORA.LOWER')
+    assert not matcher.matches('LMS.OTHER')
+    assert matcher.verdicts['LMS.OTHER'] is False
+
+
+def test_relation_is_unmanaged():
+    relation = Relation(
+        'BACKUP_TABLE',
+        ['COLUMN_1', 'COLUMN_2'],
+        'LMS',
+        'non/existent/path',
+        [],
+        UnmanagedTableMatcher(['LMS.BACKUP_.*']),
+        [],
+        []
+    )
+    assert relation.is_unmanaged
+
+    relation = Relation('TABLE', ['COLUMN_1'], 'LMS', 'non/existent/path', [], ['LMS.BACKUP_.*'], [], [])
+    assert not relation.is_unmanaged
+
+
+def test_manual_models_scanned_once(tmpdir):
+    tmpdir.mkdir('LMS_MANUAL').join('LMS_TABLE.sql').write('data')
+    manual_models = ManualModels(str(tmpdir), 'LMS')
+    relations = [
+        Relation(name, [], 'LMS', str(tmpdir), [], [], [], [], manual_models=manual_models)
+        for name in ('TABLE', 'OTHER_TABLE')
+    ]
+
+    with patch('os.scandir', wraps=os.scandir) as scandir:
+        assert relations[0].manual_safe_model_exists
+        assert not relations[1].manual_safe_model_exists
+    assert scandir.call_count == 1
+
+
+def test_manual_models_not_flat(tmpdir):
+    tmpdir.mkdir('LMS_MANUAL').mkdir('NESTED')
+    relation = Relation('TABLE', [], 'LMS', str(tmpdir), [], [], [], [])
+
+    with pytest.raises(RuntimeError, match='MANUAL directory is not "flat"'):
+        relation.manual_safe_model_exists  # pylint: disable=pointless-statement
+
+
+def test_redaction_plan():
+    plan = RedactionPlan({
+        'LMS.AUTH_USER': {'EMAIL': "'exact@edx.invalid'", '*NAME': "'<redacted>'"},
+        'LMS.*.EMAIL': "'pattern@edx.invalid'",
+        'ECOM.ORDERS.TOTAL': 0,
+        'ECOM.BASKET?': {'PHONE': "'<phone>'"},
+        'regex': {r'ECOM\.(?!ORDERS\.)[^.]*\.ADDRESS_\d+': "'<address>'"},
+    })
+
+    assert plan.column_redactions('lms', 'auth_user', ['ID', 'EMAIL', 'USERNAME', 'LAST_NAME']) == {
+        'EMAIL': "'exact@edx.invalid'",
+        'USERNAME': "'<redacted>'",
+        'LAST_NAME': "'<redacted>'",
+    }
+    assert plan.column_redactions('LMS', 'COURSE', ['ID', 'EMAIL']) == {'EMAIL': "'pattern@edx.invalid'"}
+    assert plan.column_redactions('ECOM', 'ORDERS', ['TOTAL', 'PHONE', 'ADDRESS_1']) == {'TOTAL': 0}
+    assert plan.column_redactions('ECOM', 'BASKETS', ['TOTAL', 'PHONE', 'ADDRESS_1']) == {
+        'PHONE': "'<phone>'",
+        'ADDRESS_1': "'<address>'",
+    }
+    assert not plan.column_redactions('OTHER', 'AUTH_USER', ['EMAIL'])
+    assert plan.pattern is not None
+
+
+def test_redaction_plan_wildcards_stay_within_one_name():
+    plan = RedactionPlan({'LMS.*.EMAIL': "'<redacted>'", 'SCHEMA.*.PHONE': "'<redacted>'"})
+
+    assert not plan.column_redactions('LMS', 'T', ['BACKUP_EMAIL', 'USER_EMAIL'])
+    assert not plan.column_redactions('LMSX', 'T', ['EMAIL'])
+    assert not plan.column_redactions('SCHEMA', 'T', ['HOMEPHONE'])
+    assert not plan.column_redactions('SCHEMAX', 'T', ['XPHONE'])
+    assert plan.column_redactions('SCHEMA', 'T', ['PHONE']) == {'PHONE': "'<redacted>'"}
+
+
+def test_redaction_plan_escaped_keys():
+    plan = RedactionPlan({r'LMS.\*STAR.EMAIL': 1, r'LMS.AUTH\.USER.EMAIL': 2})
+
+    assert not plan.rules
+    assert plan.column_redactions('LMS', '*STAR', ['EMAIL']) == {'EMAIL': 1}
+    assert not plan.column_redactions('LMS', 'XSTAR', ['EMAIL'])
+    assert plan.exact['LMS.AUTH.USER'] == {'EMAIL': 2}
+
+
+def test_redaction_plan_skips_keys_without_a_column():
+    plan = RedactionPlan({
+        'LMS.*': "'<redacted>'",
+        'LMS.AUTH_USER': {'PROFILE.*': "'<redacted>'", 'EMAIL': "'redacted@edx.invalid'"},
+    })
+
+    assert plan.skipped_keys == ['LMS.*', 'LMS.AUTH_USER.PROFILE.*']
+    assert plan.column_redactions('LMS', 'AUTH_USER', ['EMAIL', 'PROFILE', 'USERNAME']) == {
+        'EMAIL': "'redacted@edx.invalid'"
+    }
+
+
+def test_redaction_plan_with_groups():
+    plan = RedactionPlan({'regex': {r'LMS\.(\w)\1_TABLE\.EMAIL': "'doubled'"}, 'LMS.*.EMAIL': "'any'"})
+
+    assert plan.pattern is None
+    assert plan.column_redactions('LMS', 'AA_TABLE', ['EMAIL']) == {'EMAIL': "'doubled'"}
+    assert plan.column_redactions('LMS', 'AB_TABLE', ['EMAIL']) == {'EMAIL': "'any'"}
+
+
+def test_sql_redactions():
+    relation = Relation(
+        'AUTH_USER',
+        ['ID', 'EMAIL', 'USERNAME'],
+        'LMS',
+        'non/existent/path',
+        [],
+        [],
+        {'LMS.AUTH_USER': {'EMAIL': "'redacted@edx.invalid'"}, 'LMS.*.USERNAME': "'<redacted>'"},
+        []
+    )
+    relation_dict = relation.prep_meta_data()
+    column_redactions = relation.redactions.column_redactions(
+        'LMS', relation.relation, [column['name'] for column in relation_dict['columns']]
+    )
+    sql = Relation.render_sql('LMS', 'SAFE', relation_dict, _get_fake_raw_schema(), column_redactions)
+
+    # One indented column per line, exactly as before redactions were precomputed
+    assert sql == (
+        "-- This file is automatically generated. Do not update by hand.\n"
+        "\n"
+        "{{ config(schema='LMS', alias='AUTH_USER') }}\n"
+        "\n"
+        "SELECT\n"
+        "\n"
+        "  ID, \n"
+        "  'redacted@edx.invalid' as EMAIL, \n"
+        "  '<redacted>' as USERNAME\n"
+        "FROM {{ source('SCHEMA_NAME', 'AUTH_USER') }}"
+    )
@@ -5,7 +5,7 @@ Tests for the Schema class
 import pytest
 
 from dbt_schema_builder.relation import Relation
-from dbt_schema_builder.schema import InvalidConfigurationException, Schema
+from dbt_schema_builder.schema import InvalidConfigurationException, Schema, TableFilter
 
 
 def test_raw_schema_filter_with_exclusion_list():
@@ -164,3 +164,53 @@ def test_raw_schema_sql_clause_non_string():
         )
 
     assert "has an invalid SOFT_DELETE configuration" in str(excinfo.value)
+
+
+def test_table_filter_from_config():
+    assert Schema.from_config('DB', 'SCHEMA', {'INCLUDE': ['TABLE_1']}).table_filter() == TableFilter(
+        included_tables=['TABLE_1']
+    )
+    assert Schema.from_config('DB', 'SCHEMA', {'EXCLUDE': ['TABLE_1']}).table_filter() == TableFilter(
+        excluded_tables=['TABLE_1']
+    )
+    assert Schema.from_config('DB', 'SCHEMA', {}).table_filter().is_unfiltered
+
+
+def test_table_filter_union():
+    include_1 = TableFilter(included_tables=['TABLE_1'])
+    include_2 = TableFilter(included_tables=['TABLE_2'])
+    exclude_1 = TableFilter(excluded_tables=['TABLE_1', 'TABLE_3'])
+    exclude_2 = TableFilter(excluded_tables=['TABLE_2', 'TABLE_3'])
+
+    assert include_1.union(include_2) == TableFilter(included_tables=['TABLE_1', 'TABLE_2'])
+    assert exclude_1.union(exclude_2) == TableFilter(excluded_tables=['TABLE_3'])
+    assert include_1.union(exclude_1) == TableFilter(excluded_tables=['TABLE_3'])
+    assert exclude_1.union(include_1) == TableFilter(excluded_tables=['TABLE_3'])
+    assert include_1.union(TableFilter()).is_unfiltered
+
+    assert 'TABLE_1' in include_1
+    assert 'TABLE_2' not in include_1
+    assert 'TABLE_1' not in exclude_1
+    assert 'TABLE_2' in exclude_1
+
+
+def test_table_filter_issubset():
+    include_1 = TableFilter(included_tables=['TABLE_1'])
+    include_1_2 = TableFilter(included_tables=['TABLE_1', 'TABLE_2'])
+    exclude_1 = TableFilter(excluded_tables=['TABLE_1'])
+    exclude_1_2 = TableFilter(excluded_tables=['TABLE_1', 'TABLE_2'])
+
+    assert include_1.issubset(include_1_2)
+    assert not include_1_2.issubset(include_1)
+    assert exclude_1_2.issubset(exclude_1)
+    assert not exclude_1.issubset(exclude_1_2)
+    assert not include_1.issubset(exclude_1)
+    assert TableFilter(included_tables=['TABLE_3']).issubset(exclude_1_2)
+    assert not exclude_1.issubset(include_1_2)
+    assert TableFilter().issubset(TableFilter())
+
+
+def test_table_filter_config():
+    table_filters = [TableFilter(included_tables=['TABLE_1']), TableFilter(excluded_tables=['TABLE_1']), TableFilter()]
+    for table_filter in table_filters:
+        assert TableFilter.from_config(table_filter.to_config()) == table_filter
@@ -0,0 +1,47 @@
+"""
+Tests for the CatalogStrategyMemo class
+"""
+
+from dbt_schema_builder.strategy import FULL_STRATEGY, PARTITIONED_STRATEGY, CatalogStrategyMemo, merge_empty_partitions
+
+
+def test_record_and_reload(tmpdir):
+    memo_path = str(tmpdir.join('strategies.yml'))
+    memo = CatalogStrategyMemo(memo_path)
+    assert memo.get('DB_1', 'RAW_SCHEMA_1') is None
+
+    memo.record('DB_1', 'RAW_SCHEMA_1', FULL_STRATEGY, 10)
+    memo.record(
+        'DB_1', 'RAW_SCHEMA_2', PARTITIONED_STRATEGY, 30,
+        partitions=[(None, 'B', 20), ('B', 'C', 10), ('C', None, 0)],
+    )
+    memo.save()
+
+    memo = CatalogStrategyMemo(memo_path)
+    assert memo.get('DB_1', 'RAW_SCHEMA_1') == {'strategy': FULL_STRATEGY, 'rows': 10}
+    assert memo.get_partitions('DB_1', 'RAW_SCHEMA_1') is None
+    # The empty last partition was merged into the one before it
+    assert memo.get_partitions('DB_1', 'RAW_SCHEMA_2') == [(None, 'B'), ('B', None)]
+    assert memo.get('DB_1', 'RAW_SCHEMA_2')['rows'] == 30
+
+
+def test_reprobe(tmpdir):
+    memo_path = str(tmpdir.join('strategies.yml'))
+    memo = CatalogStrategyMemo(memo_path)
+    memo.record('DB_1', 'RAW_SCHEMA_2', PARTITIONED_STRATEGY, 20, partitions=[(None, 'B', 20), ('B', None, 0)])
+    memo.save()
+
+    memo = CatalogStrategyMemo(memo_path, reprobe=True)
+    assert memo.get('DB_1', 'RAW_SCHEMA_2') is None
+    assert memo.get_partitions('DB_1', 'RAW_SCHEMA_2') is None
+
+
+def test_merge_empty_partitions():
+    assert not merge_empty_partitions([])
+    assert merge_empty_partitions([(None, 'B', 0), ('B', 'C', 0), ('C', 'D', 5), ('D', None, 7)]) == [
+        (None, 'D', 5), ('D', None, 7)
+    ]
+    assert merge_empty_partitions([(None, 'B', 3), ('B', 'C', 0), ('C', 'D', 5), ('D', None, 0)]) == [
+        (None, 'B', 3), ('B', None, 5)
+    ]
+    assert merge_empty_partitions([(None, 'B', 0), ('B', None, 0)]) == [(None, None, 0)]
@@ -0,0 +1,54 @@
+"""
+Tests for the YAML helpers
+"""
+import io
+from unittest.mock import patch
+
+import pytest
+import yaml
+
+from dbt_schema_builder import yaml_io
+from dbt_schema_builder.yaml_io import dump_yaml, load_yaml
+
+SHARED_TABLE = {"name": "SHARED"}
+
+
+@pytest.mark.parametrize("data", [
+    {
+        "version": 2,
+        "sources": [
+            {
+                "name": "LMS",
+                "database": "PROD",
+                "tables": [
+                    {"name": "AUTH_USER", "description": "TODO: Replace me", "tests": ["unique", "not_null"]},
+                    {"name": "COURSE", "description": "a long description " * 10, "loaded_at_field": None},
+                ],
+            }
+        ],
+        "models": [],
+    },
+    {"yes": "no", "null": "~", "a: b": "- c", "#": "'quoted'", "n": [1, 1.5, 10 ** 20, True, {}]},
+    {"description": "Café \U0001F600 with a\nnew line and a\ttab " * 5},
+    {"K" * 125: "a key too long to be simple", "": "an empty key"},
+    {"first": SHARED_TABLE, "second": SHARED_TABLE},
+    ["a", "list", {"of": "things"}],
+])
+def test_dump_yaml_matches_safe_dump(data):
+    for sort_keys in (False, True):
+        expected = yaml.safe_dump(data, sort_keys=sort_keys)
+        assert dump_yaml(data, sort_keys=sort_keys) == expected
+
+        stream = io.StringIO()
+        dump_yaml(data, stream, sort_keys=sort_keys)
+        assert stream.getvalue() == expected
+        assert load_yaml(expected) == data
+
+
+@pytest.mark.skipif(yaml_io.CSafeDumper is None, reason="PyYAML was built without libyaml")
+def test_dump_yaml_uses_libyaml():
+    with patch.object(yaml, "dump", wraps=yaml.dump) as dump:
+        dump_yaml({"name": "LMS", "tables": [{"name": "AUTH_USER"}]})
+        dump_yaml({"description": "Café"})
+
+    assert [call.kwargs["Dumper"] for call in dump.call_args_list] == [yaml_io.CSafeDumper, yaml.SafeDumper]